@@ -0,0 +1,371 @@
+"""
+Action-tape replay engine.
+
+replay_actions turns a recorded array of actions into the trades, bar-level
+balance and termination point that TradingEnv.step would produce, without
+stepping the environment. Position timing depends only on the actions
+(single position: buy/sell open when flat, close exits), so entries and
+exits are located for all trades at once with searchsorted; only the
+balance-dependent lot sizing and the drawdown check walk the trades, one
+iteration per trade rather than per bar. Once a policy's actions are
+recorded they can be re-priced under other spreads, balances or lot rules
+in milliseconds. Run this module as a script to verify the parity of the
+tape replay and of the batched VecTradingEnv lanes with TradingEnv over
+CSV files.
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from position_sizing import lot_sizes
+from trade_ledger import TradeLedger
+
+
+class TapeResult:
+    """Outcome of replaying an action tape."""
+
+    def __init__(self, trades: TradeLedger, balance: np.ndarray, equity: np.ndarray, done: bool,
+                 position: Optional[Dict[str, Any]], initial_balance: float):
+        """
+        Args:
+            trades: Closed trades
+            balance: Account balance after each executed step
+            equity: Balance plus unrealized P/L after each executed step
+            done: Whether the episode terminated (end of data, ruin or max drawdown)
+            position: Position still open when the tape ran out (None if flat)
+            initial_balance: Starting balance
+        """
+        self.trades = trades
+        self.balance = balance
+        self.equity = equity
+        self.done = done
+        self.position = position
+        self.initial_balance = initial_balance
+
+    @property
+    def n_steps(self) -> int:
+        """Number of actions executed before the tape ended or the episode terminated."""
+        return len(self.balance)
+
+    @property
+    def final_balance(self) -> float:
+        return float(self.balance[-1]) if len(self.balance) else self.initial_balance
+
+    @property
+    def rewards(self) -> np.ndarray:
+        """Per-step rewards as TradingEnv.calculate_reward computes them."""
+        previous = np.concatenate(([self.initial_balance], self.balance[:-1]))
+        return (self.balance - previous) / self.initial_balance
+
+    def max_drawdown(self) -> float:
+        """Maximum peak-to-trough drawdown (fraction) of the bar-level balance."""
+        if not len(self.balance):
+            return 0.0
+        peak = np.maximum.accumulate(np.maximum(self.balance, self.initial_balance))
+        return float(((peak - self.balance) / peak).max())
+
+
+def replay_actions(close: np.ndarray, spread: np.ndarray, atr: np.ndarray, actions: np.ndarray,
+                   start: int = 0, initial_balance: float = 10000.0, balance_per_lot: float = 1000.0,
+                   spread_scale: float = 1.0, point_value: float = 0.01, pip_value: float = 0.0001,
+                   min_lots: float = 0.01, max_lots: float = 100.0, max_drawdown: float = 0.5,
+                   index: Optional[pd.Index] = None) -> TapeResult:
+    """Replay actions with TradingEnv.step semantics.
+
+    Action k is taken at bar start + k and executed at bar start + k + 1:
+    entries fill at that bar's close plus (long) or minus (short) the spread
+    of the bar the action was taken on, lots are sized from the balance,
+    exits fill at the close, and the episode ends at the last bar, at a
+    balance of zero or below, or when a closed trade draws the balance down
+    max_drawdown from its peak. A position open at the last bar is closed
+    there.
+
+    Args:
+        close: Close prices of the environment bars
+        spread: Spreads in points of the environment bars
+        atr: ATR values of the environment bars (recorded as entry_atr)
+        actions: Actions (0: hold, 1: buy, 2: sell, 3: close), taken modulo 4
+        start: Bar of the first action (the episode's reset step)
+        initial_balance: Starting balance
+        balance_per_lot: Account balance required per 0.01 lot
+        spread_scale: Multiplier applied to every spread
+        point_value: Price units per spread point
+        pip_value: Price units per pip
+        min_lots: Minimum lot size
+        max_lots: Maximum lot size
+        max_drawdown: Drawdown fraction that ends the episode
+        index: Timestamps of the bars, for the trade ledger
+
+    Returns:
+        TapeResult
+    """
+    actions = np.asarray(actions).astype(np.int64) % 4
+    n_bars = len(close)
+    # Action k executes at bar start + k + 1; the episode ends on reaching the last bar
+    n_steps = int(min(len(actions), max(0, n_bars - 1 - start)))
+    end_of_data = n_steps > 0 and n_steps == n_bars - 1 - start
+    actions = actions[:n_steps]
+
+    open_steps = np.flatnonzero((actions == 1) | (actions == 2))
+    close_steps = np.flatnonzero(actions == 3)
+
+    trades = TradeLedger(index=index)
+    trade_open, trade_close, trade_balance = [], [], []
+    held_entry, held_direction, held_lots = [], [], []
+    balance = initial_balance
+    peak = initial_balance
+    done = end_of_data
+    position = None
+
+    last_close = -1
+    while True:
+        i = np.searchsorted(open_steps, last_close, side='right')
+        if i == len(open_steps):
+            break
+        k_open = int(open_steps[i])
+        j = np.searchsorted(close_steps, k_open, side='right')
+        if j < len(close_steps):
+            k_close = int(close_steps[j])
+        elif end_of_data:
+            # Auto-close at the last bar
+            k_close = n_steps - 1
+        else:
+            k_close = None
+
+        entry_bar = start + k_open + 1
+        direction = 1 if actions[k_open] == 1 else -1
+        raw_spread = spread[entry_bar - 1] * point_value
+        if spread_scale != 1.0:
+            raw_spread = raw_spread * spread_scale
+        lot_size = float(lot_sizes(balance, balance_per_lot, min_lots, max_lots))
+        entry_price = close[entry_bar] + (raw_spread if direction == 1 else -raw_spread)
+
+        held_entry.append(entry_price)
+        held_direction.append(direction)
+        held_lots.append(lot_size)
+        
+        if k_close is None:
+            trade_open.append(k_open)
+            position = {
+                'direction': direction,
+                'entry_price': entry_price,
+                'lot_size': lot_size,
+                'entry_step': entry_bar,
+                'entry_atr': atr[entry_bar]
+            }
+            break
+
+        exit_bar = start + k_close + 1
+        exit_price = close[exit_bar]
+        profit_points = exit_price - entry_price if direction == 1 else entry_price - exit_price
+        pnl = profit_points * lot_size
+        trades.append(
+            entry_step=entry_bar,
+            exit_step=exit_bar,
+            entry_price=entry_price,
+            exit_price=exit_price,
+            pnl=pnl,
+            profit_pips=profit_points / pip_value,
+            direction=direction,
+            lot_size=lot_size,
+            entry_atr=atr[entry_bar]
+        )
+
+        # The step's drawdown uses the peak from before the close
+        peak = max(balance, peak)
+        balance += pnl
+        trade_open.append(k_open)
+        trade_close.append(k_close)
+        trade_balance.append(balance)
+        last_close = k_close
+
+        if balance <= 0 or (peak - balance) / peak >= max_drawdown:
+            n_steps = k_close + 1
+            done = True
+            break
+
+    # Bar-level balance: the balance after the latest close at or before each step
+    steps = np.arange(n_steps)
+    trade_close = np.asarray(trade_close, dtype=np.int64)
+    trade_balance = np.asarray(trade_balance, dtype=np.float64)
+    # Slot 0 holds the initial balance for steps before the first close (or tapes without one)
+    latest = np.searchsorted(trade_close, steps, side='right')
+    balance_curve = np.concatenate(([initial_balance], trade_balance))[latest]
+
+    # Equity adds the unrealized P/L of the position held after each step
+    equity = balance_curve.copy()
+    if trade_open:
+        held_open = np.asarray(trade_open, dtype=np.int64)
+        held_close = np.concatenate((trade_close, [n_steps] if position is not None else [])).astype(np.int64)
+        entry = np.asarray(held_entry, dtype=np.float64)
+        direction = np.asarray(held_direction, dtype=np.float64)
+        lots = np.asarray(held_lots, dtype=np.float64)
+        current = np.searchsorted(held_open, steps, side='right') - 1
+        holding = (current >= 0) & (steps < held_close[np.maximum(current, 0)])
+        t = current[holding]
+        price = close[start + steps[holding] + 1]
+        equity[holding] += (price - entry[t]) * direction[t] * lots[t]
+
+    return TapeResult(trades, balance_curve, equity, done, position, initial_balance)
+
+
+def replay_env_actions(env, actions: np.ndarray, start: int = 0, **overrides: Any) -> TapeResult:
+    """Replay actions over a TradingEnv's bars and settings.
+
+    Args:
+        env: TradingEnv (possibly wrapped) providing prices and trading constants
+        actions: Actions to replay
+        start: Bar of the first action
+        **overrides: replay_actions settings to change, e.g. spread_scale,
+            initial_balance or balance_per_lot
+
+    Returns:
+        TapeResult
+    """
+    env = env.unwrapped
+    settings = {
+        'initial_balance': env.initial_balance,
+        'balance_per_lot': env.BALANCE_PER_LOT,
+        'point_value': env.POINT_VALUE,
+        'pip_value': env.PIP_VALUE,
+        'min_lots': env.MIN_LOTS,
+        'max_lots': env.MAX_LOTS,
+        'max_drawdown': env.MAX_DRAWDOWN,
+        'index': env.original_index,
+        **overrides
+    }
+    return replay_actions(env.prices['close'], env.prices['spread'], env.prices['atr'], actions,
+                          start=start, **settings)
+
+
+def parity_tapes(length: int, n_tapes: int = 5, seed: int = 0) -> list:
+    """Random action tapes with varying hold probability, plus tapes without a closed trade."""
+    rng = np.random.default_rng(seed)
+    tapes = [np.where(rng.random(length) < tape / n_tapes, 0, rng.integers(0, 4, length))
+             for tape in range(n_tapes)]
+    # Tapes without a closed trade: all holds, and an open position that outlives a partial tape
+    tapes.append(np.zeros(length, dtype=np.int64))
+    tapes.append(np.array([1, 0, 0, 0], dtype=np.int64))
+    return tapes
+
+
+def verify_parity(data: pd.DataFrame, n_tapes: int = 5, seed: int = 0) -> bool:
+    """Check replayed random action tapes against stepping TradingEnv.
+
+    Args:
+        data: DataFrame with OHLC and spread columns
+        n_tapes: Number of random tapes (with varying hold probability); an
+            all-hold tape and an open-only tape are always checked as well
+        seed: Seed of the tapes
+
+    Returns:
+        bool: True if trades, balances and termination match exactly
+    """
+    from trade_environment import TradingEnv
+
+    env = TradingEnv(data, random_start=False)
+
+    all_match = True
+    for tape, actions in enumerate(parity_tapes(env.data_length, n_tapes, seed)):
+        start = time.perf_counter()
+        env.reset()
+        balances = []
+        done = False
+        for action in actions:
+            _, _, done, _, _ = env.step(action)
+            balances.append(env.balance)
+            if done:
+                break
+        env_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = replay_env_actions(env, actions)
+        tape_time = time.perf_counter() - start
+
+        trades_match = env.trades.to_frame().equals(result.trades.to_frame())
+        balance_match = np.array_equal(np.asarray(balances, dtype=np.float64), result.balance)
+        match = trades_match and balance_match and done == result.done
+        all_match &= match
+        print(f"  Tape {tape}: {len(result.trades)} trades, {result.n_steps} steps, "
+              f"match: {match} (env {env_time * 1000:.0f} ms, tape {tape_time * 1000:.1f} ms)")
+
+    return all_match
+
+
+def verify_lane_parity(data: pd.DataFrame, n_tapes: int = 5, seed: int = 0) -> bool:
+    """Check a VecTradingEnv lane against stepping TradingEnv on the same action tapes.
+
+    Args:
+        data: DataFrame with OHLC and spread columns
+        n_tapes: Number of random tapes (see parity_tapes)
+        seed: Seed of the tapes
+
+    Returns:
+        bool: True if observations, balances, termination and trade counts match exactly
+    """
+    from trade_environment import TradingEnv
+    from vec_trading_env import VecTradingEnv
+
+    env = TradingEnv(data, random_start=False)
+    vec_env = VecTradingEnv.from_env(env, n_envs=1)
+
+    all_match = True
+    for tape, actions in enumerate(parity_tapes(env.data_length, n_tapes, seed)):
+        obs, _ = env.reset()
+        vec_obs = vec_env.reset()
+        match = np.array_equal(np.asarray(obs, dtype=np.float32), vec_obs[0])
+        done = vec_done = False
+        vec_trades = 0
+        for action in actions:
+            obs, _, done, _, _ = env.step(action)
+            vec_obs, _, vec_dones, infos = vec_env.step(np.array([action]))
+            vec_done = bool(vec_dones[0])
+            # A finished lane is reset at once; its terminal state is in the info
+            if vec_done:
+                vec_obs = infos[0]['terminal_observation'][None]
+                vec_trades = infos[0]['total_trades']
+            else:
+                vec_trades = int(vec_env.lanes.trade_count[0])
+            match &= (np.array_equal(np.asarray(obs, dtype=np.float32), vec_obs[0])
+                      and float(env.balance) == float(infos[0]['balance']) and done == vec_done)
+            if done or vec_done:
+                break
+        match &= len(env.trades) == vec_trades
+        all_match &= match
+        print(f"  Lane tape {tape}: {len(env.trades)} trades, match: {match}")
+
+    return all_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify action-tape replay and VecTradingEnv against TradingEnv')
+    parser.add_argument('--data_path', type=str, nargs='*', default=None,
+                      help='CSV files to check (default: all CSV files in ../data)')
+    parser.add_argument('--tapes', type=int, default=5,
+                      help='Random action tapes per file')
+
+    args = parser.parse_args()
+    paths = args.data_path or sorted(glob.glob(os.path.join('..', 'data', '*.csv')))
+
+    all_match = True
+    for path in paths:
+        print(f"\n{os.path.basename(path)}")
+        data = pd.read_csv(path)
+        data['time'] = pd.to_datetime(data['time'])
+        data.set_index('time', inplace=True)
+        all_match &= verify_parity(data, n_tapes=args.tapes)
+        all_match &= verify_lane_parity(data, n_tapes=args.tapes)
+
+    print(f"\nParity {'OK' if all_match else 'FAILED'}")
+    if not all_match:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
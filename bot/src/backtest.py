@@ -11,6 +11,11 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from backtest_trace import TRACE_LEVELS, BacktestTrace
+from cost_sweep import scenario_grid
+from lockstep_backtest import verify_parity as verify_lockstep_parity
+from monte_carlo import bootstrap_backtest
+from perturbation_mc import Perturbation, perturbation_monte_carlo
 from trade_model import TradeModel
 
 def convert_to_serializable(obj: Any) -> Any:
@@ -209,44 +214,17 @@ def plot_results(results: dict, save_path: str = None):
         plt.savefig(save_path, bbox_inches='tight')
     plt.show()
 
-def monte_carlo_simulation(df: pd.DataFrame, model: TradeModel, params: dict,
-                         n_sims: int = 100, random_seed: int = 42) -> Dict:
-    """Run Monte Carlo simulation by varying trade entry/exit points."""
-    np.random.seed(random_seed)
-    results = []
-    
-    print(f"\nRunning {n_sims} Monte Carlo simulations...")
-    for i in range(n_sims):
-        # Randomly shift trade timings within a small window
-        jitter = np.random.normal(0, 2, len(df))  # 2-bar standard deviation
-        df_sim = df.copy()
-        df_sim.index = df_sim.index + pd.Timedelta(seconds=int(jitter.mean()))
-        
-        # Run backtest with jittered data
-        sim_result = model.backtest(
-            data=df_sim,
-            initial_balance=params['initial_balance'],
-            balance_per_lot=params['balance_per_lot']
-        )
-        results.append(sim_result)
-        
-        if (i + 1) % 10 == 0:
-            print(f"Completed {i + 1} simulations")
-    
-    # Aggregate results
-    returns = [r['return_pct'] for r in results]
-    drawdowns = [r['max_drawdown_pct'] for r in results]
-    win_rates = [r['win_rate'] for r in results]
-    
-    summary = {
-        'return_mean': float(np.mean(returns)),
-        'return_std': float(np.std(returns)),
-        'return_quartiles': [float(np.percentile(returns, q)) for q in [25, 50, 75]],
-        'drawdown_mean': float(np.mean(drawdowns)),
-        'drawdown_worst': float(np.max(drawdowns)),
-        'win_rate_mean': float(np.mean(win_rates)),
-        'win_rate_std': float(np.std(win_rates)),
-        'simulations': results
+def monte_carlo_simulation(results: dict, n_sims: int = 10000, random_seed: int = 42,
+                           mean_block: float = 20.0, skip_prob: float = 0.1,
+                           plot_path: Optional[str] = None) -> Dict:
+    """Run a bootstrap Monte Carlo on a finished backtest's trades and bar-level equity."""
+    print(f"\nRunning {n_sims:,d} Monte Carlo simulations per method...")
+    report = bootstrap_backtest(results, n_sims=n_sims, mean_block=mean_block,
+                                skip_prob=skip_prob, seed=random_seed)
+    methods = {
+        'trade_shuffle': 'Trade order shuffle',
+        'trade_skip': f'Trade skipping ({skip_prob:.0%})',
+        'bar_bootstrap': f'Bar block bootstrap ({mean_block:g} bars)'
     }
     
     # Plot Monte Carlo results
@@ -254,59 +232,82 @@ def monte_carlo_simulation(df: pd.DataFrame, model: TradeModel, params: dict,
     
     # Plot distributions
     plt.subplot(221)
-    plt.hist(returns, bins=30, alpha=0.7)
-    plt.axvline(summary['return_mean'], color='r', linestyle='--', label='Mean')
-    plt.axvline(summary['return_quartiles'][1], color='g', linestyle='--', label='Median')
+    for method, report_entry in report.items():
+        plt.hist(report_entry['distributions']['return_pct'], bins=50, alpha=0.5, label=methods[method])
     plt.title('Return Distribution')
     plt.xlabel('Return %')
     plt.ylabel('Frequency')
     plt.legend()
     
     plt.subplot(222)
-    plt.hist(drawdowns, bins=30, alpha=0.7)
-    plt.axvline(summary['drawdown_mean'], color='r', linestyle='--', label='Mean')
+    for method, report_entry in report.items():
+        plt.hist(report_entry['distributions']['max_drawdown_pct'], bins=50, alpha=0.5, label=methods[method])
     plt.title('Max Drawdown Distribution')
     plt.xlabel('Max Drawdown %')
     plt.ylabel('Frequency')
     plt.legend()
     
     plt.subplot(223)
-    plt.hist(win_rates, bins=30, alpha=0.7)
-    plt.axvline(summary['win_rate_mean'], color='r', linestyle='--', label='Mean')
-    plt.title('Win Rate Distribution')
+    plt.hist(report['trade_skip']['distributions']['win_rate'], bins=50, alpha=0.7)
+    plt.title('Win Rate Distribution (trade skipping)')
     plt.xlabel('Win Rate %')
     plt.ylabel('Frequency')
-    plt.legend()
     
-    # Plot sample equity curves
+    # Plot sample equity curves of shuffled trade orders
     plt.subplot(224)
-    for i, result in enumerate(results[:min(20, n_sims)]):
-        trades_df = pd.DataFrame(result['trades'])
-        equity = trades_df['pnl'].cumsum()
-        plt.plot(equity.values, alpha=0.3, color='blue')
-    plt.title('Sample Equity Curves')
+    pnl = np.array([trade['pnl'] for trade in results['trades']], dtype=np.float64)
+    rng = np.random.default_rng(random_seed)
+    for _ in range(min(20, n_sims)):
+        plt.plot(np.cumsum(rng.permutation(pnl)), alpha=0.3, color='blue')
+    plt.plot(np.cumsum(pnl), color='red', label='Backtest')
+    plt.title('Sample Equity Curves (shuffled trades)')
     plt.xlabel('Trade Number')
     plt.ylabel('Cumulative PnL')
+    plt.legend()
     
     plt.tight_layout()
+    if plot_path:
+        plt.savefig(plot_path, bbox_inches='tight')
     plt.show()
     
     # Print Monte Carlo summary
     print("\n=== Monte Carlo Simulation Results ===")
-    print(f"Number of simulations: {n_sims}")
-    print(f"\nReturn Distribution:")
-    print(f"Mean: {summary['return_mean']:.2f}%")
-    print(f"Std Dev: {summary['return_std']:.2f}%")
-    print(f"Quartiles (25/50/75): {summary['return_quartiles'][0]:.2f}%/"
-          f"{summary['return_quartiles'][1]:.2f}%/{summary['return_quartiles'][2]:.2f}%")
-    print(f"\nDrawdown Analysis:")
-    print(f"Mean Max DD: {summary['drawdown_mean']:.2f}%")
-    print(f"Worst DD: {summary['drawdown_worst']:.2f}%")
-    print(f"\nWin Rate Analysis:")
-    print(f"Mean: {summary['win_rate_mean']:.2f}%")
-    print(f"Std Dev: {summary['win_rate_std']:.2f}%")
-    
-    return summary
+    print(f"Simulations per method: {n_sims:,d}")
+    for method, report_entry in report.items():
+        summary = report_entry['summary']
+        returns = summary['return_pct']
+        drawdowns = summary['max_drawdown_pct']
+        print(f"\n{methods[method]}:")
+        print(f"Return Mean: {returns['mean']:.2f}%  Std Dev: {returns['std']:.2f}%")
+        print(f"Return Quartiles (25/50/75): {returns['quartiles'][0]:.2f}%/"
+              f"{returns['quartiles'][1]:.2f}%/{returns['quartiles'][2]:.2f}%")
+        print(f"Return 95% CI: [{returns['ci_low']:.2f}%, {returns['ci_high']:.2f}%]")
+        print(f"Max DD Mean: {drawdowns['mean']:.2f}%  95% CI: [{drawdowns['ci_low']:.2f}%, "
+              f"{drawdowns['ci_high']:.2f}%]  Worst: {drawdowns['max']:.2f}%")
+        if 'win_rate' in summary:
+            print(f"Win Rate Mean: {summary['win_rate']['mean']:.2f}%  Std Dev: {summary['win_rate']['std']:.2f}%")
+        print(f"Probability of Loss: {summary['loss_probability']:.1%}")
+    
+    return report
+
+def print_perturbation_summary(results: Dict) -> None:
+    """Print the distributions of a perturbation Monte Carlo."""
+    summary = results['summary']
+    n_ok = len(results['distributions']['return_pct']) - len(results['failed'])
+    print("\n=== Perturbation Monte Carlo Results ===")
+    print(f"Successful simulations: {n_ok}")
+    if not summary:
+        return
+    returns = summary['return_pct']
+    drawdowns = summary['max_drawdown_pct']
+    print(f"\nReturn Mean: {returns['mean']:.2f}%  Std Dev: {returns['std']:.2f}%")
+    print(f"Return Quartiles (25/50/75): {returns['quartiles'][0]:.2f}%/"
+          f"{returns['quartiles'][1]:.2f}%/{returns['quartiles'][2]:.2f}%")
+    print(f"Return 95% CI: [{returns['ci_low']:.2f}%, {returns['ci_high']:.2f}%]")
+    print(f"Max DD Mean: {drawdowns['mean']:.2f}%  Worst: {drawdowns['max']:.2f}%")
+    print(f"Win Rate Mean: {summary['win_rate']['mean']:.2f}%  Std Dev: {summary['win_rate']['std']:.2f}%")
+    print(f"Trades Mean: {summary['total_trades']['mean']:.1f}")
+    print(f"Probability of Loss: {summary['loss_probability']:.1%}")
 
 def compare_backtests(results_list: List[Dict], plot_path: Optional[str] = None) -> None:
     """Generate comparison plots for multiple backtest results."""
@@ -382,10 +383,45 @@ def main():
                       help='Start date for backtest (YYYY-MM-DD)')
     parser.add_argument('--end_date', type=str, default=None,
                       help='End date for backtest (YYYY-MM-DD)')
+    parser.add_argument('--lockstep', action='store_true',
+                      help='Backtest all models together in one pass over the data')
+    parser.add_argument('--verify_lockstep', action='store_true',
+                      help='Check that a single-model lockstep backtest matches the regular backtest of each model')
+    parser.add_argument('--trace', type=str, choices=TRACE_LEVELS, default='off',
+                      help='Per-step backtest trace saved as trace_<seed>_<period>.npz (ignored with --lockstep)')
+    parser.add_argument('--trace_every', type=int, default=100,
+                      help='Sampling interval in steps for --trace sampled')
     parser.add_argument('--monte_carlo', type=int, default=0,
-                      help='Number of Monte Carlo simulations for best model (0 to disable)')
+                      help='Number of Monte Carlo simulations per resampling method for best model (0 to disable)')
     parser.add_argument('--monte_carlo_seed', type=int, default=42,
                       help='Random seed for Monte Carlo simulations')
+    parser.add_argument('--monte_carlo_block', type=float, default=20.0,
+                      help='Mean block length in bars of the bar-return bootstrap')
+    parser.add_argument('--monte_carlo_skip', type=float, default=0.1,
+                      help='Probability of skipping each trade in the trade-skipping simulations')
+    parser.add_argument('--sweep_spreads', type=str, default=None,
+                      help='Comma-separated spread multipliers for a cost sweep (e.g. 1,1.5,2)')
+    parser.add_argument('--sweep_commissions', type=str, default=None,
+                      help='Comma-separated round-trip commissions per lot for a cost sweep')
+    parser.add_argument('--sweep_slippage', type=str, default=None,
+                      help='Comma-separated slippage values in points for a cost sweep')
+    parser.add_argument('--sweep_balance_per_lot', type=str, default=None,
+                      help='Comma-separated balance per lot values for a cost sweep')
+    parser.add_argument('--perturbation_mc', type=int, default=0,
+                      help='Number of perturbed-market simulations for best model (0 to disable)')
+    parser.add_argument('--perturbation_workers', type=int, default=None,
+                      help='Worker processes for perturbed-market simulations (default: CPU count)')
+    parser.add_argument('--price_noise', type=float, default=0.0002,
+                      help='Std dev of OHLC noise relative to the close price')
+    parser.add_argument('--spread_shock_prob', type=float, default=0.02,
+                      help='Probability of a spread shock per bar')
+    parser.add_argument('--spread_shock_scale', type=float, default=3.0,
+                      help='Spread multiplier of a spread shock')
+    parser.add_argument('--dropout_prob', type=float, default=0.01,
+                      help='Probability of dropping each bar')
+    parser.add_argument('--feature_cache', type=str, default=None,
+                      help='Directory for an on-disk feature cache, e.g. ../cache/features (off by default; '
+                           'writes one entry per distinct OHLC dataset and never evicts)')
     
     args = parser.parse_args()
     
@@ -422,6 +458,16 @@ def main():
         
         print(f"Loaded {len(df):,d} bars from {df.index[0]} to {df.index[-1]}")
         
+        # Cost sweep over every combination of the given values
+        sweep_values = [args.sweep_spreads, args.sweep_commissions, args.sweep_slippage, args.sweep_balance_per_lot]
+        scenarios = None
+        if any(values is not None for values in sweep_values):
+            defaults = [1.0, 0.0, 0.0, args.balance_per_lot]
+            scenarios = scenario_grid(*[
+                [float(v) for v in values.split(',')] if values is not None else [default]
+                for values, default in zip(sweep_values, defaults)
+            ])
+        
         # Create timestamped results directory
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         results_dir = os.path.join(args.results_dir, f"backtest_comparison_{timestamp}")
@@ -432,6 +478,7 @@ def main():
         best_result = None
         best_score = float('-inf')
         
+        models = []
         for seed, period in zip(seeds, periods):
             try:
                 model_path = f"../results/{seed}/{'model_final.zip' if period == 'final' else 'best_model.zip'}"
@@ -440,14 +487,48 @@ def main():
                     continue
                 
                 print(f"\nInitializing model: Seed {seed}, Period {period}")
-                model = TradeModel(model_path=model_path)
+                model = TradeModel(model_path=model_path, feature_cache_dir=args.feature_cache or None)
+                if model.model is None:
+                    print(f"Warning: Model at {model_path} failed to load, skipping...")
+                    continue
+                models.append((seed, period, model))
                 
+            except Exception as e:
+                print(f"Error loading seed {seed}, period {period}: {str(e)}")
+                continue
+        
+        if args.verify_lockstep:
+            for seed, period, model in models:
+                print(f"\nVerifying lockstep parity: Seed {seed}, Period {period}")
+                if not verify_lockstep_parity(model, df, args.initial_balance, args.balance_per_lot):
+                    print(f"Warning: Lockstep backtest of seed {seed}, period {period} differs from its backtest")
+        
+        # Backtest every model in one pass over the data
+        lockstep_results = None
+        if args.lockstep and models:
+            print(f"\nRunning lockstep backtest of {len(models)} models...")
+            lockstep_results = TradeModel.backtest_lockstep(
+                [model for _, _, model in models],
+                data=df,
+                initial_balance=args.initial_balance,
+                balance_per_lot=args.balance_per_lot
+            )
+        
+        for i, (seed, period, model) in enumerate(models):
+            try:
                 # Run backtest
-                results = model.backtest(
-                    data=df,
-                    initial_balance=args.initial_balance,
-                    balance_per_lot=args.balance_per_lot
-                )
+                if lockstep_results is not None:
+                    results = lockstep_results[i]
+                else:
+                    trace = BacktestTrace(args.trace, args.trace_every) if args.trace != 'off' else None
+                    results = model.backtest(
+                        data=df,
+                        initial_balance=args.initial_balance,
+                        balance_per_lot=args.balance_per_lot,
+                        trace=trace
+                    )
+                    if trace is not None:
+                        trace.save(os.path.join(results_dir, f"trace_{seed}_{period}.npz"))
                 
                 # Calculate score for determining best model
                 # Safely calculate score using defensive programming
@@ -478,13 +559,19 @@ def main():
                             'end': str(df.index[-1])
                         }
                     },
-                    'results': results
+                    'results': {key: value for key, value in results.items() if key != 'equity_curve'}
                 }
                 
                 all_results.append(results_with_meta)
                 print(f"\nResults for Seed {seed}, Period {period}:")
                 print_metrics(results)
                 
+                if scenarios:
+                    sweep = model.cost_sweep(df, scenarios, initial_balance=args.initial_balance)
+                    sweep.to_csv(os.path.join(results_dir, f"cost_sweep_{seed}_{period}.csv"))
+                    print(f"\nCost sweep for Seed {seed}, Period {period}:")
+                    print(sweep[['return_pct', 'max_drawdown_pct', 'total_trades', 'win_rate']].round(2).to_string())
+                
             except Exception as e:
                 print(f"Error processing seed {seed}, period {period}: {str(e)}")
                 continue
@@ -510,20 +597,50 @@ def main():
         if args.monte_carlo > 0 and best_result is not None:
             print("\nRunning Monte Carlo simulation on best performing model...")
             monte_carlo_results = monte_carlo_simulation(
-                df=df,
-                model=best_result['model'],
-                params={
-                    'initial_balance': args.initial_balance,
-                    'balance_per_lot': args.balance_per_lot
-                },
+                best_result['results'],
                 n_sims=args.monte_carlo,
-                random_seed=args.monte_carlo_seed
+                random_seed=args.monte_carlo_seed,
+                mean_block=args.monte_carlo_block,
+                skip_prob=args.monte_carlo_skip,
+                plot_path=os.path.join(results_dir, 'monte_carlo_plot.png')
             )
             
-            # Save Monte Carlo results
+            # Save Monte Carlo summaries as JSON and the full distributions as arrays
             mc_file = os.path.join(results_dir, 'monte_carlo_results.json')
             with open(mc_file, 'w') as f:
-                json.dump(monte_carlo_results, f, indent=4, default=convert_to_serializable)
+                json.dump({method: entry['summary'] for method, entry in monte_carlo_results.items()},
+                          f, indent=4, default=convert_to_serializable)
+            np.savez_compressed(
+                os.path.join(results_dir, 'monte_carlo_distributions.npz'),
+                **{f"{method}_{name}": values for method, entry in monte_carlo_results.items()
+                   for name, values in entry['distributions'].items()}
+            )
+        
+        # Run perturbation Monte Carlo if requested
+        if args.perturbation_mc > 0 and best_result is not None:
+            print(f"\nRunning {args.perturbation_mc} perturbed-market simulations on best performing model...")
+            perturbation_results = perturbation_monte_carlo(
+                model_path=str(best_result['model'].model_path),
+                data=df,
+                n_sims=args.perturbation_mc,
+                seed=args.monte_carlo_seed,
+                perturbation=Perturbation(
+                    price_noise=args.price_noise,
+                    spread_shock_prob=args.spread_shock_prob,
+                    spread_shock_scale=args.spread_shock_scale,
+                    dropout_prob=args.dropout_prob
+                ),
+                n_workers=args.perturbation_workers,
+                initial_balance=args.initial_balance,
+                balance_per_lot=args.balance_per_lot
+            )
+            print_perturbation_summary(perturbation_results)
+            
+            with open(os.path.join(results_dir, 'perturbation_results.json'), 'w') as f:
+                json.dump({'summary': perturbation_results['summary'], 'failed': perturbation_results['failed']},
+                          f, indent=4, default=convert_to_serializable)
+            np.savez_compressed(os.path.join(results_dir, 'perturbation_distributions.npz'),
+                                **perturbation_results['distributions'])
         
         print(f"\nResults saved to: {results_dir}")
         
@@ -0,0 +1,117 @@
+"""
+Structured per-step trace of a backtest.
+
+BacktestTrace records what the policy saw and did on each traced step (step
+index, action, observation, price, balance and position direction) into
+preallocated NumPy columns, and writes them to .npz or Parquet once the
+backtest is over. Nothing is formatted per bar: with the trace off the
+backtest loop does no tracing work at all, sampled tracing keeps every
+N-th step and full tracing keeps every step.
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+TRACE_LEVELS = ('off', 'sampled', 'full')
+
+
+class BacktestTrace:
+    """Preallocated struct-of-arrays buffer of traced backtest steps."""
+
+    def __init__(self, level: str = 'sampled', every: int = 100):
+        """
+        Args:
+            level: 'off', 'sampled' (every N-th step) or 'full' (every step)
+            every: Sampling interval in steps for the 'sampled' level
+
+        Raises:
+            ValueError: For an unknown level or a non-positive interval
+        """
+        if level not in TRACE_LEVELS:
+            raise ValueError(f"Unknown trace level '{level}', expected one of {TRACE_LEVELS}")
+        if every < 1:
+            raise ValueError(f"Trace interval must be positive, got {every}")
+        self.level = level
+        self.every = every if level == 'sampled' else 1
+        self._size = 0
+        self._data: Dict[str, np.ndarray] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.level != 'off'
+
+    def __len__(self) -> int:
+        return self._size
+
+    def allocate(self, max_steps: int, n_features: int) -> None:
+        """Preallocate room for every step a backtest of max_steps steps can trace."""
+        capacity = -(-max_steps // self.every) if self.enabled else 0
+        self._size = 0
+        self._data = {
+            'step': np.zeros(capacity, dtype=np.int64),
+            'action': np.zeros(capacity, dtype=np.int8),
+            'price': np.zeros(capacity, dtype=np.float64),
+            'balance': np.zeros(capacity, dtype=np.float64),
+            'direction': np.zeros(capacity, dtype=np.int8),
+            'obs': np.zeros((capacity, n_features), dtype=np.float32),
+        }
+
+    def wants(self, index: int) -> bool:
+        """Whether the index-th step of the backtest is traced."""
+        return self.enabled and index % self.every == 0
+
+    def record(self, step: int, action: int, obs: np.ndarray, price: float, balance: float,
+               direction: int) -> None:
+        """Store one traced step.
+
+        Args:
+            step: Environment bar index the action was chosen on
+            action: Action chosen (0: hold, 1: buy, 2: sell, 3: close)
+            obs: Observation the policy saw
+            price: Close price of the bar
+            balance: Account balance before the action
+            direction: Open position direction (1 long, -1 short, 0 flat)
+        """
+        i = self._size
+        data = self._data
+        data['step'][i] = step
+        data['action'][i] = action
+        data['price'][i] = price
+        data['balance'][i] = balance
+        data['direction'][i] = direction
+        data['obs'][i] = obs
+        self._size = i + 1
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Recorded columns, trimmed to the traced steps."""
+        return {name: values[:self._size] for name, values in self._data.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        """Recorded steps as a DataFrame with one obs_<i> column per observation feature."""
+        columns = self.columns()
+        obs = columns.pop('obs')
+        frame = pd.DataFrame(columns)
+        for i in range(obs.shape[1] if obs.ndim == 2 else 0):
+            frame[f'obs_{i}'] = obs[:, i]
+        return frame
+
+    def save(self, path: str) -> None:
+        """Write the trace as .npz, or as Parquet if path ends in .parquet."""
+        if path.endswith('.parquet'):
+            self.to_frame().to_parquet(path, index=False)
+        else:
+            np.savez_compressed(path, level=self.level, every=self.every, **self.columns())
+
+    @classmethod
+    def load(cls, path: str) -> pd.DataFrame:
+        """Read a saved trace as a DataFrame."""
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path)
+        with np.load(path) as saved:
+            trace = cls(str(saved['level']), int(saved['every']))
+            columns = {name: saved[name] for name in ('step', 'action', 'price', 'balance', 'direction', 'obs')}
+        trace._data = columns
+        trace._size = len(columns['step'])
+        return trace.to_frame()
@@ -0,0 +1,59 @@
+"""Micro-benchmark for TradingEnv step throughput against the baseline TradingEnv."""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from legacy_trade_environment import TradingEnv as LegacyTradingEnv
+from trade_environment import TradingEnv
+
+
+def run_steps(env, actions: np.ndarray) -> float:
+    """Step the environment through an action sequence and return steps/sec."""
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+    return len(actions) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TradingEnv step throughput')
+    parser.add_argument('--data_path', type=str, default='../data/XAUUSDm_15min.csv',
+                      help='Path to the input dataset CSV file')
+    parser.add_argument('--steps', type=int, default=20000,
+                      help='Number of environment steps per run')
+    parser.add_argument('--repeats', type=int, default=3,
+                      help='Number of runs per variant (best is reported)')
+    parser.add_argument('--seed', type=int, default=42,
+                      help='Random seed for the action sequence')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data_path)
+    data.set_index('time', inplace=True)
+    data.index = pd.to_datetime(data.index)
+    print(f"Dataset shape: {data.shape}, from {data.index[0]} to {data.index[-1]}")
+
+    rng = np.random.default_rng(args.seed)
+    actions = rng.choice(4, size=args.steps, p=[0.7, 0.1, 0.1, 0.1])
+
+    variants = {
+        'baseline TradingEnv': LegacyTradingEnv(data.copy(), random_start=False),
+        'current TradingEnv': TradingEnv(data.copy(), random_start=False),
+    }
+
+    results = {}
+    for name, env in variants.items():
+        results[name] = max(run_steps(env, actions) for _ in range(args.repeats))
+        print(f"{name:<30} {results[name]:>12,.0f} steps/sec")
+
+    before, after = results.values()
+    print(f"Speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Latency benchmark for bar-by-bar model decisions."""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import torch as th
+from sb3_contrib.ppo_recurrent import RecurrentPPO
+
+from inference_session import InferenceSession
+from trade_environment import TradingEnv
+from trade_model import TradeModel
+
+
+def build_untrained_model(data: pd.DataFrame, device: str) -> RecurrentPPO:
+    """Create an untrained model with the training architecture (same forward-pass cost)."""
+    policy_kwargs = {
+        "optimizer_class": th.optim.AdamW,
+        "lstm_hidden_size": 128,
+        "n_lstm_layers": 2,
+        "shared_lstm": True,
+        "enable_critic_lstm": False,
+        "net_arch": {
+            "pi": [64, 32],
+            "vf": [64, 32]
+        }
+    }
+    env = TradingEnv(data.iloc[:500].copy(), random_start=False)
+    return RecurrentPPO("MlpLstmPolicy", env, policy_kwargs=policy_kwargs, device=device, verbose=0)
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies in microseconds."""
+    values = np.asarray(latencies) * 1e6
+    return {
+        'bars': len(values),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max())
+    }
+
+
+def print_summary(name: str, stats: Dict[str, Any]) -> None:
+    print(f"{name:<32} bars={stats['bars']:>6}  mean={stats['mean']:>10,.0f}us  "
+          f"p50={stats['p50']:>10,.0f}us  p99={stats['p99']:>10,.0f}us  max={stats['max']:>10,.0f}us")
+
+
+def run_session(model: RecurrentPPO, data: pd.DataFrame) -> List[float]:
+    """Replay bars through a persistent inference session, timing each decision."""
+    session = InferenceSession(model)
+    bars = data[['open', 'high', 'low', 'close', 'spread']].to_dict('records')
+    latencies = []
+    for time_, bar in zip(data.index, bars):
+        start = time.perf_counter()
+        result = session.on_bar(bar, time_)
+        elapsed = time.perf_counter() - start
+        if result is not None:
+            latencies.append(elapsed)
+    return latencies
+
+
+def run_rebuild(model: RecurrentPPO, data: pd.DataFrame, window: int, bars: int) -> List[float]:
+    """Time the previous approach: rebuild a TradingEnv over the trailing window for every bar."""
+    latencies = []
+    lstm_states = None
+    for end in range(window, min(len(data), window + bars)):
+        start = time.perf_counter()
+        env = TradingEnv(data.iloc[end - window:end].copy(), random_start=False)
+        env.current_step = env.data_length - 1
+        observation = env.get_history()
+        _, lstm_states = model.predict(observation, state=lstm_states, deterministic=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-bar decision latency')
+    parser.add_argument('--data_path', type=str, default='../data/BTCUSDm_60min.csv',
+                      help='Path to the input dataset CSV file')
+    parser.add_argument('--model_path', type=str, default=None,
+                      help='Path to a saved model (default: untrained model with the training architecture)')
+    parser.add_argument('--device', type=str, choices=['cuda', 'cpu'], default='cpu',
+                      help='Device for the policy forward pass')
+    parser.add_argument('--bars', type=int, default=0,
+                      help='Number of bars to replay (0 for all)')
+    parser.add_argument('--rebuild_window', type=int, default=1000,
+                      help='Window length for the rebuild-per-bar comparison (0 to skip)')
+    parser.add_argument('--rebuild_bars', type=int, default=200,
+                      help='Number of bars timed for the rebuild-per-bar comparison')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data_path)
+    data.set_index('time', inplace=True)
+    data.index = pd.to_datetime(data.index)
+    if args.bars:
+        data = data.iloc[:args.bars]
+    print(f"Dataset shape: {data.shape}, from {data.index[0]} to {data.index[-1]}")
+
+    if args.model_path:
+        model = TradeModel(args.model_path).model
+        if model is None:
+            raise SystemExit(f"Failed to load model from {args.model_path}")
+    else:
+        print("No model path given, using an untrained model with the training architecture")
+        model = build_untrained_model(data, args.device)
+
+    th.set_num_threads(1)
+    # Latencies depend on the machine and build; print the setup alongside them
+    print(f"torch {th.__version__}, {th.get_num_threads()} thread(s), device {args.device}, "
+          f"{'model ' + args.model_path if args.model_path else 'untrained model'}")
+    print_summary('session.on_bar', summarize(run_session(model, data)))
+
+    if args.rebuild_window:
+        latencies = run_rebuild(model, data, args.rebuild_window, args.rebuild_bars)
+        print_summary(f'rebuild env ({args.rebuild_window} bars)', summarize(latencies))
+
+
+if __name__ == "__main__":
+    main()
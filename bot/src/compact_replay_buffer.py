@@ -0,0 +1,178 @@
+"""
+Index-based replay buffer for off-policy training on TradingEnv.
+
+Every TradingEnv observation is a row of the environment's feature matrix
+plus one agent-dependent column, the normalized unrealized P&L. Instead of
+storing each observation twice (obs and next_obs) like SB3's ReplayBuffer,
+IndexReplayBuffer stores the bar index of the transition and the two P&L
+values, and gathers the observations from the shared feature matrix when a
+batch is sampled. With 7 float32 features a transition takes 20 bytes
+instead of about 80, and checkpoints shrink by the same factor because the
+matrix itself is never pickled.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.buffers import BaseBuffer
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+from stable_baselines3.common.vec_env import VecNormalize
+
+
+class IndexReplayBuffer(BaseBuffer):
+    """Replay buffer storing (step_index, pnl, next_pnl, action, reward, done) per transition.
+
+    Transitions are reconstructed from feature_matrix, the float32
+    observation matrix of the environment (TradingEnv.obs_matrix, whose last
+    column is the P&L slot). All environments feeding the buffer must share
+    that matrix. The environment's step info must carry the bar index of the
+    next observation under "step", as TradingEnv and VecTradingEnv do.
+
+    Pass it to SB3 as replay_buffer_class with
+    replay_buffer_kwargs={'feature_matrix': env.obs_matrix}.
+    """
+
+    def __init__(self, buffer_size: int, observation_space: spaces.Space, action_space: spaces.Space,
+                 device: Any = "auto", n_envs: int = 1, optimize_memory_usage: bool = False,
+                 handle_timeout_termination: bool = True, feature_matrix: Optional[np.ndarray] = None):
+        """
+        Args:
+            buffer_size: Maximum number of transitions per environment
+            observation_space: Observation space
+            action_space: Discrete action space
+            device: Torch device of the sampled tensors
+            n_envs: Number of parallel environments
+            optimize_memory_usage: Accepted for SB3 compatibility; the buffer
+                is already compact, so it is ignored
+            handle_timeout_termination: Whether truncations are stored so they
+                are not treated as terminal states
+            feature_matrix: Float32 observation matrix shared by the environments
+                (can be attached later with attach())
+
+        Raises:
+            ValueError: If the action space is not Discrete
+        """
+        if not isinstance(action_space, spaces.Discrete):
+            raise ValueError("IndexReplayBuffer only supports Discrete action spaces")
+        super().__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        # Capacity is buffer_size transitions in total, as in ReplayBuffer
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        self.optimize_memory_usage = False
+        self.handle_timeout_termination = handle_timeout_termination
+        self.feature_matrix = None
+        if feature_matrix is not None:
+            self.attach(feature_matrix)
+
+        shape = (self.buffer_size, self.n_envs)
+        self.steps = np.zeros(shape, dtype=np.int32)
+        self.pnl = np.zeros(shape, dtype=np.float32)
+        self.next_pnl = np.zeros(shape, dtype=np.float32)
+        self.actions = np.zeros(shape, dtype=np.int16)
+        self.rewards = np.zeros(shape, dtype=np.float32)
+        self.dones = np.zeros(shape, dtype=np.bool_)
+        self.timeouts = np.zeros(shape, dtype=np.bool_)
+
+    def attach(self, feature_matrix: np.ndarray) -> None:
+        """Attach the feature matrix, e.g. after loading a pickled buffer.
+
+        Raises:
+            ValueError: If the matrix does not match the observation space
+        """
+        if feature_matrix.shape[1:] != self.obs_shape:
+            raise ValueError(f"Feature matrix rows have shape {feature_matrix.shape[1:]}, "
+                             f"observations have shape {self.obs_shape}")
+        self.feature_matrix = feature_matrix
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored transitions."""
+        return sum(array.nbytes for array in (self.steps, self.pnl, self.next_pnl, self.actions,
+                                               self.rewards, self.dones, self.timeouts))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The feature matrix belongs to the environment; checkpoints only hold transitions
+        state = self.__dict__.copy()
+        state['feature_matrix'] = None
+        return state
+
+    def add(self, obs: np.ndarray, next_obs: np.ndarray, action: np.ndarray, reward: np.ndarray,
+            done: np.ndarray, infos: List[Dict[str, Any]]) -> None:
+        """Store one transition per environment."""
+        pos = self.pos
+        obs = np.asarray(obs).reshape((self.n_envs,) + self.obs_shape)
+        next_obs = np.asarray(next_obs).reshape((self.n_envs,) + self.obs_shape)
+
+        # The step info holds the bar of next_obs; obs is the bar before it
+        self.steps[pos] = [info["step"] - 1 for info in infos]
+        self.pnl[pos] = obs[:, -1]
+        self.next_pnl[pos] = next_obs[:, -1]
+        self.actions[pos] = np.asarray(action).reshape(self.n_envs)
+        self.rewards[pos] = reward
+        self.dones[pos] = done
+        if self.handle_timeout_termination:
+            self.timeouts[pos] = [info.get("TimeLimit.truncated", False) for info in infos]
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def extend(self, steps: np.ndarray, pnl: np.ndarray, next_pnl: np.ndarray, actions: np.ndarray,
+               rewards: np.ndarray, dones: np.ndarray, timeouts: Optional[np.ndarray] = None) -> None:
+        """Store a batch of transitions at once.
+
+        Arrays are flat with one entry per transition; they fill rows of
+        n_envs transitions, so a trailing partial row is dropped.
+
+        Args:
+            steps: Bar index of each obs
+            pnl: P&L feature of each obs
+            next_pnl: P&L feature of each next_obs
+            actions: Actions taken
+            rewards: Rewards received
+            dones: Episode end flags
+            timeouts: Truncation flags (none if omitted)
+        """
+        n_rows = len(steps) // self.n_envs
+        if timeouts is None:
+            timeouts = np.zeros(len(steps), dtype=np.bool_)
+        columns = ((self.steps, steps), (self.pnl, pnl), (self.next_pnl, next_pnl), (self.actions, actions),
+                   (self.rewards, rewards), (self.dones, dones), (self.timeouts, timeouts))
+        # Keep only the newest rows if the batch is larger than the buffer
+        first = max(0, n_rows - self.buffer_size)
+        rows = np.arange(first, n_rows)
+        positions = (self.pos + rows - first) % self.buffer_size
+        for target, values in columns:
+            values = np.asarray(values)[:n_rows * self.n_envs].reshape(n_rows, self.n_envs)
+            target[positions] = values[rows]
+
+        written = len(rows)
+        self.full = self.full or self.pos + written >= self.buffer_size
+        self.pos = (self.pos + written) % self.buffer_size
+
+    def _gather(self, steps: np.ndarray, pnl: np.ndarray) -> np.ndarray:
+        """Observations of the given bars with their P&L column filled in."""
+        obs = self.feature_matrix[steps]
+        obs[:, -1] = pnl
+        return obs
+
+    def _get_samples(self, batch_inds: np.ndarray, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        if self.feature_matrix is None:
+            raise RuntimeError("No feature matrix attached; call attach() after loading the buffer")
+
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        steps = self.steps[batch_inds, env_indices]
+
+        obs = self._normalize_obs(self._gather(steps, self.pnl[batch_inds, env_indices]), env)
+        next_obs = self._normalize_obs(self._gather(steps + 1, self.next_pnl[batch_inds, env_indices]), env)
+        dones = (self.dones[batch_inds, env_indices] & ~self.timeouts[batch_inds, env_indices]).astype(np.float32)
+
+        data = (
+            obs,
+            self.actions[batch_inds, env_indices].astype(np.int64).reshape(-1, 1),
+            next_obs,
+            dones.reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
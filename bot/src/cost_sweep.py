@@ -0,0 +1,234 @@
+"""
+Batched cost-sensitivity sweep for backtests.
+
+TradingEnv prices trades with a single cost assumption (the bar spread).
+run_cost_sweep instead plays one policy rollout against many cost
+scenarios at once: every scenario is a lane of account and position state
+(CostLanes), and all lanes advance together over the shared feature
+matrix. Lanes whose LSTM state and observation coincide (e.g. while they
+are all flat and have taken the same actions) share one policy forward, so
+a sweep costs little more than a single backtest.
+"""
+
+import itertools
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch as th
+
+from position_sizing import lot_sizes
+from trade_environment import TradingEnv
+from vec_trading_env import TradingLanes
+
+
+class CostScenario:
+    """Broker cost assumptions of one sweep lane."""
+
+    def __init__(self, spread_scale: float = 1.0, commission: float = 0.0, slippage: float = 0.0,
+                 balance_per_lot: float = 1000.0, name: Optional[str] = None):
+        """
+        Args:
+            spread_scale: Multiplier applied to the bar spread on entry
+            commission: Round-trip commission per lot, deducted from each trade's P/L
+            slippage: Adverse fill in spread points, applied on entry and on exit
+            balance_per_lot: Account balance required per 0.01 lot
+            name: Label in the result table (built from the values if None)
+        """
+        self.spread_scale = spread_scale
+        self.commission = commission
+        self.slippage = slippage
+        self.balance_per_lot = balance_per_lot
+        self.name = name or (f"spread x{spread_scale:g}, commission {commission:g}, "
+                             f"slippage {slippage:g}, balance/lot {balance_per_lot:g}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'spread_scale': self.spread_scale,
+            'commission': self.commission,
+            'slippage': self.slippage,
+            'balance_per_lot': self.balance_per_lot
+        }
+
+
+def scenario_grid(spread_scales: Sequence[float] = (1.0,), commissions: Sequence[float] = (0.0,),
+                  slippages: Sequence[float] = (0.0,),
+                  balance_per_lots: Sequence[float] = (1000.0,)) -> List[CostScenario]:
+    """Every combination of the given cost values as scenarios."""
+    return [CostScenario(spread_scale, commission, slippage, balance_per_lot)
+            for spread_scale, commission, slippage, balance_per_lot
+            in itertools.product(spread_scales, commissions, slippages, balance_per_lots)]
+
+
+class CostLanes(TradingLanes):
+    """TradingLanes with per-lane spread scale, commission, slippage and lot sizing.
+
+    With a spread scale of 1 and no commission or slippage a lane follows
+    TradingEnv.step exactly. Lanes also track their closed-trade drawdown.
+    """
+
+    def __init__(self, scenarios: Sequence[CostScenario], initial_balance: float = 10000,
+                 point_value: float = 0.01, min_lots: float = 0.01, max_lots: float = 100.0):
+        """
+        Args:
+            scenarios: Cost scenario of each lane
+            initial_balance: Starting balance of every lane
+            point_value: Price units per spread point
+            min_lots: Minimum lot size
+            max_lots: Maximum lot size
+        """
+        super().__init__(len(scenarios), initial_balance, min_lots=min_lots, max_lots=max_lots)
+        self.balance_per_lot = np.array([s.balance_per_lot for s in scenarios], dtype=np.float64)
+        self.spread_scale = np.array([s.spread_scale for s in scenarios], dtype=np.float64)
+        self.commission = np.array([s.commission for s in scenarios], dtype=np.float64)
+        self.slippage = np.array([s.slippage for s in scenarios], dtype=np.float64) * point_value
+        self.peak_balance = np.full(self.n_lanes, initial_balance, dtype=np.float64)
+        self.max_drawdown = np.zeros(self.n_lanes, dtype=np.float64)
+
+    def open(self, mask: np.ndarray, direction: np.ndarray, price: np.ndarray,
+             spread: np.ndarray, step: np.ndarray) -> None:
+        """Open positions on flat lanes, paying the scaled spread plus slippage."""
+        mask = mask & (self.direction == 0)
+        if not mask.any():
+            return
+        lots = lot_sizes(self.balance[mask], self.balance_per_lot[mask], self.min_lots, self.max_lots)
+        cost = spread[mask] * self.spread_scale[mask] + self.slippage[mask]
+        self.direction[mask] = direction[mask]
+        self.entry_price[mask] = np.where(direction[mask] == 1, price[mask] + cost, price[mask] - cost)
+        self.lot_size[mask] = lots
+        self.entry_step[mask] = step[mask]
+
+    def close(self, mask: np.ndarray, price: np.ndarray) -> np.ndarray:
+        """Close open positions with exit slippage and commission and book the P/L."""
+        mask = mask & (self.direction != 0)
+        pnl = np.zeros(self.n_lanes, dtype=np.float64)
+        if not mask.any():
+            return pnl
+        exit_price = price - self.direction * self.slippage
+        pnl[mask] = ((exit_price - self.entry_price) * self.direction * self.lot_size
+                     - self.commission * self.lot_size)[mask]
+        self.balance[mask] += pnl[mask]
+        self.trade_count[mask] += 1
+        self.win_count[mask & (pnl > 0)] += 1
+        self.direction[mask] = 0
+        self.entry_price[mask] = 0.0
+        self.lot_size[mask] = 0.0
+
+        np.maximum(self.peak_balance, self.balance, out=self.peak_balance)
+        drawdown = np.divide(self.peak_balance - self.balance, self.peak_balance,
+                             out=np.zeros(self.n_lanes), where=self.peak_balance > 0)
+        np.maximum(self.max_drawdown, drawdown, out=self.max_drawdown)
+        return pnl
+
+
+def run_cost_sweep(model: Any, env: TradingEnv, scenarios: Sequence[CostScenario],
+                   lstm_states: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                   deterministic: bool = True) -> pd.DataFrame:
+    """Run one policy rollout against every cost scenario.
+
+    Every lane starts at the environment's first bar with the given LSTM
+    state and follows TradingEnv.step: the action chosen on a bar fills at
+    the next bar's close using the chosen bar's spread, and a lane stops at
+    the last bar, at ruin or at the maximum drawdown. Each bar the active
+    lanes are grouped by (LSTM state, observation) and the policy runs once
+    per group.
+
+    Args:
+        model: Loaded RecurrentPPO model
+        env: Environment providing the features, prices and trading constants
+        scenarios: Cost scenarios, one lane each
+        lstm_states: Initial (hidden, cell) states with a batch size of 1
+            (zeros if None)
+        deterministic: Whether to use deterministic actions
+
+    Returns:
+        DataFrame indexed by scenario name with the scenario's costs and its
+        final balance, return, max drawdown, trade count and win rate
+    """
+    env = env.unwrapped
+    policy = model.policy
+    policy.set_training_mode(False)
+    device = policy.device
+
+    n_lanes = len(scenarios)
+    lanes = CostLanes(scenarios, env.initial_balance, env.POINT_VALUE, env.MIN_LOTS, env.MAX_LOTS)
+    close_prices = np.asarray(env.prices['close'], dtype=np.float64)
+    spread_cost = np.asarray(env.prices['spread'], dtype=np.float64) * env.POINT_VALUE
+    obs_matrix = env.obs_matrix
+
+    # LSTM state of every lane; lanes with the same leader hold the same state
+    if lstm_states is None:
+        hidden = th.zeros(policy.lstm_hidden_state_shape, device=device)
+        lstm_states = (hidden, hidden.clone())
+    states = tuple(th.as_tensor(state, device=device).repeat(1, n_lanes, 1) for state in lstm_states)
+    leader = np.zeros(n_lanes, dtype=np.int64)
+
+    active = np.ones(n_lanes, dtype=bool)
+    steps = np.zeros(n_lanes, dtype=np.int64)
+    obs = np.zeros((n_lanes, obs_matrix.shape[1]), dtype=np.float32)
+    step = 0
+    forwards = 0
+
+    with th.no_grad():
+        while active.any():
+            lane_ids = np.flatnonzero(active)
+            obs[:] = obs_matrix[step]
+            pnl = lanes.unrealized_pnl(np.full(n_lanes, close_prices[step]))
+            obs[:, -1] = np.clip(pnl / env.initial_balance, -1, 1)
+
+            # Group lanes whose state and observation coincide
+            keys = np.column_stack((leader[lane_ids], obs[lane_ids].astype(np.float64)))
+            _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            representatives = lane_ids[first]
+
+            rep_index = th.as_tensor(representatives, device=device)
+            lane_index = th.as_tensor(lane_ids, device=device)
+            group_index = th.as_tensor(inverse, device=device)
+            group_states = tuple(state[:, rep_index] for state in states)
+            group_actions, group_states = policy._predict(
+                th.as_tensor(obs[representatives], device=device),
+                lstm_states=group_states,
+                episode_starts=th.zeros(len(representatives), device=device),
+                deterministic=deterministic
+            )
+            forwards += len(representatives)
+            for state, group_state in zip(states, group_states):
+                state[:, lane_index] = group_state[:, group_index]
+            leader[lane_ids] = representatives[inverse]
+            actions = np.zeros(n_lanes, dtype=np.int64)
+            actions[lane_ids] = group_actions.cpu().numpy().reshape(-1)[inverse] % 4
+
+            # Step the active lanes as TradingEnv.step does
+            spread = np.full(n_lanes, spread_cost[step])
+            np.maximum(lanes.max_balance, lanes.balance, out=lanes.max_balance)
+            step += 1
+            steps[lane_ids] = step
+            price = np.full(n_lanes, close_prices[step])
+
+            lanes.open(active & ((actions == 1) | (actions == 2)),
+                       np.where(actions == 1, 1, -1).astype(np.int8), price, spread, steps)
+            lanes.close(active & (actions == 3), price)
+
+            drawdown = (lanes.max_balance - lanes.balance) / lanes.max_balance
+            done = active & ((step >= env.data_length - 1) | (lanes.balance <= 0)
+                             | (drawdown >= env.MAX_DRAWDOWN))
+            lanes.close(done, price)
+            active &= ~done
+
+    total_trades = lanes.trade_count
+    table = pd.DataFrame({
+        **{key: [scenario.to_dict()[key] for scenario in scenarios]
+           for key in ('spread_scale', 'commission', 'slippage', 'balance_per_lot')},
+        'final_balance': lanes.balance,
+        'return_pct': (lanes.balance / env.initial_balance - 1) * 100,
+        'max_drawdown_pct': lanes.max_drawdown * 100,
+        'total_trades': total_trades,
+        'win_rate': np.divide(lanes.win_count * 100.0, total_trades,
+                              out=np.zeros(n_lanes), where=total_trades > 0),
+        'total_steps': steps
+    }, index=pd.Index([scenario.name for scenario in scenarios], name='scenario'))
+    # Policy rows evaluated versus one forward per lane and bar
+    table.attrs['policy_forwards'] = forwards
+    table.attrs['lane_steps'] = int(steps.sum())
+    return table
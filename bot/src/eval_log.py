@@ -0,0 +1,85 @@
+"""
+Append-only evaluation log.
+
+Each evaluation is written as one JSON line, so logging costs the same on
+the first evaluation of a run as on the thousandth and nothing has to be
+kept in memory. Summary views such as the per-iteration layout of
+eval_results_all.json are rebuilt from the log on demand.
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional
+
+EVAL_LOG_NAME = "eval_log.jsonl"
+
+
+class EvalLog:
+    """JSON-lines file holding one record per evaluation."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the log file (created on first append)
+        """
+        self.path = path
+
+    @classmethod
+    def in_directory(cls, directory: str) -> 'EvalLog':
+        """Log stored under its default name in a results directory."""
+        return cls(os.path.join(directory, EVAL_LOG_NAME))
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append one evaluation record.
+
+        Args:
+            record: JSON-serializable evaluation record
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def extend(self, other: 'EvalLog') -> None:
+        """Append every record of another log, as raw lines."""
+        if not os.path.exists(other.path):
+            return
+        with open(other.path, "rb") as src, open(self.path, "ab") as dst:
+            shutil.copyfileobj(src, dst)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream the records in the order they were written.
+
+        A truncated last line (from an interrupted write) is skipped.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def records(self, iteration: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Load the records, optionally only those of one walk-forward iteration."""
+        return [record for record in self if iteration is None or record.get('iteration') == iteration]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Build the eval_results_all.json view: the latest period info of each
+        iteration plus the list of its evaluation results."""
+        summary = {}
+        for record in self:
+            key = f"iteration_{record.get('iteration', 0)}"
+            entry = summary.setdefault(key, {'results': []})
+            entry['results'].append({name: record[name] for name in ('timesteps', 'combined', 'validation')
+                                     if name in record})
+            entry.update(record.get('period', {}))
+        return summary
+
+    def write_summary(self, path: str) -> None:
+        """Write summary() as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
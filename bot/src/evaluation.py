@@ -0,0 +1,478 @@
+"""
+Walk-forward evaluation callbacks.
+
+UnifiedEvalCallback evaluates the model on the validation and combined
+windows from inside the training loop, which pauses training for the
+length of both episodes. AsyncEvalCallback instead snapshots the policy
+weights into a bounded queue read by an evaluation process that runs the
+same evaluation, writes the same result files and saves the best model,
+so training continues while the episodes run. When the queue is full an
+evaluation is skipped rather than stalling the learner.
+
+Both append one record per evaluation to an EvalLog and keep only the most
+recent results in memory, so callback memory stays constant over a run.
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch as th
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.monitor import Monitor
+from sb3_contrib.ppo_recurrent import RecurrentPPO
+
+from eval_log import EvalLog
+from shared_features import attach
+from trade_environment import TradingEnv
+
+
+class UnifiedEvalCallback(BaseCallback):
+    """Optimized evaluation callback with enhanced progress tracking and comprehensive evaluation."""
+    def __init__(self, eval_env, combined_env, eval_freq=100000, best_model_save_path=None, 
+                 log_path=None, deterministic=True, verbose=1, iteration=0, max_results=100):
+        super(UnifiedEvalCallback, self).__init__(verbose=verbose)
+        self.eval_env = eval_env
+        self.eval_freq = eval_freq
+        self.best_model_save_path = best_model_save_path
+        self.log_path = log_path
+        self.deterministic = deterministic
+        # Recent results only; the full history is in the eval log
+        self.eval_results = deque(maxlen=max_results)
+        self.eval_log = EvalLog.in_directory(log_path) if log_path is not None else None
+        self.last_time_trigger = 0
+        self.iteration = iteration
+        
+        # Evaluation environment over the combined train and validation windows
+        self.combined_env = combined_env
+        
+        # Initialize tracking metrics
+        self.best_score = -float("inf")
+        self.best_metrics = {}
+        self.max_drawdown = 0.0
+            
+    def _run_eval_episode(self, env) -> Dict[str, float]:
+        """Run a complete evaluation episode on given environment."""
+        obs, _ = env.reset()
+        done = False
+        lstm_states = None
+        running_balance = env.env.initial_balance
+        max_balance = running_balance
+        episode_reward = 0
+        
+        while not done:
+            action, lstm_states = self.model.predict(
+                obs, state=lstm_states, deterministic=self.deterministic
+            )
+            obs, reward, terminated, truncated, info = env.step(action)
+            done = terminated or truncated
+            episode_reward += reward
+            
+            # Track running metrics
+            running_balance = env.env.balance
+            max_balance = max(max_balance, running_balance)
+        
+        # Calculate metrics
+        total_return = (running_balance - env.env.initial_balance) / env.env.initial_balance
+        max_drawdown = 0.0
+        if max_balance > env.env.initial_balance:
+            max_drawdown = (max_balance - running_balance) / max_balance
+            
+        # Use environment's built-in trade metrics
+        trade_metrics = env.env.trade_metrics
+        
+        return {
+            'return': total_return,
+            'max_drawdown': max_drawdown,
+            'reward': episode_reward,
+            'win_rate': trade_metrics['win_rate'],
+            'avg_profit': trade_metrics['avg_profit'],
+            'avg_loss': trade_metrics['avg_loss'],
+            'balance': running_balance,
+            'total_trades': len(env.env.trades),
+            'current_direction': trade_metrics['current_direction']
+        }
+        
+    def _calculate_trade_quality(self, metrics: Dict[str, float]) -> float:
+        """Calculate overall trade quality score with enhanced metrics."""
+        win_rate_score = metrics['win_rate']
+        profit_factor = max(0, metrics['avg_profit']) / (abs(metrics['avg_loss']) + 1e-8)
+        drawdown_penalty = max(0, 1 - metrics['max_drawdown'] * 2)
+        
+        # Ensure directories exist
+        if self.best_model_save_path:
+            os.makedirs(self.best_model_save_path, exist_ok=True)
+        
+        if self.log_path:
+            os.makedirs(self.log_path, exist_ok=True)
+            
+        # Calculate quality score with adjusted weights
+        return (win_rate_score * 0.35 + 
+                min(profit_factor, 4) / 4 * 0.45 + 
+                drawdown_penalty * 0.2)
+                
+    def _evaluate_performance(self) -> Dict[str, Dict[str, float]]:
+        """Run comprehensive evaluation on all datasets."""
+        # Evaluate on validation set
+        val_metrics = self._run_eval_episode(self.eval_env)
+        
+        # Evaluate on combined dataset
+        combined_metrics = self._run_eval_episode(self.combined_env)
+        
+        # Calculate consistency score
+        consistency_score = val_metrics['return'] / (combined_metrics['return'] + 1e-8)
+        
+        # Calculate trade quality scores
+        val_quality = self._calculate_trade_quality(val_metrics)
+        combined_quality = self._calculate_trade_quality(combined_metrics)
+        
+        # Create comprehensive metrics
+        result = {
+            'validation': val_metrics,
+            'combined': combined_metrics,
+            'scores': {
+                'consistency': consistency_score,
+                'val_quality': val_quality,
+                'combined_quality': combined_quality,
+                'validation_quality': val_quality  # Add validation quality directly to scores
+            }
+        }
+        
+        return result
+    
+    def _should_save_model(self, metrics: Dict[str, Dict[str, float]]) -> bool:
+        """Determine if current model should be saved as best."""
+        combined = metrics['combined']
+        scores = metrics['scores']
+        
+        # Calculate composite score
+        score = (
+            combined['return'] * 0.4 +                # Weight overall return
+            -combined['max_drawdown'] * 0.3 +        # Penalize drawdowns
+            scores['consistency'] * 0.2 +            # Reward consistency
+            scores['combined_quality'] * 0.1         # Consider trade quality
+        )
+        
+        if score > self.best_score:
+            self.best_score = score
+            self.best_metrics = {
+                'validation': metrics['validation'],
+                'combined': metrics['combined'],
+                'scores': metrics['scores'],
+                'trades_file': self._save_best_trades()
+            }
+            return True
+        return False
+    
+    def _save_best_trades(self) -> Optional[str]:
+        """Write the combined-window trades of the best model so far to disk.
+        
+        Returns:
+            Path of the trades file, or None without a save path
+        """
+        if self.best_model_save_path is None:
+            return None
+        os.makedirs(self.best_model_save_path, exist_ok=True)
+        trades_file = os.path.join(self.best_model_save_path, f"best_model_trades_iter_{self.iteration}.csv")
+        # The combined episode ran last, so its env still holds the trades
+        self.combined_env.env.trades.to_frame().to_csv(trades_file, index=False)
+        return trades_file
+    
+    def _on_step(self) -> bool:
+        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
+            self.evaluate()
+            self.last_time_trigger = self.n_calls
+        
+        return True
+    
+    def evaluate(self) -> Dict[str, Any]:
+        """Evaluate the current model, log the results and save it if it is the best so far.
+        
+        Returns:
+            Evaluation record with the combined and validation metrics
+        """
+        # Run comprehensive evaluation
+        metrics = self._evaluate_performance()
+        combined = metrics['combined']
+        val = metrics['validation']
+        
+        if self.verbose > 0:
+            print(f"\n===== Evaluation at timesteps={self.num_timesteps} =====")
+            print(f"Combined Dataset Metrics:")
+            print(f"  Balance: {combined['balance']:.2f}")
+            print(f"  Return: {combined['return']*100:.2f}%")
+            print(f"  Max Drawdown: {combined['max_drawdown']*100:.2f}%")
+            print(f"  Win Rate: {combined['win_rate']*100:.2f}%")
+            print(f"  Total Reward: {combined['reward']:.2f}")  # Add this line
+            
+            print(f"\nValidation Set Metrics:")
+            print(f"  Balance: {val['balance']:.2f}")
+            print(f"  Return: {val['return']*100:.2f}%")
+            print(f"  Max Drawdown: {val['max_drawdown']*100:.2f}%")
+            print(f"  Win Rate: {val['win_rate']*100:.2f}%")
+            print(f"  Total Reward: {val['reward']:.2f}")  # Add this line
+        
+        record = {
+            'timesteps': self.num_timesteps,
+            'combined': {
+                'balance': float(combined['balance']),
+                'return': float(combined['return']),
+                'max_drawdown': float(combined['max_drawdown']),
+                'win_rate': float(combined['win_rate'])
+            },
+            'validation': {
+                'balance': float(val['balance']),
+                'return': float(val['return']),
+                'max_drawdown': float(val['max_drawdown']),
+                'win_rate': float(val['win_rate'])
+            }
+        }
+        
+        self.eval_results.append(record)
+        
+        if self.eval_log is not None:
+            eval_env = self.eval_env
+            while hasattr(eval_env, 'env'):
+                eval_env = eval_env.env
+                if isinstance(eval_env, TradingEnv):
+                    break
+
+            # Calculate running drawdown from the trade ledger in one vectorized pass
+            period_max_drawdown = eval_env.trades.max_drawdown(eval_env.initial_balance)
+
+            # Update historical max drawdown
+            self.max_drawdown = max(self.max_drawdown, period_max_drawdown)
+
+            # Calculate basic metrics
+            active_position = 1 if eval_env.current_position else 0
+            num_winning_trades = eval_env.win_count
+            num_losing_trades = eval_env.loss_count
+            
+            try:
+                period_start = str(eval_env.original_index[0])
+                period_end = str(eval_env.original_index[-1])
+            except (AttributeError, IndexError) as e:
+                period_start = period_end = "NA"
+                print(f"Warning: Could not get period timestamps: {str(e)}")
+
+            # Print drawdown information
+            print("\n===== Drawdown Analysis =====")
+            print(f"Period Max Drawdown: {period_max_drawdown*100:.2f}%")
+            print(f"Historical Max Drawdown: {self.max_drawdown*100:.2f}%")
+
+            period_info = {
+                'iteration': self.iteration,
+                'balance': float(eval_env.balance),
+                'total_trades': len(eval_env.trades),
+                'active_position': active_position,
+                'win_count': num_winning_trades,
+                'loss_count': num_losing_trades,
+                'win_rate': eval_env.trade_metrics['win_rate'] * 100,
+                'period_start': period_start,
+                'period_end': period_end,
+                'trade_metrics': eval_env.trade_metrics,
+                'max_drawdown': period_max_drawdown * 100,
+                'historical_max_drawdown': self.max_drawdown * 100
+            }
+
+            # One line per evaluation; eval_results_all.json is rebuilt from the log on demand
+            self.eval_log.append({**record, 'iteration': self.iteration, 'period': period_info})
+        
+        # Check if model should be saved as best
+        if self._should_save_model(metrics) and self.best_model_save_path is not None:
+            model_path = os.path.join(self.best_model_save_path, "best_model")
+            self.model.save(model_path)
+            
+            print(f"\n=== New Best Model Saved ===")
+            print(f"Combined Return: {metrics['combined']['return']*100:.2f}%")
+            print(f"Validation Return: {metrics['validation']['return']*100:.2f}%")
+            print(f"Consistency Score: {metrics['scores']['consistency']:.2f}")
+            print(f"Trade Quality: {metrics['scores']['combined_quality']:.2f}")
+        
+        # Print final scores summary
+        print("\n===== Final Performance Metrics =====")
+        print(f"Combined Dataset Score: {metrics['scores']['combined_quality']:.3f}")
+        print(f"Validation Score: {metrics['scores']['val_quality']:.3f}")
+        print(f"Overall Score: {metrics['combined']['return'] * 0.4 - metrics['combined']['max_drawdown'] * 0.3 + metrics['scores']['consistency'] * 0.2 + metrics['scores']['combined_quality'] * 0.1:.3f}")
+        
+        if hasattr(self.eval_env, 'env'):
+            self.eval_env.env.render()
+        else:
+            self.eval_env.render()
+        
+        return record
+
+
+def _evaluation_worker(jobs, results, model_path: str, store_directory: str,
+                       eval_window: Tuple[int, int], combined_window: Tuple[int, int],
+                       env_kwargs: Dict[str, Any], callback_kwargs: Dict[str, Any]) -> None:
+    """Run UnifiedEvalCallback evaluations on policy snapshots until a None job arrives."""
+    # One thread, so the evaluator does not compete with the learner for cores
+    th.set_num_threads(1)
+
+    store = attach(store_directory)
+    eval_env = Monitor(TradingEnv.from_feature_store(store, *eval_window, **env_kwargs))
+    combined_env = Monitor(TradingEnv.from_feature_store(store, *combined_window, **env_kwargs))
+
+    model = RecurrentPPO.load(model_path, device='cpu', print_system_info=False)
+    callback = UnifiedEvalCallback(eval_env, combined_env, eval_freq=0, **callback_kwargs)
+    callback.model = model
+
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            model.policy.load_state_dict({name: th.from_numpy(value) for name, value in job['policy'].items()})
+            model.num_timesteps = callback.num_timesteps = job['timesteps']
+            results.put(callback.evaluate())
+    finally:
+        results.put(None)
+
+
+class AsyncEvaluator:
+    """Evaluation process fed with policy snapshots through a bounded queue."""
+
+    def __init__(self, store_directory: str, eval_window: Tuple[int, int], combined_window: Tuple[int, int],
+                 env_kwargs: Optional[Dict[str, Any]] = None, max_pending: int = 1, **callback_kwargs: Any):
+        """
+        Args:
+            store_directory: Directory of a shared feature store (see SharedFeatureStore)
+            eval_window: (start, end) bar positions of the validation window
+            combined_window: (start, end) bar positions of the combined window
+            env_kwargs: Keyword arguments for TradingEnv.from_feature_store
+            max_pending: Maximum number of queued snapshots; later evaluations are
+                skipped while the queue is full
+            **callback_kwargs: Keyword arguments for the worker's UnifiedEvalCallback
+                (best_model_save_path, log_path, deterministic, verbose, iteration)
+        """
+        self.store_directory = store_directory
+        self.eval_window = eval_window
+        self.combined_window = combined_window
+        self.env_kwargs = {'random_start': False, **(env_kwargs or {})}
+        self.max_pending = max(1, max_pending)
+        self.callback_kwargs = callback_kwargs
+        self.submitted = 0
+        self.skipped = 0
+        self._process = None
+        self._model_dir = None
+
+    def start(self, model: RecurrentPPO) -> None:
+        """Start the evaluation process with the architecture and settings of a model."""
+        # The worker rebuilds the model from a saved copy; snapshots then only carry weights
+        self._model_dir = tempfile.mkdtemp(prefix='drl_eval_')
+        model_path = os.path.join(self._model_dir, 'model.zip')
+        model.save(model_path)
+
+        context = multiprocessing.get_context('spawn')
+        self._jobs = context.Queue(maxsize=self.max_pending)
+        self._results = context.Queue()
+        self._process = context.Process(
+            target=_evaluation_worker,
+            args=(self._jobs, self._results, model_path, self.store_directory, self.eval_window,
+                  self.combined_window, self.env_kwargs, self.callback_kwargs),
+            daemon=True
+        )
+        self._process.start()
+
+    def submit(self, policy: th.nn.Module, timesteps: int) -> bool:
+        """Queue a snapshot of the policy weights for evaluation.
+
+        Args:
+            policy: Policy to snapshot
+            timesteps: Training timesteps of the snapshot
+
+        Returns:
+            False if the evaluation was skipped because the queue is full
+        """
+        if self._jobs.full():
+            self.skipped += 1
+            return False
+        # Copied now; the queue pickles in a background thread while training continues
+        snapshot = {name: value.detach().cpu().numpy().copy() for name, value in policy.state_dict().items()}
+        try:
+            self._jobs.put_nowait({'policy': snapshot, 'timesteps': timesteps})
+        except queue.Full:
+            self.skipped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Collect the evaluation records finished so far without waiting."""
+        records = []
+        while self._process is not None:
+            try:
+                record = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if record is None:
+                break
+            records.append(record)
+        return records
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish the queued evaluations and stop the process.
+
+        Returns:
+            Evaluation records not yet collected by poll()
+        """
+        if self._process is None:
+            return []
+
+        records = []
+        self._jobs.put(None)
+        while True:
+            try:
+                record = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+                continue
+            if record is None:
+                break
+            records.append(record)
+
+        self._process.join()
+        self._process = None
+        shutil.rmtree(self._model_dir, ignore_errors=True)
+        return records
+
+
+class AsyncEvalCallback(BaseCallback):
+    """Callback that hands evaluations to an AsyncEvaluator instead of running them."""
+
+    def __init__(self, evaluator: AsyncEvaluator, eval_freq: int = 100000, verbose: int = 1,
+                 max_results: int = 100):
+        """
+        Args:
+            evaluator: Evaluator that runs the episodes in another process
+            eval_freq: Evaluate every eval_freq callback calls
+            verbose: Verbosity level
+            max_results: Number of recent evaluation records kept in memory
+        """
+        super().__init__(verbose=verbose)
+        self.evaluator = evaluator
+        self.eval_freq = eval_freq
+        self.eval_results = deque(maxlen=max_results)
+
+    def _on_training_start(self) -> None:
+        self.evaluator.start(self.model)
+
+    def _on_step(self) -> bool:
+        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
+            if not self.evaluator.submit(self.model.policy, self.num_timesteps) and self.verbose > 0:
+                print(f"\nSkipping evaluation at timesteps={self.num_timesteps}: evaluator busy")
+            self.eval_results.extend(self.evaluator.poll())
+        return True
+
+    def _on_training_end(self) -> None:
+        # Wait for the queued evaluations so their results and best model are on disk
+        self.eval_results.extend(self.evaluator.close())
+        if self.verbose > 0:
+            print(f"\nAsync evaluation finished: {self.evaluator.submitted} evaluated, "
+                  f"{self.evaluator.skipped} skipped")
@@ -0,0 +1,184 @@
+"""
+Shared evaluation pass for training callbacks.
+
+EvaluationBus runs the policy on the evaluation environment once per
+trigger and hands the cached result to every subscriber that is due
+(best-model saver, renderer, logger), so subscribers never run episodes
+of their own. When the policy is deterministic and the environment
+always starts at the first bar, every episode is identical; the bus then
+plays a single episode and reuses it for the requested episode count.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from trade_environment import TradingEnv
+
+
+def unwrap_trading_env(env) -> TradingEnv:
+    """Return the TradingEnv inside a chain of gym wrappers."""
+    while not isinstance(env, TradingEnv) and hasattr(env, 'env'):
+        env = env.env
+    return env
+
+
+class EvaluationResult:
+    """Balances, rewards and lengths of one evaluation's episodes."""
+
+    def __init__(self, timesteps: int, balances: List[float], rewards: List[float],
+                 lengths: List[int], repeated: bool = False):
+        """
+        Args:
+            timesteps: Training timesteps of the evaluated model
+            balances: Final balance of each episode
+            rewards: Total reward of each episode
+            lengths: Number of steps of each episode
+            repeated: Whether a single episode was reused for all episodes
+        """
+        self.timesteps = timesteps
+        self.balances = np.asarray(balances, dtype=np.float64)
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.repeated = repeated
+
+    @property
+    def n_episodes(self) -> int:
+        return len(self.balances)
+
+    @property
+    def mean_balance(self) -> float:
+        return float(np.mean(self.balances))
+
+    @property
+    def std_balance(self) -> float:
+        return float(np.std(self.balances))
+
+    @property
+    def mean_reward(self) -> float:
+        return float(np.mean(self.rewards))
+
+
+def run_evaluation(model, env, n_episodes: int = 1, deterministic: bool = True,
+                   timesteps: int = 0) -> EvaluationResult:
+    """Play evaluation episodes, skipping repeats that cannot differ.
+
+    Args:
+        model: Model whose predict() chooses the actions
+        env: Evaluation environment (a TradingEnv, possibly wrapped)
+        n_episodes: Number of episodes requested
+        deterministic: Whether to use deterministic actions
+        timesteps: Training timesteps recorded in the result
+
+    Returns:
+        EvaluationResult. The environment is left at the end of the last
+        episode played, so its trades and balance can be inspected.
+    """
+    trading_env = unwrap_trading_env(env)
+    repeated = deterministic and not trading_env.random_start and n_episodes > 1
+    n_played = 1 if repeated else n_episodes
+
+    balances, rewards, lengths = [], [], []
+    for _ in range(n_played):
+        obs, _ = env.reset()
+        done = False
+        episode_reward = 0.0
+        episode_length = 0
+
+        while not done:
+            action, _ = model.predict(obs, deterministic=deterministic)
+            obs, reward, terminated, truncated, _ = env.step(action)
+            done = terminated or truncated
+            episode_reward += reward
+            episode_length += 1
+
+        balances.append(trading_env.balance)
+        rewards.append(episode_reward)
+        lengths.append(episode_length)
+
+    if repeated:
+        balances, rewards, lengths = balances * n_episodes, rewards * n_episodes, lengths * n_episodes
+
+    return EvaluationResult(timesteps, balances, rewards, lengths, repeated=repeated)
+
+
+class EvaluationSubscriber:
+    """Consumer of EvaluationBus results.
+
+    Subclasses override on_evaluation; returning False stops training.
+    """
+
+    def __init__(self, eval_freq: int = 10000, verbose: int = 0):
+        """
+        Args:
+            eval_freq: Consume a result every eval_freq callback calls
+            verbose: Verbosity level
+        """
+        self.eval_freq = eval_freq
+        self.verbose = verbose
+
+    def is_due(self, n_calls: int) -> bool:
+        return self.eval_freq > 0 and n_calls % self.eval_freq == 0
+
+    def on_evaluation(self, result: EvaluationResult, model, env) -> bool:
+        """Consume an evaluation result.
+
+        Args:
+            result: Shared evaluation result
+            model: Evaluated model
+            env: Evaluation environment, left at the end of the last episode
+
+        Returns:
+            False to stop training
+        """
+        return True
+
+
+class EvaluationBus(BaseCallback):
+    """Callback that evaluates once per trigger and fans the result out to subscribers."""
+
+    def __init__(self, eval_env, n_eval_episodes: int = 5, deterministic: bool = True, verbose: int = 0):
+        """
+        Args:
+            eval_env: Evaluation environment shared by all subscribers
+            n_eval_episodes: Episodes per evaluation (repeats are skipped when identical)
+            deterministic: Whether to use deterministic actions
+            verbose: Verbosity level
+        """
+        super().__init__(verbose=verbose)
+        self.eval_env = eval_env
+        self.n_eval_episodes = n_eval_episodes
+        self.deterministic = deterministic
+        self.subscribers: List[EvaluationSubscriber] = []
+        self.evaluation_count = 0
+        self._cached: Optional[Tuple[int, EvaluationResult]] = None
+
+    def subscribe(self, subscriber: EvaluationSubscriber) -> EvaluationSubscriber:
+        """Register a subscriber and return it."""
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def evaluate(self) -> EvaluationResult:
+        """Evaluate the current model, reusing the result if it was already evaluated at these timesteps."""
+        if self._cached is not None and self._cached[0] == self.num_timesteps:
+            return self._cached[1]
+
+        result = run_evaluation(self.model, self.eval_env, self.n_eval_episodes,
+                                self.deterministic, timesteps=self.num_timesteps)
+        self.evaluation_count += 1
+        if self.verbose > 0 and result.repeated:
+            print(f"Deterministic policy on a fixed-start env: reused 1 episode for {result.n_episodes}")
+        self._cached = (self.num_timesteps, result)
+        return result
+
+    def _on_step(self) -> bool:
+        due = [subscriber for subscriber in self.subscribers if subscriber.is_due(self.n_calls)]
+        if not due:
+            return True
+
+        result = self.evaluate()
+        continue_training = True
+        for subscriber in due:
+            continue_training = subscriber.on_evaluation(result, self.model, self.eval_env) is not False and continue_training
+        return continue_training
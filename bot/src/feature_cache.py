@@ -0,0 +1,106 @@
+"""
+Content-addressed on-disk cache for computed trading features.
+
+Features are keyed by a hash of the OHLC arrays they are computed from,
+the indicator parameters and the feature version. Each entry is a
+directory of .npy files (feature matrix, ATR and valid-bar mask) that is
+loaded memory-mapped, so rebuilding an environment over data that was
+seen before costs a file open instead of an indicator pass.
+
+The cache is opt-in (--feature_cache / the 'feature_cache_dir' config
+key) and writes <cache_dir>/<key>/{features,atr,valid}.npy. Entries are
+never evicted; delete the directory to reclaim the space.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_PARAMS, FEATURE_VERSION, compute_features, ohlc_arrays
+
+
+class FeatureCache:
+    """Memory-mapped feature cache stored under a directory."""
+
+    FILES = ('features', 'atr', 'valid')
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding cache entries (created if missing)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(opens: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> str:
+        """Hash OHLC arrays together with indicator parameters and feature version."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps({'version': FEATURE_VERSION, 'params': FEATURE_PARAMS,
+                                  'length': len(close)}, sort_keys=True).encode())
+        for values in (opens, high, low, close):
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Load a cache entry memory-mapped (read-only), or None if missing."""
+        entry_dir = self._entry_dir(key)
+        try:
+            return tuple(np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r')
+                         for name in self.FILES)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, key: str, features: np.ndarray, atr: np.ndarray, valid: np.ndarray) -> None:
+        """Write a cache entry atomically (a concurrent writer of the same key wins or loses cleanly)."""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=self.cache_dir)
+        try:
+            for name, values in zip(self.FILES, (features, atr, valid)):
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def get_or_compute(self, opens: np.ndarray, high: np.ndarray, low: np.ndarray,
+                       close: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return cached features for the OHLC arrays, computing and storing them on a miss.
+
+        Returns:
+            Tuple of (features, atr, valid) as returned by compute_features
+        """
+        key = self.make_key(opens, high, low, close)
+        cached = self.load(key)
+        if cached is not None:
+            self.logger.debug(f"Feature cache hit: {key}")
+            return cached
+
+        self.logger.debug(f"Feature cache miss: {key}")
+        features, atr, valid = compute_features(opens, high, low, close)
+        self.save(key, features, atr, valid)
+        return features, atr, valid
+
+
+def load_features(data: pd.DataFrame, cache: Optional[FeatureCache] = None
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute features for a DataFrame, going through the cache when one is given."""
+    arrays = ohlc_arrays(data)
+    if cache is None:
+        return compute_features(*arrays)
+    return cache.get_or_compute(*arrays)
@@ -0,0 +1,125 @@
+"""
+Full-history feature store for walk-forward training.
+
+Features are computed once over the whole dataset and kept as a float32
+observation matrix plus the matching price arrays. Environments for a
+training or validation window take (start, end) views into these arrays
+instead of copying the window and recomputing its indicators, so the
+window setup cost no longer grows with the number of iterations.
+
+A store can be saved as a directory of .npy files and loaded back
+memory-mapped, which lets worker processes share one copy of the arrays.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_cache import FeatureCache, load_features
+from features import FEATURE_COLUMNS
+
+
+class FeatureStore:
+    """Causal feature matrix and price arrays over the valid bars of a dataset."""
+
+    PRICE_COLUMNS = ('close', 'high', 'low', 'spread')
+    ARRAYS = ('positions', 'index', 'features', 'obs_matrix', 'close', 'high', 'low', 'spread', 'atr')
+
+    def __init__(self, data: pd.DataFrame, feature_cache: Optional[FeatureCache] = None):
+        """
+        Compute (or load) features for the full dataset.
+
+        Args:
+            data: DataFrame with OHLC and spread columns
+            feature_cache: Optional on-disk feature cache
+
+        Raises:
+            ValueError: If required columns are missing
+        """
+        missing_columns = [col for col in ('open', *self.PRICE_COLUMNS) if col not in data.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+
+        features, atr, valid = load_features(data, feature_cache)
+
+        # Integer positions of the valid bars in the source data
+        self.positions = np.flatnonzero(valid)
+        index = data.index[self.positions]
+        self.index = index if isinstance(index, pd.DatetimeIndex) else pd.to_datetime(index)
+
+        # Observation layout of TradingEnv: features plus a zeroed P&L column
+        self.features = np.asarray(features)
+        self.obs_matrix = np.zeros((len(self.positions), len(FEATURE_COLUMNS) + 1), dtype=np.float32)
+        self.obs_matrix[:, :-1] = self.features
+
+        self.prices: Dict[str, np.ndarray] = {
+            col: np.ascontiguousarray(data[col].values[self.positions]) for col in self.PRICE_COLUMNS
+        }
+        self.prices['atr'] = np.asarray(atr)
+        self.directory = None
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'FeatureStore':
+        """Load a store saved with save(), memory-mapped read-only by default.
+
+        Args:
+            directory: Directory written by save()
+            mmap_mode: np.load memory-map mode (None loads into memory)
+
+        Returns:
+            FeatureStore backed by the files in the directory
+        """
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        store = cls.__new__(cls)
+        store.positions = arrays['positions']
+        store.index = pd.DatetimeIndex(arrays['index'])
+        store.features = arrays['features']
+        store.obs_matrix = arrays['obs_matrix']
+        store.prices = {name: arrays[name] for name in (*cls.PRICE_COLUMNS, 'atr')}
+        store.directory = directory
+        return store
+
+    def save(self, directory: str) -> None:
+        """Write the store arrays as .npy files into a directory."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'positions': self.positions,
+            'index': self.index.values,
+            'features': self.features,
+            'obs_matrix': self.obs_matrix,
+            **self.prices
+        }
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+
+    def __reduce__(self):
+        # Stores loaded from disk pickle as their directory, so sending one to
+        # a worker process maps the same files instead of copying the arrays
+        if self.directory is not None:
+            return FeatureStore.load, (self.directory,)
+        return super().__reduce__()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def rows(self, start: int = 0, end: Optional[int] = None) -> Tuple[int, int]:
+        """Map a bar range of the source data to the store rows it contains.
+
+        Args:
+            start: First bar position in the source data (inclusive)
+            end: Last bar position in the source data (exclusive), None for the end
+
+        Returns:
+            Tuple of (first_row, end_row) into the store arrays
+        """
+        first = int(np.searchsorted(self.positions, start, side='left'))
+        last = len(self) if end is None else int(np.searchsorted(self.positions, end, side='left'))
+        return first, last
+
+    def frame(self, first_row: int, end_row: int) -> pd.DataFrame:
+        """Build a feature DataFrame for a row range of the store."""
+        return pd.DataFrame(self.features[first_row:end_row], index=self.index[first_row:end_row],
+                            columns=FEATURE_COLUMNS)
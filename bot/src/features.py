@@ -0,0 +1,156 @@
+"""
+Technical feature computation for the trading environment.
+
+Computes the observation features used by TradingEnv (returns, RSI, ATR,
+volatility breakout, trend strength and candle pattern) from raw OHLC
+arrays, together with the raw ATR and the mask of bars whose indicators
+are fully warmed up.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever the feature math changes so cached features are invalidated
+FEATURE_VERSION = "2"
+
+FEATURE_COLUMNS = ['returns', 'rsi', 'atr', 'volatility_breakout', 'trend_strength', 'candle_pattern']
+
+FEATURE_PARAMS: Dict[str, int] = {
+    'atr_period': 14,
+    'rsi_period': 14,
+    'bollinger_period': 20,
+    'atr_norm_window': 1000,
+}
+
+
+def compute_features(opens: np.ndarray, high: np.ndarray, low: np.ndarray,
+                     close: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate all technical features from OHLC arrays.
+
+    Args:
+        opens: Open prices
+        high: High prices
+        low: Low prices
+        close: Close prices
+
+    Returns:
+        Tuple of (features, atr, valid) where features is a float64 matrix of
+        the valid bars in FEATURE_COLUMNS order, atr the raw ATR of the valid
+        bars and valid a boolean mask over the input bars
+    """
+    atr_period = FEATURE_PARAMS['atr_period']
+    rsi_period = FEATURE_PARAMS['rsi_period']
+    bollinger_period = FEATURE_PARAMS['bollinger_period']
+    atr_norm_window = FEATURE_PARAMS['atr_norm_window']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # ===== CALCULATE TECHNICAL INDICATORS =====
+
+        # Calculate ATR
+        tr = np.maximum(high - low,
+                      np.maximum(np.abs(high - np.roll(close, 1)),
+                               np.abs(low - np.roll(close, 1))))
+        tr[0] = high[0] - low[0]  # Fix first value
+
+        atr = pd.Series(tr).rolling(atr_period).mean().values
+
+        # Calculate RSI
+        delta = pd.Series(close).diff().fillna(0).values
+        gain = pd.Series(np.where(delta > 0, delta, 0)).rolling(window=rsi_period).mean().values
+        loss = pd.Series(np.where(delta < 0, -delta, 0)).rolling(window=rsi_period).mean().values
+
+        # Avoid division by zero
+        rs = np.zeros_like(gain)
+        mask = loss != 0
+        rs[mask] = gain[mask] / loss[mask]
+        rsi = 100 - (100 / (1 + rs))
+
+        # Returns Calculation
+        returns = np.diff(close) / close[:-1]
+        returns = np.insert(returns, 0, 0)
+        returns = np.clip(returns, -0.1, 0.1)
+
+        # Calculate Trend Strength (ADX-based)
+        pdm = np.maximum(high[1:] - high[:-1], 0)  # Positive directional movement
+        ndm = np.maximum(low[:-1] - low[1:], 0)    # Negative directional movement
+        pdm = np.insert(pdm, 0, 0)  # Add 0 at start
+        ndm = np.insert(ndm, 0, 0)  # Add 0 at start
+
+        # Smooth DM values with fillna to handle NaN values
+        pdm_smooth = pd.Series(pdm).rolling(atr_period, min_periods=1).mean().fillna(0)
+        ndm_smooth = pd.Series(ndm).rolling(atr_period, min_periods=1).mean().fillna(0)
+
+        # Calculate directional indicators with safe values
+        atr_safe = np.where(atr < 1e-8, 1e-8, atr)  # Prevent division by zero
+        pdi = (pdm_smooth.values / atr_safe) * 100
+        ndi = (ndm_smooth.values / atr_safe) * 100
+
+        # Calculate DX and ADX with proper NaN handling
+        sum_di = pdi + ndi
+        sum_di = np.where(sum_di < 1e-8, 1e-8, sum_di)  # Prevent division by zero
+        dx = np.abs(pdi - ndi) / sum_di * 100
+        adx = pd.Series(dx).rolling(atr_period, min_periods=1).mean().fillna(0).values
+        trend_strength = np.clip(adx/25 - 1, -1, 1)
+
+        # Volatility Breakout using Bollinger Bands with improved NaN handling
+        boll_std = pd.Series(close).rolling(bollinger_period, min_periods=1).std().fillna(0).values
+        ma20 = pd.Series(close).rolling(bollinger_period, min_periods=1).mean().fillna(close[0]).values
+        upper_band = ma20 + (boll_std * 2)
+        lower_band = ma20 - (boll_std * 2)
+
+        # Safer division with explicit NaN handling
+        band_range = (upper_band - lower_band)
+        band_range = np.where(band_range < 1e-8, 1e-8, band_range)  # Prevent division by zero
+
+        position = close - lower_band
+        volatility_breakout = np.divide(position, band_range, out=np.zeros_like(position), where=band_range!=0)
+        volatility_breakout = np.clip(volatility_breakout, 0, 1)
+
+        # Combined Price Action Signal
+        body = close - opens
+        upper_wick = high - np.maximum(close, opens)
+        lower_wick = np.minimum(close, opens) - low
+        range_ = high - low + 1e-8
+
+        # Combine body_to_range and wick_ratio into one signal
+        candle_pattern = (body/range_ +
+                       (upper_wick - lower_wick)/(upper_wick + lower_wick + 1e-8)) / 2
+        candle_pattern = np.clip(candle_pattern, -1, 1)
+
+        # Normalize ATR ratio against its trailing min/max so every value only
+        # depends on past bars and a window slice matches the full-history series
+        atr_ratio = atr / close
+        atr_ratio_series = pd.Series(atr_ratio)
+        atr_min = atr_ratio_series.rolling(atr_norm_window, min_periods=1).min().values
+        atr_max = atr_ratio_series.rolling(atr_norm_window, min_periods=1).max().values
+
+        # Optimized feature set, in FEATURE_COLUMNS order
+        features = np.column_stack([
+            returns,
+            rsi / 50 - 1,  # Normalize to [-1, 1]
+            2 * (atr_ratio - atr_min) / (atr_max - atr_min + 1e-8) - 1,
+            volatility_breakout,
+            trend_strength,
+            candle_pattern,
+        ])
+
+    # Drop bars with missing values, then the lookback period of the longest
+    # indicator window so all indicators are properly calculated
+    lookback = max(bollinger_period, atr_period)
+    valid = ~np.isnan(features).any(axis=1)
+    valid[np.flatnonzero(valid)[:lookback]] = False
+
+    return features[valid], atr[valid], valid
+
+
+def compute_features_frame(data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate features from a DataFrame with open/high/low/close columns."""
+    return compute_features(*ohlc_arrays(data))
+
+
+def ohlc_arrays(data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Extract contiguous float64 open/high/low/close arrays from a DataFrame."""
+    return tuple(np.ascontiguousarray(data[col].values, dtype=np.float64)
+                 for col in ('open', 'high', 'low', 'close'))
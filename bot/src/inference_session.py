@@ -0,0 +1,193 @@
+"""
+Persistent per-bar inference session for a trained PPO-LSTM model.
+
+The session keeps the LSTM state, the streaming indicator state and a
+simulated position between calls, so each new bar costs one feature
+update and one policy forward pass regardless of how much history has
+been seen. Trade simulation mirrors TradingEnv.step: the action chosen on
+a bar is executed at the next bar's close, using the spread of the bar on
+which it was chosen.
+"""
+
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch as th
+
+from features import FEATURE_COLUMNS
+from position_sizing import lot_sizes
+from streaming_features import StreamingFeatures
+
+ACTION_DESCRIPTIONS = ['hold', 'buy', 'sell', 'close']
+
+
+class InferenceSession:
+    """Stateful bar-by-bar prediction with the same semantics as TradingEnv."""
+
+    # Trading constants (match TradingEnv)
+    POINT_VALUE = 0.01
+    MIN_LOTS = 0.01
+    MAX_LOTS = 100.0
+    MAX_DRAWDOWN = 0.5
+
+    def __init__(self, model: Any, initial_balance: float = 10000.0, balance_per_lot: float = 1000.0,
+                 deterministic: bool = True):
+        """
+        Initialize the session.
+
+        Args:
+            model: Loaded RecurrentPPO model
+            initial_balance: Starting balance of the simulated account
+            balance_per_lot: Account balance required per 0.01 lot
+            deterministic: Whether to use deterministic actions
+        """
+        self.model = model
+        self.initial_balance = initial_balance
+        self.BALANCE_PER_LOT = balance_per_lot
+        self.deterministic = deterministic
+
+        # The policy is called directly with tensors kept between bars, which
+        # skips predict()'s numpy <-> tensor round trip of the LSTM state
+        self.policy = model.policy
+        self.policy.set_training_mode(False)
+        self.device = self.policy.device
+        
+        self.features = StreamingFeatures()
+        self._obs = np.zeros(len(FEATURE_COLUMNS) + 1, dtype=np.float32)
+        self._obs_tensor = th.from_numpy(self._obs).unsqueeze(0)  # shares memory with _obs
+        self._episode_start = th.ones(1, dtype=th.float32, device=self.device)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear indicator, LSTM and account state."""
+        self.features.reset()
+        self.bars_seen = 0
+        self.last_time = None
+        self._pending_action = None
+        self._spread = 0.0
+        self.reset_account()
+
+    def reset_account(self) -> None:
+        """Start a new simulated episode: flat account and fresh LSTM state."""
+        self.balance = self.initial_balance
+        self.max_balance = self.initial_balance
+        self.position: Optional[Dict[str, float]] = None
+        self._lstm_states = None
+        self._episode_start.fill_(1.0)
+
+    @property
+    def lstm_states(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """LSTM hidden and cell states as NumPy arrays (None before the first prediction)."""
+        if self._lstm_states is None:
+            return None
+        return tuple(state.cpu().numpy() for state in self._lstm_states)
+
+    def on_bar(self, bar: Mapping[str, float], time: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """Process a closed bar and return the action for it.
+
+        Args:
+            bar: Mapping with open, high, low, close and spread values
+            time: Optional bar timestamp, kept to skip already seen bars
+
+        Returns:
+            Prediction dictionary, or None while the indicators warm up
+        """
+        close = float(bar['close'])
+        spread = float(bar['spread']) * self.POINT_VALUE
+        features = self.features.update(bar['open'], bar['high'], bar['low'], close)
+        self.bars_seen += 1
+        self.last_time = time
+
+        if features is None:
+            self._spread = spread
+            return None
+
+        # Execute the previous decision at this bar's close with the previous bar's spread
+        if self._pending_action is not None:
+            self._apply_action(self._pending_action, close)
+
+        unrealized_pnl = self._unrealized_pnl(close)
+        obs = self._obs
+        obs[:-1] = features
+        obs[-1] = min(1.0, max(-1.0, unrealized_pnl / self.initial_balance)) if self.position else 0.0
+
+        with th.no_grad():
+            if self._lstm_states is None:
+                zeros = th.zeros(self.policy.lstm_hidden_state_shape, device=self.device)
+                self._lstm_states = (zeros, zeros.clone())
+            action, self._lstm_states = self.policy._predict(
+                self._obs_tensor.to(self.device),
+                lstm_states=self._lstm_states,
+                episode_starts=self._episode_start,
+                deterministic=self.deterministic
+            )
+        self._episode_start.fill_(0.0)
+
+        # Process action (0=hold, 1=buy, 2=sell, 3=close)
+        discrete_action = int(action.item()) % 4
+        self._pending_action = discrete_action
+        self._spread = spread
+
+        return {
+            'action': discrete_action,
+            'description': ACTION_DESCRIPTIONS[discrete_action],
+            'direction': int(self.position['direction']) if self.position else 0,
+            'unrealized_pnl': unrealized_pnl,
+            'balance': self.balance
+        }
+
+    def on_bars(self, data: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """Feed every bar of a DataFrame newer than the last seen bar.
+
+        Args:
+            data: DataFrame with open, high, low, close and spread columns
+
+        Returns:
+            Prediction for the last new bar, or None if there was none or
+            the indicators are still warming up
+        """
+        if self.last_time is not None:
+            data = data[data.index > self.last_time]
+
+        result = None
+        columns = [data[col].values for col in ('open', 'high', 'low', 'close', 'spread')]
+        for time, *values in zip(data.index, *columns):
+            result = self.on_bar(dict(zip(('open', 'high', 'low', 'close', 'spread'), values)), time)
+        return result
+
+    def _unrealized_pnl(self, price: float) -> float:
+        """Calculate the open position's P/L at a price."""
+        if not self.position:
+            return 0.0
+        if self.position['direction'] == 1:
+            profit_points = price - self.position['entry_price']
+        else:
+            profit_points = self.position['entry_price'] - price
+        return profit_points * self.position['lot_size']
+
+    def _apply_action(self, action: int, price: float) -> None:
+        """Apply an action to the simulated account like TradingEnv.step."""
+        self.max_balance = max(self.balance, self.max_balance)
+
+        if action in (1, 2) and self.position is None:
+            lot_size = float(lot_sizes(self.balance, self.BALANCE_PER_LOT, self.MIN_LOTS, self.MAX_LOTS))
+            self.position = {
+                'direction': 1 if action == 1 else -1,
+                'entry_price': price + (self._spread if action == 1 else -self._spread),
+                'lot_size': lot_size
+            }
+        elif action == 3 and self.position is not None:
+            self._close_position(price)
+
+        # End of episode on blown account or max drawdown, as in the environment
+        drawdown = (self.max_balance - self.balance) / self.max_balance
+        if self.balance <= 0 or drawdown >= self.MAX_DRAWDOWN:
+            if self.position is not None:
+                self._close_position(price)
+            self.reset_account()
+
+    def _close_position(self, price: float) -> None:
+        """Close the simulated position and book its P/L."""
+        self.balance += self._unrealized_pnl(price)
+        self.position = None
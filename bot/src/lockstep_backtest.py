@@ -0,0 +1,312 @@
+"""
+Lockstep backtest of several recurrent policies over the same bars.
+
+run_lockstep advances one lane per policy over a shared TradingEnv feature
+matrix: every bar, each lane's observation is built from the matrix and the
+lane's position, all policies choose their actions, and the lanes are
+stepped together with TradingEnv.step semantics. When the policies share an
+architecture, FusedPolicies stacks their weights and evaluates every
+policy's LSTM and actor network in one batched forward per bar; otherwise
+each policy runs its own forward on its lane. verify_parity checks a
+single-model lockstep run against the model's own backtest.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.torch_layers import FlattenExtractor
+
+from trade_environment import TradingEnv
+from trade_ledger import TradeLedger
+from vec_trading_env import TradingLanes
+
+LSTMStates = Tuple[np.ndarray, np.ndarray]
+
+
+class FusedPolicies:
+    """Actor forward of K architecturally identical RecurrentPPO policies as batched tensor ops.
+
+    The LSTM weights, MLP layers and action head of every policy are stacked
+    along a leading policy dimension, so one call evaluates the actor of all
+    K policies on one observation each. Results match the individual
+    policies up to floating-point summation order.
+    """
+
+    def __init__(self, policies: Sequence[Any]):
+        """
+        Args:
+            policies: RecurrentActorCriticPolicy instances accepted by can_fuse()
+
+        Raises:
+            ValueError: If the policies cannot be fused
+        """
+        if not self.can_fuse(policies):
+            raise ValueError("Policies do not share a fusable architecture")
+        first = policies[0]
+        self.device = first.device
+        self.n_layers = first.lstm_actor.num_layers
+
+        def stack(get) -> th.Tensor:
+            return th.stack([get(policy).detach() for policy in policies]).to(self.device)
+
+        self.lstm = [
+            tuple(stack(lambda p, name=f"{kind}_l{layer}": getattr(p.lstm_actor, name))
+                  for kind in ('weight_ih', 'weight_hh', 'bias_ih', 'bias_hh'))
+            for layer in range(self.n_layers)
+        ]
+
+        # Actor MLP: stacked (weight, bias) for linear layers, the module itself for activations
+        self.mlp = []
+        for index, module in enumerate(first.mlp_extractor.policy_net):
+            if isinstance(module, th.nn.Linear):
+                self.mlp.append((stack(lambda p, i=index: p.mlp_extractor.policy_net[i].weight),
+                                 stack(lambda p, i=index: p.mlp_extractor.policy_net[i].bias)))
+            else:
+                self.mlp.append(module)
+        self.action_weight = stack(lambda p: p.action_net.weight)
+        self.action_bias = stack(lambda p: p.action_net.bias)
+
+        for policy in policies:
+            policy.set_training_mode(False)
+
+    @staticmethod
+    def can_fuse(policies: Sequence[Any]) -> bool:
+        """Whether the policies have identical actor architectures this class can evaluate."""
+        first = policies[0]
+        if not isinstance(first.action_space, spaces.Discrete):
+            return False
+
+        def layout(policy) -> Optional[tuple]:
+            lstm = policy.lstm_actor
+            if (not isinstance(policy.pi_features_extractor, FlattenExtractor) or not lstm.bias
+                    or lstm.batch_first or lstm.bidirectional or getattr(lstm, 'proj_size', 0)):
+                return None
+            modules = list(policy.mlp_extractor.policy_net)
+            if any(not isinstance(m, th.nn.Linear) and any(True for _ in m.parameters()) for m in modules):
+                return None
+            return (type(policy), str(policy.device),
+                    tuple((name, tuple(param.shape)) for name, param in lstm.named_parameters()),
+                    tuple((type(m).__name__, tuple(m.weight.shape) if isinstance(m, th.nn.Linear) else ())
+                          for m in modules),
+                    tuple(policy.action_net.weight.shape))
+
+        reference = layout(first)
+        return reference is not None and all(layout(policy) == reference for policy in policies[1:])
+
+    def forward(self, obs: th.Tensor, lstm_states: Tuple[th.Tensor, th.Tensor],
+                deterministic: bool = True) -> Tuple[th.Tensor, Tuple[th.Tensor, th.Tensor]]:
+        """Choose one action per policy.
+
+        Args:
+            obs: Observations of shape (K, n_features), row k for policy k
+            lstm_states: Hidden and cell states of shape (n_layers, K, hidden_size)
+            deterministic: Take the most likely action instead of sampling
+
+        Returns:
+            Actions of shape (K,) and the new LSTM states
+        """
+        hidden, cell = lstm_states
+        new_hidden, new_cell = [], []
+        x = obs.float()
+        for layer, (weight_ih, weight_hh, bias_ih, bias_hh) in enumerate(self.lstm):
+            gates = (th.einsum('kf,kgf->kg', x, weight_ih) + bias_ih
+                     + th.einsum('kh,kgh->kg', hidden[layer], weight_hh) + bias_hh)
+            input_gate, forget_gate, cell_gate, output_gate = gates.chunk(4, dim=1)
+            c = th.sigmoid(forget_gate) * cell[layer] + th.sigmoid(input_gate) * th.tanh(cell_gate)
+            x = th.sigmoid(output_gate) * th.tanh(c)
+            new_hidden.append(x)
+            new_cell.append(c)
+
+        for layer in self.mlp:
+            if isinstance(layer, tuple):
+                weight, bias = layer
+                x = th.einsum('ki,koi->ko', x, weight) + bias
+            else:
+                x = layer(x)
+        logits = th.einsum('ki,koi->ko', x, self.action_weight) + self.action_bias
+
+        if deterministic:
+            actions = logits.argmax(dim=1)
+        else:
+            actions = th.distributions.Categorical(logits=logits).sample()
+        return actions, (th.stack(new_hidden), th.stack(new_cell))
+
+
+class LaneResult:
+    """Account outcome of one policy's lane, shaped like a finished TradingEnv episode."""
+
+    def __init__(self, trades: TradeLedger, initial_balance: float):
+        self.trades = trades
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.win_count = 0
+        self.loss_count = 0
+        self.total_steps = 0
+        self.total_reward = 0.0
+        self.current_position = None
+        self.equity = np.zeros(0, dtype=np.float64)
+
+
+def run_lockstep(policies: Sequence[Any], env: TradingEnv,
+                 lstm_states: Optional[Sequence[Optional[LSTMStates]]] = None,
+                 deterministic: bool = True, fuse: bool = True) -> List[LaneResult]:
+    """Backtest every policy over the environment's bars in a single pass.
+
+    Each lane starts at the first bar with its policy's initial LSTM state
+    and follows TradingEnv.step: the action chosen on a bar fills at the
+    next bar's close with the chosen bar's spread, and a lane stops at the
+    last bar, at ruin or at the maximum drawdown, closing any open position.
+
+    Args:
+        policies: RecurrentActorCriticPolicy of each model
+        env: Environment providing the features, prices and trading constants
+        lstm_states: Initial (hidden, cell) state per policy with a batch size
+            of 1 (zeros where None)
+        deterministic: Whether to use deterministic actions
+        fuse: Evaluate the policies in one batched forward when their
+            architectures match
+
+    Returns:
+        LaneResult per policy, in order
+    """
+    env = env.unwrapped
+    n_lanes = len(policies)
+    lanes = TradingLanes(n_lanes, env.initial_balance, env.BALANCE_PER_LOT, env.MIN_LOTS, env.MAX_LOTS)
+    results = [LaneResult(TradeLedger(index=env.original_index), env.initial_balance) for _ in range(n_lanes)]
+    close_prices = np.asarray(env.prices['close'], dtype=np.float64)
+    atr = np.asarray(env.prices['atr'], dtype=np.float64)
+    spread_cost = np.asarray(env.prices['spread'], dtype=np.float64) * env.POINT_VALUE
+    obs_matrix = env.obs_matrix
+
+    # Per-policy LSTM states as tensors of shape (n_layers, 1, hidden_size)
+    states = []
+    for i, policy in enumerate(policies):
+        policy.set_training_mode(False)
+        initial = lstm_states[i] if lstm_states is not None else None
+        if initial is None:
+            zeros = th.zeros(policy.lstm_hidden_state_shape, device=policy.device)
+            initial = (zeros, zeros.clone())
+        states.append(tuple(th.as_tensor(state, device=policy.device) for state in initial))
+
+    fused = FusedPolicies(policies) if fuse and n_lanes > 1 and FusedPolicies.can_fuse(policies) else None
+    if fused is not None:
+        fused_states = tuple(th.cat([state[j] for state in states], dim=1) for j in range(2))
+    else:
+        episode_start = [th.zeros(1, device=policy.device) for policy in policies]
+
+    active = np.ones(n_lanes, dtype=bool)
+    total_reward = np.zeros(n_lanes, dtype=np.float64)
+    steps = np.zeros(n_lanes, dtype=np.int64)
+    obs = np.zeros((n_lanes, obs_matrix.shape[1]), dtype=np.float32)
+    equity = np.zeros((env.data_length, n_lanes), dtype=np.float64)
+    step = 0
+
+    with th.no_grad():
+        while active.any():
+            price = np.full(n_lanes, close_prices[step])
+            obs[:] = obs_matrix[step]
+            obs[:, -1] = np.clip(lanes.unrealized_pnl(price) / env.initial_balance, -1, 1)
+
+            if fused is not None:
+                fused_actions, fused_states = fused.forward(
+                    th.as_tensor(obs, device=fused.device), fused_states, deterministic)
+                actions = fused_actions.cpu().numpy().astype(np.int64) % 4
+            else:
+                actions = np.zeros(n_lanes, dtype=np.int64)
+                for i in np.flatnonzero(active):
+                    policy = policies[i]
+                    action, states[i] = policy._predict(
+                        th.as_tensor(obs[i:i + 1], device=policy.device),
+                        lstm_states=states[i],
+                        episode_starts=episode_start[i],
+                        deterministic=deterministic
+                    )
+                    actions[i] = int(action.item()) % 4
+
+            # Step the active lanes as TradingEnv.step does
+            spread = np.full(n_lanes, spread_cost[step])
+            previous_balance = lanes.balance.copy()
+            np.maximum(lanes.max_balance, lanes.balance, out=lanes.max_balance)
+            step += 1
+            steps[active] = step
+            price = np.full(n_lanes, close_prices[step])
+
+            lanes.open(active & ((actions == 1) | (actions == 2)),
+                       np.where(actions == 1, 1, -1).astype(np.int8), price, spread, steps)
+            _record_closes(lanes, active & (actions == 3), price, step, atr, env.PIP_VALUE, results)
+
+            drawdown = (lanes.max_balance - lanes.balance) / lanes.max_balance
+            done = active & ((step >= env.data_length - 1) | (lanes.balance <= 0)
+                             | (drawdown >= env.MAX_DRAWDOWN))
+            _record_closes(lanes, done, price, step, atr, env.PIP_VALUE, results)
+
+            total_reward[active] += (lanes.balance[active] - previous_balance[active]) / env.initial_balance
+            equity[step - 1, active] = (lanes.balance + lanes.unrealized_pnl(price))[active]
+            active &= ~done
+
+    for i, result in enumerate(results):
+        result.balance = float(lanes.balance[i])
+        result.total_steps = int(steps[i])
+        result.total_reward = float(total_reward[i])
+        result.equity = equity[:steps[i], i].copy()
+    return results
+
+
+def _record_closes(lanes: TradingLanes, mask: np.ndarray, price: np.ndarray, step: int,
+                   atr: np.ndarray, pip_value: float, results: List[LaneResult]) -> None:
+    """Close the selected lanes' positions and append the trades to their ledgers."""
+    closing = np.flatnonzero(mask & (lanes.direction != 0))
+    if not len(closing):
+        return
+    entry_price = lanes.entry_price[closing]
+    entry_step = lanes.entry_step[closing]
+    direction = lanes.direction[closing].astype(np.int64)
+    lot_size = lanes.lot_size[closing]
+    pnl = lanes.close(mask, price)[closing]
+
+    for i, lane in enumerate(closing):
+        result = results[lane]
+        profit_points = (price[lane] - entry_price[i]) * direction[i]
+        result.trades.append(
+            entry_step=entry_step[i],
+            exit_step=step,
+            entry_price=entry_price[i],
+            exit_price=price[lane],
+            pnl=pnl[i],
+            profit_pips=profit_points / pip_value,
+            direction=direction[i],
+            lot_size=lot_size[i],
+            entry_atr=atr[entry_step[i]]
+        )
+        if pnl[i] > 0:
+            result.win_count += 1
+        else:
+            result.loss_count += 1
+
+
+def verify_parity(model: Any, data: pd.DataFrame, initial_balance: float = 10000.0,
+                  balance_per_lot: float = 1000.0) -> bool:
+    """Check an unfused single-model lockstep backtest against TradeModel.backtest.
+
+    Args:
+        model: Loaded TradeModel
+        data: DataFrame with market data
+        initial_balance: Starting account balance
+        balance_per_lot: Account balance required per 0.01 lot
+
+    Returns:
+        bool: True if trades, account totals and the equity curve match exactly
+    """
+    expected = model.backtest(data, initial_balance, balance_per_lot)
+    actual = model.backtest_lockstep([model], data, initial_balance, balance_per_lot, fuse=False)[0]
+
+    trades_match = pd.DataFrame(expected['trades']).equals(pd.DataFrame(actual['trades']))
+    totals_match = all(expected[key] == actual[key]
+                       for key in ('final_balance', 'total_trades', 'win_count', 'loss_count', 'total_steps'))
+    equity_match = np.array_equal(expected['equity_curve'], actual['equity_curve'])
+    print(f"  {len(expected['trades'])} trades, {expected['total_steps']} steps, "
+          f"trades: {trades_match}, totals: {totals_match}, equity: {equity_match}")
+    return trades_match and totals_match and equity_match
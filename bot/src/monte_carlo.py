@@ -0,0 +1,186 @@
+"""
+Bootstrap Monte Carlo on a finished backtest.
+
+Instead of replaying the model, the simulations resample what one backtest
+already produced: the per-trade P/L and the bar-level equity curve. Trade
+paths shuffle the trade order and randomly skip trades; bar paths draw a
+stationary block bootstrap of bar returns, which keeps short-range
+dependence such as volatility clusters. Every method builds its paths as
+NumPy arrays in chunks of simulations, so thousands of simulations take
+seconds and memory stays bounded by the chunk size.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+# Path values generated per chunk of simulations (bounds memory for long paths)
+CHUNK_ELEMENTS = 4_000_000
+
+
+def _chunk_size(path_length: int, chunk_size: Optional[int]) -> int:
+    """Simulations per chunk: chunk_size if given, else as many as fit in CHUNK_ELEMENTS."""
+    return chunk_size or max(1, CHUNK_ELEMENTS // max(path_length, 1))
+
+
+def max_drawdown(paths: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Maximum peak-to-trough drawdown (fraction) of each balance path (one row per path)."""
+    if paths.shape[1] == 0:
+        return np.zeros(len(paths))
+    peak = np.maximum.accumulate(np.maximum(paths, initial_balance), axis=1)
+    drawdown = np.divide(peak - paths, peak, out=np.zeros_like(paths), where=peak > 0)
+    return np.maximum(drawdown.max(axis=1), 0.0)
+
+
+def trade_paths(pnl: np.ndarray, n_sims: int, initial_balance: float, shuffle: bool = True,
+                skip_prob: float = 0.0, rng: Optional[np.random.Generator] = None,
+                chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Resample trade sequences and measure each path.
+
+    Args:
+        pnl: Realized P/L of each trade, in order
+        n_sims: Number of simulated paths
+        initial_balance: Starting balance of every path
+        shuffle: Randomly permute the trade order of each path
+        skip_prob: Probability that each trade is left out of a path
+        rng: Random generator
+        chunk_size: Paths generated per chunk (sized from the path length if None)
+
+    Returns:
+        Dict with return_pct, max_drawdown_pct, win_rate and total_trades per path
+    """
+    rng = rng or np.random.default_rng()
+    pnl = np.asarray(pnl, dtype=np.float64)
+    results = {name: np.zeros(n_sims) for name in ('return_pct', 'max_drawdown_pct', 'win_rate', 'total_trades')}
+
+    chunk_size = _chunk_size(len(pnl), chunk_size)
+    for first in range(0, n_sims, chunk_size):
+        n = min(chunk_size, n_sims - first)
+        chunk = np.broadcast_to(pnl, (n, len(pnl)))
+        if shuffle:
+            chunk = rng.permuted(chunk, axis=1)
+        taken = rng.random(chunk.shape) >= skip_prob if skip_prob > 0 else np.ones(chunk.shape, dtype=bool)
+        chunk = np.where(taken, chunk, 0.0)
+
+        paths = initial_balance + np.cumsum(chunk, axis=1)
+        final = paths[:, -1] if len(pnl) else np.full(n, initial_balance)
+        n_taken = taken.sum(axis=1)
+        part = slice(first, first + n)
+        results['return_pct'][part] = (final / initial_balance - 1) * 100
+        results['max_drawdown_pct'][part] = max_drawdown(paths, initial_balance) * 100
+        results['win_rate'][part] = np.divide(((chunk > 0) & taken).sum(axis=1) * 100.0, n_taken,
+                                              out=np.zeros(n), where=n_taken > 0)
+        results['total_trades'][part] = n_taken
+
+    return results
+
+
+def stationary_bootstrap_indices(n_bars: int, n_sims: int, mean_block: float,
+                                 rng: np.random.Generator) -> np.ndarray:
+    """Index paths of the stationary bootstrap (Politis and Romano).
+
+    Each path starts a new block at a random bar with probability
+    1 / mean_block per step and otherwise continues the current block,
+    wrapping around the end of the series.
+
+    Returns:
+        Array of shape (n_sims, n_bars) of bar indices
+    """
+    positions = np.arange(n_bars)
+    new_block = rng.random((n_sims, n_bars)) < 1.0 / max(mean_block, 1.0)
+    new_block[:, 0] = True
+    starts = rng.integers(0, n_bars, size=(n_sims, n_bars))
+    # Position at which the block covering each step began
+    block_begin = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+    block_start = np.take_along_axis(starts, block_begin, axis=1)
+    return (block_start + positions - block_begin) % n_bars
+
+
+def bar_paths(equity: np.ndarray, n_sims: int, initial_balance: float, mean_block: float = 20.0,
+              rng: Optional[np.random.Generator] = None,
+              chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Stationary block bootstrap of bar returns and measure each path.
+
+    Args:
+        equity: Balance plus unrealized P/L after each backtest step
+        n_sims: Number of simulated paths
+        initial_balance: Balance before the first step
+        mean_block: Mean block length in bars
+        rng: Random generator
+        chunk_size: Paths generated per chunk (sized from the path length if None)
+
+    Returns:
+        Dict with return_pct and max_drawdown_pct per path
+    """
+    rng = rng or np.random.default_rng()
+    equity = np.asarray(equity, dtype=np.float64)
+    previous = np.concatenate(([initial_balance], equity[:-1]))
+    returns = np.divide(equity, previous, out=np.ones_like(equity), where=previous > 0) - 1
+    results = {name: np.zeros(n_sims) for name in ('return_pct', 'max_drawdown_pct')}
+    if not len(returns):
+        return results
+
+    chunk_size = _chunk_size(len(returns), chunk_size)
+    for first in range(0, n_sims, chunk_size):
+        n = min(chunk_size, n_sims - first)
+        indices = stationary_bootstrap_indices(len(returns), n, mean_block, rng)
+        paths = initial_balance * np.cumprod(1 + returns[indices], axis=1)
+        part = slice(first, first + n)
+        results['return_pct'][part] = (paths[:, -1] / initial_balance - 1) * 100
+        results['max_drawdown_pct'][part] = max_drawdown(paths, initial_balance) * 100
+
+    return results
+
+
+def summarize(values: np.ndarray, confidence: float = 0.95) -> Dict[str, float]:
+    """Mean, spread, quartiles and a central confidence interval of a distribution."""
+    values = np.asarray(values, dtype=np.float64)
+    tail = (1 - confidence) / 2 * 100
+    quartiles = np.percentile(values, [25, 50, 75])
+    return {
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'quartiles': [float(q) for q in quartiles],
+        'ci_low': float(np.percentile(values, tail)),
+        'ci_high': float(np.percentile(values, 100 - tail))
+    }
+
+
+def bootstrap_backtest(results: Dict, n_sims: int = 10000, mean_block: float = 20.0, skip_prob: float = 0.1,
+                       confidence: float = 0.95, seed: Optional[int] = None) -> Dict[str, Dict]:
+    """Run every resampling method on a finished backtest.
+
+    Args:
+        results: Result dict of TradeModel.backtest (needs 'trades',
+            'initial_balance' and, for the bar bootstrap, 'equity_curve')
+        n_sims: Simulations per method
+        mean_block: Mean block length in bars of the bar bootstrap
+        skip_prob: Probability of skipping each trade in the skip method
+        confidence: Level of the reported confidence intervals
+        seed: Seed of the random generator
+
+    Returns:
+        Dict keyed by method ('trade_shuffle', 'trade_skip', 'bar_bootstrap')
+        with 'distributions' (arrays per metric) and 'summary' (statistics per
+        metric plus the probability of a loss)
+    """
+    rng = np.random.default_rng(seed)
+    initial_balance = float(results['initial_balance'])
+    pnl = np.array([trade['pnl'] for trade in results['trades']], dtype=np.float64)
+
+    distributions = {
+        'trade_shuffle': trade_paths(pnl, n_sims, initial_balance, shuffle=True, rng=rng),
+        'trade_skip': trade_paths(pnl, n_sims, initial_balance, shuffle=True, skip_prob=skip_prob, rng=rng)
+    }
+    if results.get('equity_curve') is not None and len(results['equity_curve']):
+        distributions['bar_bootstrap'] = bar_paths(results['equity_curve'], n_sims, initial_balance,
+                                                   mean_block, rng=rng)
+
+    report = {}
+    for method, metrics in distributions.items():
+        summary = {name: summarize(values, confidence) for name, values in metrics.items()}
+        summary['loss_probability'] = float((metrics['return_pct'] < 0).mean())
+        report[method] = {'distributions': metrics, 'summary': summary}
+    return report
@@ -0,0 +1,150 @@
+"""
+Perturbation Monte Carlo for policy robustness.
+
+Each simulation perturbs the market itself (noise on OHLC prices, spread
+shocks and dropped bars), rebuilds the features from the perturbed prices
+and lets the recurrent policy trade them, so the policy reacts to the
+changed market instead of replaying its original trades. Simulations run
+in a pool of worker processes that each load the model and the base data
+once; every simulation draws from its own seed derived from the run seed
+and its index, so results do not depend on the number of workers or the
+completion order. Workers return only scalar metrics, which are collected
+as they complete.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import torch as th
+
+from monte_carlo import summarize
+from trade_model import TradeModel
+
+METRICS = ('return_pct', 'max_drawdown_pct', 'win_rate', 'total_trades', 'profit_factor')
+
+# Per-worker state, set by _init_worker
+_worker_model: Optional[TradeModel] = None
+_worker_data: Optional[pd.DataFrame] = None
+
+
+class Perturbation:
+    """Random market perturbations applied to a bar DataFrame."""
+
+    def __init__(self, price_noise: float = 0.0002, spread_shock_prob: float = 0.02,
+                 spread_shock_scale: float = 3.0, dropout_prob: float = 0.01):
+        """
+        Args:
+            price_noise: Standard deviation of the noise added to open, high,
+                low and close, relative to the close price
+            spread_shock_prob: Probability that a bar's spread is shocked
+            spread_shock_scale: Multiplier applied to shocked spreads
+            dropout_prob: Probability that a bar is dropped
+        """
+        self.price_noise = price_noise
+        self.spread_shock_prob = spread_shock_prob
+        self.spread_shock_scale = spread_shock_scale
+        self.dropout_prob = dropout_prob
+
+    def apply(self, data: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+        """Return a perturbed copy of data.
+
+        High and low are widened where needed so every bar stays a valid
+        OHLC bar; the first bar is never dropped.
+        """
+        keep = rng.random(len(data)) >= self.dropout_prob
+        keep[0] = True
+        perturbed = data[keep].copy()
+
+        close = perturbed['close'].values
+        noise = rng.normal(0.0, self.price_noise, size=(len(perturbed), 4)) * close[:, None]
+        prices = [perturbed[column].values + noise[:, i] for i, column in enumerate(('open', 'high', 'low', 'close'))]
+        perturbed['open'] = prices[0]
+        perturbed['high'] = np.maximum.reduce(prices)
+        perturbed['low'] = np.minimum.reduce(prices)
+        perturbed['close'] = prices[3]
+
+        shocked = rng.random(len(perturbed)) < self.spread_shock_prob
+        perturbed['spread'] = np.where(shocked, perturbed['spread'].values * self.spread_shock_scale,
+                                       perturbed['spread'].values)
+        return perturbed
+
+
+def simulation_rng(seed: int, index: int) -> np.random.Generator:
+    """Generator of one simulation, independent of which worker runs it."""
+    return np.random.default_rng(np.random.SeedSequence([seed, index]))
+
+
+def _init_worker(model_path: str, data: pd.DataFrame, torch_threads: int) -> None:
+    """Load the model and the base data once per worker process."""
+    global _worker_model, _worker_data
+    th.set_num_threads(torch_threads)
+    _worker_model = TradeModel(model_path)
+    if _worker_model.model is None:
+        raise RuntimeError(f"Could not load model from {model_path}")
+    _worker_data = data
+
+
+def _simulate(index: int, seed: int, perturbation: Perturbation, initial_balance: float,
+              balance_per_lot: float) -> Dict[str, float]:
+    """Run one perturbed backtest in a worker and return its scalar metrics."""
+    data = perturbation.apply(_worker_data, simulation_rng(seed, index))
+    results = TradeModel.backtest_lockstep([_worker_model], data, initial_balance, balance_per_lot)[0]
+    return {name: float(results.get(name, 0.0)) for name in METRICS}
+
+
+def perturbation_monte_carlo(model_path: str, data: pd.DataFrame, n_sims: int = 100, seed: int = 42,
+                             perturbation: Optional[Perturbation] = None, n_workers: Optional[int] = None,
+                             initial_balance: float = 10000.0, balance_per_lot: float = 1000.0,
+                             confidence: float = 0.95) -> Dict[str, Any]:
+    """Backtest a model on n_sims perturbed copies of the data.
+
+    Args:
+        model_path: Path of the saved model, loaded once per worker
+        data: DataFrame with market data
+        n_sims: Number of simulations
+        seed: Run seed; simulation i uses a generator seeded with (seed, i)
+        perturbation: Perturbations to apply (defaults to Perturbation())
+        n_workers: Worker processes (defaults to the CPU count)
+        initial_balance: Starting account balance
+        balance_per_lot: Account balance required per 0.01 lot
+        confidence: Level of the reported confidence intervals
+
+    Returns:
+        Dict with 'distributions' (one value per simulation and metric, in
+        simulation order), 'summary' (statistics per metric plus the
+        probability of a loss) and 'failed' (indices of failed simulations)
+    """
+    perturbation = perturbation or Perturbation()
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, n_sims))
+    torch_threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    distributions = {name: np.full(n_sims, np.nan) for name in METRICS}
+    failed = []
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(model_path, data, torch_threads)) as pool:
+        futures = {
+            pool.submit(_simulate, index, seed, perturbation, initial_balance, balance_per_lot): index
+            for index in range(n_sims)
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                for name, value in future.result().items():
+                    distributions[name][index] = value
+            except Exception as e:
+                print(f"Simulation {index} failed: {str(e)}")
+                failed.append(index)
+            if completed % 10 == 0:
+                print(f"Completed {completed} simulations")
+
+    ok = np.ones(n_sims, dtype=bool)
+    ok[failed] = False
+    summary = {}
+    if ok.any():
+        summary = {name: summarize(values[ok], confidence) for name, values in distributions.items()}
+        summary['loss_probability'] = float((distributions['return_pct'][ok] < 0).mean())
+    return {'distributions': distributions, 'summary': summary, 'failed': sorted(failed)}
@@ -0,0 +1,26 @@
+"""
+Position sizing shared by every trading simulator.
+
+TradingEnv, the batched lanes (VecTradingEnv, lockstep backtests and cost
+sweeps), action-tape replay and the inference session all size positions
+with lot_sizes, so a balance that falls on a rounding tie gets the same
+lot size in each of them.
+"""
+
+import numpy as np
+
+
+def lot_sizes(balance, balance_per_lot, min_lots: float, max_lots: float) -> np.ndarray:
+    """Lot size for an account balance: balance / balance_per_lot rounded to 0.01 lots.
+
+    Args:
+        balance: Account balance, a scalar or an array of lane balances
+        balance_per_lot: Account balance required per 0.01 lot (scalar or per lane)
+        min_lots: Minimum lot size
+        max_lots: Maximum lot size
+
+    Returns:
+        np.ndarray: Lot sizes shaped like balance (a 0-d array for a scalar)
+    """
+    lots = np.round(np.asarray(balance, dtype=np.float64) / balance_per_lot, 2)
+    return np.clip(lots, min_lots, max_lots)
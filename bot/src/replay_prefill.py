@@ -0,0 +1,194 @@
+"""
+Vectorized replay-buffer prefill for off-policy training on TradingEnv.
+
+SB3's DQN fills its buffer one env.step at a time before learning starts.
+collect_transitions instead plays a random or heuristic policy across many
+VecTradingEnv lanes at once, on the precomputed feature matrix with
+array-based position bookkeeping, and write_transitions stores the result
+in the replay buffer in one bulk write. Transitions can also be saved and
+loaded as .npz files, so a buffer can be seeded from recorded trajectories.
+"""
+
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from compact_replay_buffer import IndexReplayBuffer
+from vec_trading_env import VecTradingEnv
+
+Transitions = Dict[str, np.ndarray]
+Policy = Callable[[np.ndarray, np.random.Generator], np.ndarray]
+
+TRANSITION_FIELDS = ('steps', 'obs', 'next_obs', 'actions', 'rewards', 'dones', 'timeouts')
+
+
+def random_policy(obs: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Uniform random actions, as SB3 plays before learning starts."""
+    return rng.integers(0, 4, size=len(obs))
+
+
+def momentum_policy(obs: np.ndarray, rng: np.random.Generator, stop_loss: float = 0.01,
+                    epsilon: float = 0.1) -> np.ndarray:
+    """Heuristic that trades in the direction of the last return.
+
+    Flat lanes buy after a positive return and sell after a negative one;
+    lanes holding a position close it once the unrealized P&L feature falls
+    below -stop_loss. A fraction epsilon of actions is random so the buffer
+    still covers every action.
+    """
+    returns = obs[:, 0]
+    pnl = obs[:, -1]
+    actions = np.where(returns > 0, 1, np.where(returns < 0, 2, 0))
+    actions = np.where(pnl < -stop_loss, 3, actions)
+    explore = rng.random(len(obs)) < epsilon
+    actions[explore] = rng.integers(0, 4, size=int(explore.sum()))
+    return actions
+
+
+POLICIES: Dict[str, Policy] = {
+    'random': random_policy,
+    'heuristic': momentum_policy,
+}
+
+
+def collect_transitions(vec_env: VecTradingEnv, n_transitions: int,
+                        policy: Union[str, Policy] = 'random', seed: Optional[int] = None) -> Transitions:
+    """Play a policy on every lane of a VecTradingEnv and record the transitions.
+
+    Args:
+        vec_env: Batched environment; each step records one transition per lane
+        n_transitions: Number of transitions to collect (rounded up to whole steps)
+        policy: 'random', 'heuristic' or a callable (obs, rng) -> actions
+        seed: Seed for the policy's random generator
+
+    Returns:
+        Transitions: flat arrays with one entry per transition. 'steps' holds
+        the bar index of each obs; next_obs is the terminal observation for
+        transitions that ended an episode.
+    """
+    policy = POLICIES[policy] if isinstance(policy, str) else policy
+    rng = np.random.default_rng(seed)
+    n_lanes = vec_env.num_envs
+    n_steps = -(-n_transitions // n_lanes)
+    obs_shape = vec_env.observation_space.shape
+
+    steps = np.zeros((n_steps, n_lanes), dtype=np.int32)
+    obs = np.zeros((n_steps, n_lanes) + obs_shape, dtype=np.float32)
+    next_obs = np.zeros((n_steps, n_lanes) + obs_shape, dtype=np.float32)
+    actions = np.zeros((n_steps, n_lanes), dtype=np.int64)
+    rewards = np.zeros((n_steps, n_lanes), dtype=np.float32)
+    dones = np.zeros((n_steps, n_lanes), dtype=np.bool_)
+
+    current_obs = vec_env.reset()
+    for t in range(n_steps):
+        obs[t] = current_obs
+        steps[t] = vec_env.current_step
+        actions[t] = policy(current_obs, rng)
+
+        current_obs, rewards[t], dones[t], infos = vec_env.step(actions[t])
+        next_obs[t] = current_obs
+        # Finished lanes were reset; their transition ends at the terminal observation
+        for i in np.flatnonzero(dones[t]):
+            next_obs[t, i] = infos[i]["terminal_observation"]
+
+    transitions = {
+        'steps': steps, 'obs': obs, 'next_obs': next_obs, 'actions': actions,
+        'rewards': rewards, 'dones': dones, 'timeouts': np.zeros_like(dones)
+    }
+    return {name: values.reshape((-1,) + values.shape[2:])[:n_transitions]
+            for name, values in transitions.items()}
+
+
+def save_transitions(path: str, transitions: Transitions) -> None:
+    """Save transitions as a compressed .npz file."""
+    np.savez_compressed(path, **transitions)
+
+
+def load_transitions(path: str) -> Transitions:
+    """Load transitions saved with save_transitions (or recorded elsewhere with the same fields).
+
+    Raises:
+        ValueError: If a field is missing
+    """
+    with np.load(path) as data:
+        missing = [name for name in TRANSITION_FIELDS if name not in data]
+        if missing:
+            raise ValueError(f"Missing transition fields in {path}: {missing}")
+        return {name: data[name] for name in TRANSITION_FIELDS}
+
+
+def write_transitions(replay_buffer: ReplayBuffer, transitions: Transitions) -> int:
+    """Store transitions in a replay buffer in one bulk write.
+
+    Supports IndexReplayBuffer and SB3's ReplayBuffer (without
+    optimize_memory_usage). Transitions fill rows of n_envs entries, so a
+    trailing partial row is dropped.
+
+    Args:
+        replay_buffer: Buffer to fill
+        transitions: Transitions from collect_transitions or load_transitions
+
+    Returns:
+        Number of transitions written
+
+    Raises:
+        ValueError: For unsupported buffers
+    """
+    if isinstance(replay_buffer, IndexReplayBuffer):
+        replay_buffer.extend(transitions['steps'], transitions['obs'][:, -1], transitions['next_obs'][:, -1],
+                             transitions['actions'], transitions['rewards'], transitions['dones'],
+                             transitions['timeouts'])
+    elif isinstance(replay_buffer, ReplayBuffer) and not replay_buffer.optimize_memory_usage:
+        n_envs = replay_buffer.n_envs
+        n_rows = len(transitions['actions']) // n_envs
+        first = max(0, n_rows - replay_buffer.buffer_size)
+        positions = (replay_buffer.pos + np.arange(n_rows - first)) % replay_buffer.buffer_size
+
+        def rows(values: np.ndarray) -> np.ndarray:
+            values = values[:n_rows * n_envs]
+            return values.reshape((n_rows, n_envs) + values.shape[1:])[first:]
+
+        replay_buffer.observations[positions] = rows(transitions['obs'])
+        replay_buffer.next_observations[positions] = rows(transitions['next_obs'])
+        replay_buffer.actions[positions] = rows(transitions['actions']).reshape(
+            (-1, n_envs, replay_buffer.action_dim))
+        replay_buffer.rewards[positions] = rows(transitions['rewards'])
+        replay_buffer.dones[positions] = rows(transitions['dones'])
+        replay_buffer.timeouts[positions] = rows(transitions['timeouts'])
+
+        replay_buffer.full = replay_buffer.full or replay_buffer.pos + len(positions) >= replay_buffer.buffer_size
+        replay_buffer.pos = int((replay_buffer.pos + len(positions)) % replay_buffer.buffer_size)
+    else:
+        raise ValueError(f"Cannot bulk-write into {type(replay_buffer).__name__}")
+
+    return (len(transitions['actions']) // replay_buffer.n_envs) * replay_buffer.n_envs
+
+
+def prefill_replay_buffer(model, env, n_transitions: Optional[int] = None, policy: Union[str, Policy] = 'random',
+                          n_lanes: int = 256, seed: Optional[int] = None) -> int:
+    """Fill an off-policy model's replay buffer from lanes over its training data.
+
+    Lanes start at random bars of env's data. The model's learning_starts is
+    set to 0 afterwards, so training starts without collecting the same
+    warm-up experience again one step at a time.
+
+    Args:
+        model: Off-policy SB3 model (e.g. DQN)
+        env: Training environment (a TradingEnv, possibly wrapped)
+        n_transitions: Transitions to collect (defaults to model.learning_starts)
+        policy: 'random', 'heuristic' or a callable (obs, rng) -> actions
+        n_lanes: Number of parallel lanes
+        seed: Seed for lane starts and the policy
+
+    Returns:
+        Number of transitions written
+    """
+    n_transitions = n_transitions or model.learning_starts
+    if n_transitions <= 0:
+        return 0
+    vec_env = VecTradingEnv.from_env(env, n_envs=min(n_lanes, n_transitions), seed=seed)
+    vec_env.random_start = True
+    written = write_transitions(model.replay_buffer, collect_transitions(vec_env, n_transitions, policy, seed))
+    model.learning_starts = 0
+    return written
@@ -0,0 +1,146 @@
+"""
+Shared feature arrays for multi-process environment workers.
+
+SharedFeatureStore writes a FeatureStore's arrays once as .npy files into
+shared memory (/dev/shm where available). Worker processes map them
+read-only, so N SubprocVecEnv workers share one copy of the features and
+prices and start without recomputing any indicators. Workers only import
+numpy, pandas and gymnasium unless per-env Monitor wrappers are requested;
+wrap the vec env in a VecMonitor instead to keep worker startup fast.
+Run this module as a script to time building an environment from a
+shared store against building it from a DataFrame.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import gymnasium as gym
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore
+from trade_environment import TradingEnv
+
+# Stores attached by this process, keyed by directory
+_attached_stores: Dict[str, FeatureStore] = {}
+
+
+def shared_memory_dir() -> str:
+    """Directory backed by shared memory if the platform has one, else the temp dir."""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def attach(directory: str) -> FeatureStore:
+    """Map a shared store read-only, once per process."""
+    store = _attached_stores.get(directory)
+    if store is None:
+        store = FeatureStore.load(directory, mmap_mode='r')
+        _attached_stores[directory] = store
+    return store
+
+
+class SharedEnvFactory:
+    """Picklable environment constructor for a window of a shared feature store."""
+
+    def __init__(self, directory: str, start: int = 0, end: Optional[int] = None,
+                 monitor: bool = False, **env_kwargs: Any):
+        """
+        Args:
+            directory: Directory of the shared store
+            start: First bar position in the source data (inclusive)
+            end: Last bar position in the source data (exclusive)
+            monitor: Whether to wrap the environment in a Monitor
+            **env_kwargs: Keyword arguments for TradingEnv.from_feature_store
+        """
+        self.directory = directory
+        self.start = start
+        self.end = end
+        self.monitor = monitor
+        self.env_kwargs = env_kwargs
+
+    def __call__(self) -> gym.Env:
+        env = TradingEnv.from_feature_store(attach(self.directory), self.start, self.end, **self.env_kwargs)
+        if self.monitor:
+            # Imported here so workers without Monitor never load torch
+            from stable_baselines3.common.monitor import Monitor
+            env = Monitor(env)
+        return env
+
+
+class SharedFeatureStore:
+    """Owner of a feature store published for read-only use by worker processes."""
+
+    def __init__(self, store: FeatureStore, directory: Optional[str] = None):
+        """
+        Publish a store's arrays.
+
+        Args:
+            store: Feature store to share
+            directory: Parent directory for the shared files (defaults to shared memory)
+        """
+        self.directory = tempfile.mkdtemp(prefix='drl_features_', dir=directory or shared_memory_dir())
+        try:
+            store.save(self.directory)
+        except BaseException:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+        # The owner uses the same mapping as the workers
+        self.store = attach(self.directory)
+
+    def env_factory(self, start: int = 0, end: Optional[int] = None, monitor: bool = False,
+                    **env_kwargs: Any) -> SharedEnvFactory:
+        """Create a picklable factory for an environment over a window of the store."""
+        return SharedEnvFactory(self.directory, start, end, monitor, **env_kwargs)
+
+    def env_factories(self, n_envs: int, start: int = 0, end: Optional[int] = None,
+                      monitor: bool = False, **env_kwargs: Any) -> List[Callable[[], gym.Env]]:
+        """Create n_envs identical factories, e.g. for SubprocVecEnv."""
+        return [self.env_factory(start, end, monitor, **env_kwargs) for _ in range(n_envs)]
+
+    def close(self) -> None:
+        """Remove the shared files (mapped workers keep their pages until they exit)."""
+        _attached_stores.pop(self.directory, None)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> 'SharedFeatureStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time environment construction from a shared feature store')
+    parser.add_argument('--data_path', type=str, default='../data/XAUUSDm_15min.csv',
+                      help='Path to the input dataset CSV file')
+    parser.add_argument('--repeats', type=int, default=5,
+                      help='Number of constructions per variant (median is reported)')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data_path)
+    data.set_index('time', inplace=True)
+    data.index = pd.to_datetime(data.index)
+    print(f"Dataset shape: {data.shape}, from {data.index[0]} to {data.index[-1]}")
+
+    def median_seconds(build: Callable[[], Any]) -> float:
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            build()
+            times.append(time.perf_counter() - start)
+        return float(np.median(times))
+
+    with SharedFeatureStore(FeatureStore(data)) as shared:
+        size = sum(os.path.getsize(os.path.join(shared.directory, name)) for name in os.listdir(shared.directory))
+        print(f"Shared store: {size / 2**20:.1f} MiB in {shared.directory}")
+        factory = shared.env_factory()
+        print(f"{'TradingEnv(df)':<30} {median_seconds(lambda: TradingEnv(data.copy())) * 1000:>10.1f} ms")
+        print(f"{'shared store factory':<30} {median_seconds(factory) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
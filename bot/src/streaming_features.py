@@ -0,0 +1,437 @@
+"""
+Streaming indicator engine for live inference.
+
+StreamingFeatures updates every indicator from one new OHLC bar in O(1)
+time and emits the same feature vector as features.compute_features. The
+rolling mean and variance reproduce the add/remove Kahan and Welford
+updates of pandas' rolling windows, so the streamed features match the
+batch features bit for bit. Run this module as a script to verify the
+parity over CSV files.
+"""
+
+import argparse
+import glob
+import math
+import os
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, FEATURE_PARAMS, compute_features, ohlc_arrays
+
+NAN = float('nan')
+
+
+def _clip(value: float, low: float, high: float) -> float:
+    """Clip a scalar like np.clip (NaN propagates)."""
+    return min(max(value, low), high)
+
+
+class _RingBuffer:
+    """Fixed-size window of the most recent values."""
+
+    __slots__ = ('values', 'size', 'pos', 'count')
+
+    def __init__(self, size: int):
+        self.values = [NAN] * size
+        self.size = size
+        self.pos = 0
+        self.count = 0
+
+    def push(self, value: float) -> Optional[float]:
+        """Store a value and return the one that left the window, if any."""
+        evicted = self.values[self.pos] if self.count >= self.size else None
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count += 1
+        return evicted
+
+
+class RollingMean:
+    """Rolling mean matching pandas Series.rolling(window, min_periods).mean()."""
+
+    __slots__ = ('window', 'min_periods', 'buffer', 'nobs', 'sum', 'neg_count',
+                 'comp_add', 'comp_remove', 'same_count', 'prev_value')
+
+    def __init__(self, window: int, min_periods: Optional[int] = None):
+        """
+        Args:
+            window: Number of bars in the window
+            min_periods: Minimum non-NaN observations for a value (defaults to window)
+        """
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.reset()
+
+    def reset(self) -> None:
+        self.buffer = _RingBuffer(self.window)
+        self.nobs = 0
+        self.sum = 0.0
+        self.neg_count = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def update(self, value: float) -> float:
+        """Add a value to the window and return the current mean."""
+        if self.prev_value is None:
+            self.prev_value = value
+
+        # Remove the evicted value before adding, with separate Kahan compensations
+        evicted = self.buffer.push(value)
+        if evicted is not None and evicted == evicted:
+            self.nobs -= 1
+            y = -evicted - self.comp_remove
+            t = self.sum + y
+            self.comp_remove = t - self.sum - y
+            self.sum = t
+            if math.copysign(1.0, evicted) < 0:
+                self.neg_count -= 1
+
+        if value == value:
+            self.nobs += 1
+            y = value - self.comp_add
+            t = self.sum + y
+            self.comp_add = t - self.sum - y
+            self.sum = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_count += 1
+            self.same_count = self.same_count + 1 if value == self.prev_value else 1
+            self.prev_value = value
+
+        if self.nobs < self.min_periods or self.nobs == 0:
+            return NAN
+        result = self.sum / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_count == 0 and result < 0:
+            result = 0.0
+        elif self.neg_count == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class RollingStd:
+    """Rolling standard deviation matching pandas Series.rolling(window, min_periods).std()."""
+
+    __slots__ = ('window', 'min_periods', 'ddof', 'buffer', 'nobs', 'mean', 'ssqdm',
+                 'comp_add', 'comp_remove', 'same_count', 'prev_value')
+
+    def __init__(self, window: int, min_periods: Optional[int] = None, ddof: int = 1):
+        """
+        Args:
+            window: Number of bars in the window
+            min_periods: Minimum non-NaN observations for a value (defaults to window)
+            ddof: Delta degrees of freedom
+        """
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.ddof = ddof
+        self.reset()
+
+    def reset(self) -> None:
+        self.buffer = _RingBuffer(self.window)
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def update(self, value: float) -> float:
+        """Add a value to the window and return the current standard deviation."""
+        if self.prev_value is None:
+            self.prev_value = value
+
+        # Welford's method with Kahan compensation, removing before adding
+        evicted = self.buffer.push(value)
+        if evicted is not None and evicted == evicted:
+            self.nobs -= 1
+            if self.nobs:
+                prev_mean = self.mean - self.comp_remove
+                y = evicted - self.comp_remove
+                t = y - self.mean
+                self.comp_remove = t + self.mean - y
+                self.mean = self.mean - t / self.nobs
+                self.ssqdm = self.ssqdm - (evicted - prev_mean) * (evicted - self.mean)
+            else:
+                self.mean = 0.0
+                self.ssqdm = 0.0
+
+        if value == value:
+            self.same_count = self.same_count + 1 if value == self.prev_value else 1
+            self.prev_value = value
+            self.nobs += 1
+            prev_mean = self.mean - self.comp_add
+            y = value - self.comp_add
+            t = y - self.mean
+            self.comp_add = t + self.mean - y
+            self.mean = self.mean + t / self.nobs
+            self.ssqdm = self.ssqdm + (value - prev_mean) * (value - self.mean)
+
+        if self.nobs < self.min_periods or self.nobs <= self.ddof:
+            return NAN
+        if self.nobs == 1 or self.same_count >= self.nobs:
+            return 0.0
+        variance = self.ssqdm / (self.nobs - self.ddof)
+        return math.sqrt(variance) if variance >= 0 else 0.0
+
+
+class RollingMinMax:
+    """Rolling min and max over a window (NaN skipped) using monotonic deques."""
+
+    __slots__ = ('window', 'index', 'mins', 'maxs')
+
+    def __init__(self, window: int):
+        """
+        Args:
+            window: Number of bars in the window
+        """
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        self.index = 0
+        self.mins = deque()
+        self.maxs = deque()
+
+    def update(self, value: float) -> Tuple[float, float]:
+        """Add a value to the window and return (min, max), NaN if the window has no values."""
+        oldest = self.index - self.window
+        for extremes in (self.mins, self.maxs):
+            while extremes and extremes[0][0] <= oldest:
+                extremes.popleft()
+
+        if value == value:
+            while self.mins and self.mins[-1][1] >= value:
+                self.mins.pop()
+            self.mins.append((self.index, value))
+            while self.maxs and self.maxs[-1][1] <= value:
+                self.maxs.pop()
+            self.maxs.append((self.index, value))
+        self.index += 1
+
+        if not self.mins:
+            return NAN, NAN
+        return self.mins[0][1], self.maxs[0][1]
+
+
+class StreamingFeatures:
+    """Incremental version of features.compute_features, one OHLC bar at a time."""
+
+    def __init__(self):
+        self.atr_period = FEATURE_PARAMS['atr_period']
+        self.rsi_period = FEATURE_PARAMS['rsi_period']
+        self.bollinger_period = FEATURE_PARAMS['bollinger_period']
+        self.atr_norm_window = FEATURE_PARAMS['atr_norm_window']
+        self.lookback = max(self.bollinger_period, self.atr_period)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all indicator state."""
+        self.atr_mean = RollingMean(self.atr_period)
+        self.gain_mean = RollingMean(self.rsi_period)
+        self.loss_mean = RollingMean(self.rsi_period)
+        self.pdm_mean = RollingMean(self.atr_period, min_periods=1)
+        self.ndm_mean = RollingMean(self.atr_period, min_periods=1)
+        self.dx_mean = RollingMean(self.atr_period, min_periods=1)
+        self.close_mean = RollingMean(self.bollinger_period, min_periods=1)
+        self.close_std = RollingStd(self.bollinger_period, min_periods=1)
+        self.atr_ratio_range = RollingMinMax(self.atr_norm_window)
+
+        self.prev_close = None
+        self.prev_high = None
+        self.prev_low = None
+        self.first_close = None
+
+        self.bars_seen = 0
+        self.valid_count = 0
+        # Whether the latest bar is past the warm-up, i.e. kept by compute_features
+        self.ready = False
+        self.atr = NAN
+        self.features = np.full(len(FEATURE_COLUMNS), np.nan)
+
+    def update(self, open_: float, high: float, low: float, close: float) -> Optional[np.ndarray]:
+        """Update all indicators with a new bar.
+
+        Args:
+            open_: Bar open price
+            high: Bar high price
+            low: Bar low price
+            close: Bar close price
+
+        Returns:
+            Feature vector in FEATURE_COLUMNS order, or None during warm-up.
+            The returned array is reused by the next update.
+        """
+        open_, high, low, close = float(open_), float(high), float(low), float(close)
+        first_bar = self.prev_close is None
+        if first_bar:
+            self.first_close = close
+
+        # ATR
+        if first_bar:
+            tr = high - low
+        else:
+            tr = max(high - low, max(abs(high - self.prev_close), abs(low - self.prev_close)))
+        atr = self.atr_mean.update(tr)
+
+        # RSI
+        delta = 0.0 if first_bar else close - self.prev_close
+        gain = self.gain_mean.update(delta if delta > 0 else 0.0)
+        loss = self.loss_mean.update(-delta if delta < 0 else 0.0)
+        rs = gain / loss if loss != 0 else 0.0
+        rsi = 100 - (100 / (1 + rs))
+
+        # Returns
+        returns = 0.0 if first_bar else _clip((close - self.prev_close) / self.prev_close, -0.1, 0.1)
+
+        # Trend strength (ADX-based)
+        if first_bar:
+            pdm = ndm = 0.0
+        else:
+            pdm = high - self.prev_high
+            pdm = pdm if pdm >= 0 else 0.0
+            ndm = self.prev_low - low
+            ndm = ndm if ndm >= 0 else 0.0
+        pdm_smooth = self.pdm_mean.update(pdm)
+        ndm_smooth = self.ndm_mean.update(ndm)
+        atr_safe = 1e-8 if atr < 1e-8 else atr
+        pdi = (pdm_smooth / atr_safe) * 100
+        ndi = (ndm_smooth / atr_safe) * 100
+        sum_di = pdi + ndi
+        sum_di = 1e-8 if sum_di < 1e-8 else sum_di
+        dx = abs(pdi - ndi) / sum_di * 100
+        adx = self.dx_mean.update(dx)
+        if adx != adx:
+            adx = 0.0
+        trend_strength = _clip(adx / 25 - 1, -1, 1)
+
+        # Volatility breakout (Bollinger Bands)
+        boll_std = self.close_std.update(close)
+        if boll_std != boll_std:
+            boll_std = 0.0
+        ma20 = self.close_mean.update(close)
+        if ma20 != ma20:
+            ma20 = self.first_close
+        upper_band = ma20 + (boll_std * 2)
+        lower_band = ma20 - (boll_std * 2)
+        band_range = upper_band - lower_band
+        band_range = 1e-8 if band_range < 1e-8 else band_range
+        volatility_breakout = _clip((close - lower_band) / band_range, 0, 1)
+
+        # Combined price action signal
+        body = close - open_
+        upper_wick = high - max(close, open_)
+        lower_wick = min(close, open_) - low
+        range_ = high - low + 1e-8
+        candle_pattern = _clip((body/range_ +
+                                (upper_wick - lower_wick)/(upper_wick + lower_wick + 1e-8)) / 2, -1, 1)
+
+        # ATR ratio against its trailing min/max
+        atr_ratio = atr / close
+        atr_min, atr_max = self.atr_ratio_range.update(atr_ratio)
+
+        features = self.features
+        features[0] = returns
+        features[1] = rsi / 50 - 1
+        features[2] = 2 * (atr_ratio - atr_min) / (atr_max - atr_min + 1e-8) - 1
+        features[3] = volatility_breakout
+        features[4] = trend_strength
+        features[5] = candle_pattern
+
+        self.prev_close = close
+        self.prev_high = high
+        self.prev_low = low
+        self.atr = atr
+        self.bars_seen += 1
+        row_valid = not np.isnan(features).any()
+        if row_valid:
+            self.valid_count += 1
+        self.ready = row_valid and self.valid_count > self.lookback
+
+        return features if self.ready else None
+
+
+def stream_features(opens: np.ndarray, high: np.ndarray, low: np.ndarray,
+                    close: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Run the streaming engine over whole arrays.
+
+    Returns:
+        Tuple of (features, atr, valid) in the format of compute_features
+    """
+    engine = StreamingFeatures()
+    features: List[np.ndarray] = []
+    atr: List[float] = []
+    valid = np.zeros(len(close), dtype=bool)
+    for i in range(len(close)):
+        row = engine.update(opens[i], high[i], low[i], close[i])
+        if row is not None:
+            features.append(row.copy())
+            atr.append(engine.atr)
+            valid[i] = True
+    features_array = np.array(features) if features else np.empty((0, len(FEATURE_COLUMNS)))
+    return features_array, np.array(atr, dtype=np.float64), valid
+
+
+def verify_parity(data: pd.DataFrame) -> bool:
+    """Check streamed features against compute_features bit for bit.
+
+    Args:
+        data: DataFrame with open/high/low/close columns
+
+    Returns:
+        bool: True if features, ATR and valid masks are identical
+    """
+    arrays = ohlc_arrays(data)
+
+    start = time.perf_counter()
+    batch_features, batch_atr, batch_valid = compute_features(*arrays)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    streamed_features, stream_atr, stream_valid = stream_features(*arrays)
+    stream_time = time.perf_counter() - start
+
+    valid_match = np.array_equal(batch_valid, stream_valid)
+    atr_match = valid_match and np.array_equal(batch_atr, stream_atr)
+    features_match = valid_match and np.array_equal(batch_features, streamed_features)
+
+    print(f"  Bars: {len(data)}, valid: {int(stream_valid.sum())}")
+    print(f"  Valid mask match: {valid_match}")
+    print(f"  ATR match: {atr_match}")
+    print(f"  Features match: {features_match}")
+    if valid_match and not features_match:
+        mismatched = (batch_features != streamed_features).any(axis=0)
+        print(f"  Mismatched columns: {[col for col, bad in zip(FEATURE_COLUMNS, mismatched) if bad]}")
+    print(f"  Batch: {batch_time * 1000:.1f} ms, streaming: {stream_time / len(data) * 1e6:.1f} us/bar")
+
+    return valid_match and atr_match and features_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify streaming features against batch features')
+    parser.add_argument('--data_path', type=str, nargs='*', default=None,
+                      help='CSV files to check (default: all CSV files in ../data)')
+
+    args = parser.parse_args()
+    paths = args.data_path or sorted(glob.glob(os.path.join('..', 'data', '*.csv')))
+
+    all_match = True
+    for path in paths:
+        print(f"\n{os.path.basename(path)}")
+        data = pd.read_csv(path)
+        all_match &= verify_parity(data)
+
+    print(f"\nParity {'OK' if all_match else 'FAILED'}")
+    if not all_match:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,13 @@ from gymnasium import spaces
 import gymnasium as gym
 from gymnasium.utils import EzPickle
 
+from feature_cache import FeatureCache, load_features
+from feature_store import FeatureStore
+from features import FEATURE_COLUMNS
+from position_sizing import lot_sizes
+from trade_ledger import TradeLedger
+from trade_stats import TradeStatistics
+
 class TradingEnv(gym.Env, EzPickle):
     """Trading environment for single-position trading with PPO-LSTM."""
     
@@ -20,22 +27,15 @@ class TradingEnv(gym.Env, EzPickle):
     
     def __init__(self, data: pd.DataFrame, initial_balance: float = 10000, 
                  balance_per_lot: float = 1000.0, random_start: bool = False,
-                 bar_count: int = 10):  # bar_count is deprecated and no longer used
+                 bar_count: int = 10,  # bar_count is deprecated and no longer used
+                 feature_cache: Optional[Union[str, FeatureCache]] = None):
         super().__init__()
-        EzPickle.__init__(self)
+        # Record constructor arguments so unpickling rebuilds the same environment
+        EzPickle.__init__(self, data, initial_balance, balance_per_lot, random_start, bar_count, feature_cache)
         
         # Save original datetime index
         self.original_index = data.index.copy() if isinstance(data.index, pd.DatetimeIndex) else pd.to_datetime(data.index)
         
-        # Trading constants
-        self.POINT_VALUE = 0.01
-        self.PIP_VALUE = 0.0001
-        self.MIN_LOTS = 0.01
-        self.MAX_LOTS = 100.0
-        self.CONTRACT_SIZE = 1.0
-        self.BALANCE_PER_LOT = balance_per_lot
-        self.MAX_DRAWDOWN = 0.5
-        
         # Verify required columns
         required_columns = ['open', 'close', 'high', 'low', 'spread']
         missing_columns = [col for col in required_columns if col not in data.columns]
@@ -47,20 +47,91 @@ class TradingEnv(gym.Env, EzPickle):
             print("Warning: 'volume' column not found, using synthetic volume data")
             data['volume'] = np.ones(len(data))
         
-        # Preprocess data and calculate all technical indicators
-        self.raw_data, atr_values = self._preprocess_data(data)
+        # Optional on-disk cache of computed features (directory path or FeatureCache)
+        self.feature_cache = FeatureCache(feature_cache) if isinstance(feature_cache, str) else feature_cache
+        self.feature_store = None
         
-        # Store data length after preprocessing for consistent indexing
-        self.data_length = len(self.raw_data)
+        # Preprocess data and calculate all technical indicators; this also
+        # stores the price data matching the preprocessed data length
+        self._raw_data, atr_values = self._preprocess_data(data)
         
-        # Store price data matching preprocessed data length
-        self.prices = {
-            'close': data.loc[self.original_index, 'close'].values,
-            'high': data.loc[self.original_index, 'high'].values,
-            'low': data.loc[self.original_index, 'low'].values,
-            'spread': data.loc[self.original_index, 'spread'].values,
-            'atr': atr_values
-        }
+        # Contiguous float32 observation matrix with a reserved P&L column, so
+        # the per-step path needs no pandas access and no allocation
+        obs_matrix = np.zeros((len(self._raw_data), len(FEATURE_COLUMNS) + 1), dtype=np.float32)
+        obs_matrix[:, :-1] = self._raw_data.values
+        
+        self._init_state(obs_matrix, initial_balance, balance_per_lot, random_start)
+    
+    @classmethod
+    def from_feature_store(cls, store: FeatureStore, start: int = 0, end: Optional[int] = None,
+                           initial_balance: float = 10000, balance_per_lot: float = 1000.0,
+                           random_start: bool = False) -> 'TradingEnv':
+        """Create an environment over a window of a precomputed feature store.
+        
+        The environment covers the valid bars of data.iloc[start:end] and
+        holds views into the store's arrays, so nothing is copied or
+        recomputed. Indicators are warmed up on the full history, so the
+        window does not lose its first bars to the indicator lookback.
+        
+        Args:
+            store: Feature store built over the full dataset
+            start: First bar position in the store's source data (inclusive)
+            end: Last bar position in the store's source data (exclusive)
+            initial_balance: Starting account balance
+            balance_per_lot: Account balance required per 0.01 lot
+            random_start: Whether episodes start at a random step
+            
+        Returns:
+            TradingEnv over the window
+            
+        Raises:
+            ValueError: If the window has fewer than 100 valid bars
+        """
+        first_row, end_row = store.rows(start, end)
+        if end_row - first_row < 100:
+            raise ValueError(f"Insufficient data after preprocessing: {end_row - first_row} bars. Need at least 100 bars.")
+        
+        env = cls.__new__(cls)
+        gym.Env.__init__(env)
+        env._store_args = (store, start, end, {
+            'initial_balance': initial_balance,
+            'balance_per_lot': balance_per_lot,
+            'random_start': random_start
+        })
+        
+        env.feature_cache = None
+        env.feature_store = store
+        env._store_rows = (first_row, end_row)
+        env._raw_data = None
+        env.original_index = store.index[first_row:end_row]
+        env.prices = {name: values[first_row:end_row] for name, values in store.prices.items()}
+        
+        env._init_state(store.obs_matrix[first_row:end_row], initial_balance, balance_per_lot, random_start)
+        return env
+    
+    def _init_state(self, obs_matrix: np.ndarray, initial_balance: float, balance_per_lot: float,
+                    random_start: bool) -> None:
+        """Initialize constants, trading state and observation buffers.
+        
+        Args:
+            obs_matrix: Float32 feature matrix with a trailing zeroed P&L column
+            initial_balance: Starting account balance
+            balance_per_lot: Account balance required per 0.01 lot
+            random_start: Whether episodes start at a random step
+        """
+        # Trading constants
+        self.POINT_VALUE = 0.01
+        self.PIP_VALUE = 0.0001
+        self.MIN_LOTS = 0.01
+        self.MAX_LOTS = 100.0
+        self.CONTRACT_SIZE = 1.0
+        self.BALANCE_PER_LOT = balance_per_lot
+        self.MAX_DRAWDOWN = 0.5
+        
+        self.obs_matrix = obs_matrix
+        
+        # Store data length after preprocessing for consistent indexing
+        self.data_length = len(obs_matrix)
         
         self.current_step = 0
         self.random_start = random_start
@@ -71,7 +142,7 @@ class TradingEnv(gym.Env, EzPickle):
         self.previous_balance = initial_balance  # Add tracking for reward calculation
         
         # Trading state
-        self.trades: List[Dict[str, Any]] = []
+        self.trades = TradeLedger(index=self.original_index)
         self.current_position = None
         self.win_count = 0
         self.loss_count = 0
@@ -79,145 +150,73 @@ class TradingEnv(gym.Env, EzPickle):
         self.completed_episodes = 0
         self.episode_steps = 0
         
-        # Trade metrics
+        # Trade metrics, maintained incrementally on every close
+        self.trade_stats = TradeStatistics()
         self.trade_metrics = {
-            'win_rate': 0.0,
-            'avg_profit': 0.0,
-            'avg_loss': 0.0,
+            **self.trade_stats.metrics(),
             'current_direction': 0
         }
         
         self._setup_action_space()
         self._setup_observation_space(10)  # Keep the same observation space
-
+        
+        # Two alternating output buffers keep the previous observation valid
+        # (e.g. a terminal observation held by a vec env across reset)
+        feature_count = self.observation_space.shape[0]
+        self._obs_buffers = np.zeros((2, feature_count), dtype=np.float32)
+        self._obs_slot = 0
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Store-backed environments pickle as their store and window; a store
+        # loaded from disk pickles as its directory, so nothing is copied
+        if self.feature_store is not None:
+            return {'_store_args': self._store_args}
+        return EzPickle.__getstate__(self)
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        if '_store_args' in state:
+            store, start, end, kwargs = state['_store_args']
+            self.__dict__.update(type(self).from_feature_store(store, start, end, **kwargs).__dict__)
+        else:
+            EzPickle.__setstate__(self, state)
+    
+    @property
+    def raw_data(self) -> pd.DataFrame:
+        """Feature DataFrame of the environment's bars, built on first access for store-backed envs."""
+        if self._raw_data is None:
+            self._raw_data = self.feature_store.frame(*self._store_rows)
+        return self._raw_data
 
     def _preprocess_data(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
         """Preprocess market data for the model with advanced features.
         
+        Features are loaded from the feature cache when one is configured,
+        otherwise they are computed from the OHLC data.
+        
         Args:
             data: DataFrame with OHLCV data
             
         Returns:
             Tuple of (features_df, atr_values)
         """
-        # Create DataFrame with same index as input data
-        features_df = pd.DataFrame(index=data.index)
-        
-        with np.errstate(divide='ignore', invalid='ignore'):
-            # Price data
-            close = data['close'].values
-            high = data['high'].values
-            low = data['low'].values
-            opens = data['open'].values
-            
-            # ===== CALCULATE TECHNICAL INDICATORS =====
-            
-            # Calculate ATR
-            tr = np.maximum(high - low,
-                          np.maximum(np.abs(high - np.roll(close, 1)),
-                                   np.abs(low - np.roll(close, 1))))
-            tr[0] = high[0] - low[0]  # Fix first value
-            
-            atr_period = 14
-            atr = pd.Series(tr).rolling(atr_period).mean().values
-            
-            # Calculate RSI
-            delta = pd.Series(close).diff().fillna(0).values
-            gain = pd.Series(np.where(delta > 0, delta, 0)).rolling(window=14).mean().values
-            loss = pd.Series(np.where(delta < 0, -delta, 0)).rolling(window=14).mean().values
-            
-            # Avoid division by zero
-            rs = np.zeros_like(gain)
-            mask = loss != 0
-            rs[mask] = gain[mask] / loss[mask]
-            rsi = 100 - (100 / (1 + rs))            
-            
-            # Returns Calculation
-            returns = np.diff(close) / close[:-1]
-            returns = np.insert(returns, 0, 0)
-            returns = np.clip(returns, -0.1, 0.1)
-            
-            # Calculate Trend Strength (ADX-based)
-            pdm = np.maximum(high[1:] - high[:-1], 0)  # Positive directional movement
-            ndm = np.maximum(low[:-1] - low[1:], 0)    # Negative directional movement
-            pdm = np.insert(pdm, 0, 0)  # Add 0 at start
-            ndm = np.insert(ndm, 0, 0)  # Add 0 at start
-            
-            # Smooth DM values with fillna to handle NaN values
-            pdm_smooth = pd.Series(pdm).rolling(atr_period, min_periods=1).mean().fillna(0)
-            ndm_smooth = pd.Series(ndm).rolling(atr_period, min_periods=1).mean().fillna(0)
-            
-            # Calculate directional indicators with safe values
-            atr_safe = np.where(atr < 1e-8, 1e-8, atr)  # Prevent division by zero
-            pdi = (pdm_smooth.values / atr_safe) * 100
-            ndi = (ndm_smooth.values / atr_safe) * 100
-            
-            # Calculate DX and ADX with proper NaN handling
-            sum_di = pdi + ndi
-            sum_di = np.where(sum_di < 1e-8, 1e-8, sum_di)  # Prevent division by zero
-            dx = np.abs(pdi - ndi) / sum_di * 100
-            adx = pd.Series(dx).rolling(atr_period, min_periods=1).mean().fillna(0).values
-            trend_strength = np.clip(adx/25 - 1, -1, 1)
-            
-            # Volatility Breakout using Bollinger Bands with improved NaN handling
-            boll_std = pd.Series(close).rolling(20, min_periods=1).std().fillna(0).values
-            ma20 = pd.Series(close).rolling(20, min_periods=1).mean().fillna(close[0]).values
-            upper_band = ma20 + (boll_std * 2)
-            lower_band = ma20 - (boll_std * 2)
-            
-            # Safer division with explicit NaN handling
-            band_range = (upper_band - lower_band)
-            band_range = np.where(band_range < 1e-8, 1e-8, band_range)  # Prevent division by zero
-            
-            position = close - lower_band
-            volatility_breakout = np.divide(position, band_range, out=np.zeros_like(position), where=band_range!=0)
-            volatility_breakout = np.clip(volatility_breakout, 0, 1)
-            
-            # Combined Price Action Signal
-            body = close - opens
-            upper_wick = high - np.maximum(close, opens)
-            lower_wick = np.minimum(close, opens) - low
-            range_ = high - low + 1e-8
-            
-            # Combine body_to_range and wick_ratio into one signal
-            candle_pattern = (body/range_ + 
-                           (upper_wick - lower_wick)/(upper_wick + lower_wick + 1e-8)) / 2
-            candle_pattern = np.clip(candle_pattern, -1, 1)
-            
-            # Store optimized feature set
-            features_df['returns'] = returns
-            features_df['rsi'] = rsi / 50 - 1  # Normalize to [-1, 1]
-            features_df['atr'] = 2 * (atr / close - np.nanmin(atr / close)) / \
-                              (np.nanmax(atr / close) - np.nanmin(atr / close) + 1e-8) - 1
-            features_df['volatility_breakout'] = volatility_breakout
-            features_df['trend_strength'] = trend_strength
-            features_df['candle_pattern'] = candle_pattern
-            
-            # Calculate lookback period based on the longest indicator window
-            lookback = max(20, atr_period)  # Use max of Bollinger (20) and ATR period
-            
-            # Forward fill any NaN values in features
-            features_df = features_df.dropna()
-            
-            # Only keep data after the lookback period to ensure all indicators are properly calculated
-            features_df = features_df.iloc[lookback:]
-            
-            # Ensure we have enough data after preprocessing
-            if len(features_df) < 100:
-                raise ValueError(f"Insufficient data after preprocessing: {len(features_df)} bars. Need at least 100 bars.")
+        features, atr, valid = load_features(data, self.feature_cache)
         
-        # Update price data to match cleaned features
-        valid_indices = features_df.index
-        # Get integer positions of valid indices in original data
-        valid_positions = data.index.get_indexer(valid_indices)
+        # Ensure we have enough data after preprocessing
+        if len(features) < 100:
+            raise ValueError(f"Insufficient data after preprocessing: {len(features)} bars. Need at least 100 bars.")
+        
+        # Get integer positions of valid bars in original data
+        valid_positions = np.flatnonzero(valid)
+        valid_indices = data.index[valid_positions]
+        features_df = pd.DataFrame(np.asarray(features), index=valid_indices, columns=FEATURE_COLUMNS)
         
-        # Use integer positions for numpy array indexing
-        atr = atr[valid_positions]
+        # Update price data to match cleaned features
+        atr = np.asarray(atr)
         self.prices = {
-            'close': data.loc[valid_indices, 'close'].values,
-            'high': data.loc[valid_indices, 'high'].values,
-            'low': data.loc[valid_indices, 'low'].values,
-            'spread': data.loc[valid_indices, 'spread'].values,
+            'close': data['close'].values[valid_positions],
+            'high': data['high'].values[valid_positions],
+            'low': data['low'].values[valid_positions],
+            'spread': data['spread'].values[valid_positions],
             'atr': atr
         }
         self.original_index = valid_indices
@@ -280,20 +279,13 @@ class TradingEnv(gym.Env, EzPickle):
         current_atr = self.prices['atr'][self.current_step]
         
         # Calculate lot size based on account balance
-        lot_size = max(
-            self.MIN_LOTS, 
-            min(
-                self.MAX_LOTS,
-                round(self.balance / self.BALANCE_PER_LOT, 2)
-            )
-        )
+        lot_size = float(lot_sizes(self.balance, self.BALANCE_PER_LOT, self.MIN_LOTS, self.MAX_LOTS))
         
         # Create position
         self.current_position = {
             "direction": 1 if direction == 1 else -1,  # 1 for buy, -1 for sell
             "entry_price": current_price + (raw_spread if direction == 1 else -raw_spread),
             "lot_size": lot_size,
-            "entry_time": str(self.original_index[self.current_step]),
             "entry_step": self.current_step,
             "entry_atr": current_atr,
             "current_profit_pips": 0.0
@@ -327,42 +319,37 @@ class TradingEnv(gym.Env, EzPickle):
         pnl = profit_points * lot_size
         profit_pips = profit_points / self.PIP_VALUE
         
-        # Record trade details
-        self.current_position.update({
-            "exit_price": current_price,
-            "exit_step": self.current_step,
-            "exit_time": str(self.original_index[self.current_step]),
-            "profit_pips": profit_pips,
-            "pnl": pnl,
-            "hold_time": self.current_step - entry_step
-        })
+        hold_time = self.current_step - entry_step
+        
+        # Record trade details (timestamps are resolved lazily by the ledger)
+        self.trades.append(
+            entry_step=entry_step,
+            exit_step=self.current_step,
+            entry_price=entry_price,
+            exit_price=current_price,
+            pnl=pnl,
+            profit_pips=profit_pips,
+            direction=direction,
+            lot_size=lot_size,
+            entry_atr=self.current_position["entry_atr"]
+        )
         
         # Update trade statistics
         if pnl > 0:
             self.win_count += 1
         else:
             self.loss_count += 1
-            
-        self.trades.append(self.current_position)
+        self.trade_stats.update(pnl, hold_time, direction)
         
         # Update balance and clear position
         self.balance += pnl
         
-        # Calculate hold time before clearing position
-        hold_time = self.current_step - entry_step
-        
         # Clear position
         self.current_position = None
         self.trade_metrics['current_direction'] = 0
         
-        # Update trade metrics
-        if self.trades:
-            winning_trades = [t for t in self.trades if t["pnl"] > 0]
-            losing_trades = [t for t in self.trades if t["pnl"] <= 0]
-            
-            self.trade_metrics['win_rate'] = len(winning_trades) / len(self.trades) if self.trades else 0.0
-            self.trade_metrics['avg_profit'] = sum(t["pnl"] for t in winning_trades) / len(winning_trades) if winning_trades else 0.0
-            self.trade_metrics['avg_loss'] = sum(t["pnl"] for t in losing_trades) / len(losing_trades) if losing_trades else 0.0
+        # Update trade metrics in O(1) from the running statistics
+        self.trade_metrics.update(self.trade_stats.metrics())
         
         # Reward based on P/L and hold time
         hold_factor = min(1.0, hold_time / 20)  # Scale factor based on hold time
@@ -460,7 +447,7 @@ class TradingEnv(gym.Env, EzPickle):
         self.reward = reward
         
         # Get current observation
-        obs = self.get_history()
+        obs = self.get_history(unrealized_pnl)
         
         truncated = self.current_step >= self.data_length - 1
         
@@ -477,6 +464,7 @@ class TradingEnv(gym.Env, EzPickle):
             }
         
         return obs, reward, done, truncated, {
+            "step": self.current_step,
             "balance": self.balance,
             "total_pnl": self.balance - self.initial_balance,
             "drawdown": max_drawdown * 100,
@@ -507,10 +495,9 @@ class TradingEnv(gym.Env, EzPickle):
         self.loss_count = 0
         self.episode_steps = 0
         
+        self.trade_stats.reset()
         self.trade_metrics.update({
-            'win_rate': 0.0,
-            'avg_profit': 0.0,
-            'avg_loss': 0.0,
+            **self.trade_stats.metrics(),
             'current_direction': 0
         })
         
@@ -521,20 +508,29 @@ class TradingEnv(gym.Env, EzPickle):
             "position": None
         }
         
-    def get_history(self) -> np.ndarray:
-        """Get current bar features including unrealized P&L."""
-        features = self.raw_data.values[self.current_step]
+    def get_history(self, unrealized_pnl: Optional[float] = None) -> np.ndarray:
+        """Get current bar features including unrealized P&L.
+        
+        Args:
+            unrealized_pnl: Unrealized P/L already computed for this step
+                (recomputed if None)
+                
+        Returns:
+            np.ndarray: float32 observation. The array is a preallocated buffer
+            that is reused every other call; copy it to keep it longer.
+        """
+        self._obs_slot ^= 1
+        obs = self._obs_buffers[self._obs_slot]
+        obs[:] = self.obs_matrix[self.current_step]
         
         # Calculate normalized unrealized P&L
         if self.current_position:
-            unrealized_pnl = self._manage_position()
+            if unrealized_pnl is None:
+                unrealized_pnl = self._manage_position()
             # Normalize P&L relative to initial balance
-            normalized_pnl = np.clip(unrealized_pnl / self.initial_balance, -1, 1)
-        else:
-            normalized_pnl = 0.0  # No position
+            obs[-1] = min(1.0, max(-1.0, unrealized_pnl / self.initial_balance))
         
-        # Add normalized P&L to features
-        return np.append(features, normalized_pnl)
+        return obs
 
     def render(self) -> None:
         """Print environment state and trade statistics."""
@@ -560,27 +556,34 @@ class TradingEnv(gym.Env, EzPickle):
             print("\nNo completed trades yet.")
             return
             
-        trades_df = pd.DataFrame(self.trades)
+        # Vectorized pass over the ledger columns
+        pnl = self.trades['pnl']
+        direction = self.trades['direction']
+        hold_time = self.trades.hold_time
         
-        winning_trades = trades_df[trades_df["pnl"] > 0]
-        losing_trades = trades_df[trades_df["pnl"] < 0]
+        def mean(values: np.ndarray) -> float:
+            return float(values.mean()) if len(values) else float('nan')
         
-        long_trades = trades_df[trades_df["direction"] == 1]
-        short_trades = trades_df[trades_df["direction"] == -1]
-        long_wins = long_trades[long_trades["pnl"] > 0]
-        short_wins = short_trades[short_trades["pnl"] > 0]
+        is_win = pnl > 0
+        is_loss = pnl < 0
+        winning_pnl = pnl[is_win]
+        losing_pnl = pnl[is_loss]
+        long_pnl = pnl[direction == 1]
+        short_pnl = pnl[direction == -1]
+        long_wins = int((long_pnl > 0).sum())
+        short_wins = int((short_pnl > 0).sum())
         
-        avg_hold_time = trades_df["hold_time"].mean() if "hold_time" in trades_df.columns else 0
-        avg_win_hold = winning_trades["hold_time"].mean() if "hold_time" in winning_trades.columns else 0
-        avg_loss_hold = losing_trades["hold_time"].mean() if "hold_time" in losing_trades.columns else 0
+        avg_hold_time = mean(hold_time)
+        avg_win_hold = mean(hold_time[is_win])
+        avg_loss_hold = mean(hold_time[is_loss])
         
         print("\n===== Performance Metrics =====")
         print(f"Total Return: {((self.balance - self.initial_balance) / self.initial_balance * 100):.2f}%")
         print(f"Total Trades: {len(self.trades)}")
-        print(f"Overall Win Rate: {(len(winning_trades) / len(self.trades) * 100):.2f}%")
-        print(f"Average Win: {winning_trades['pnl'].mean():.2f}")
-        print(f"Average Loss: {losing_trades['pnl'].mean():.2f}")
-        print(f"Profit Factor: {abs(winning_trades['pnl'].sum() / losing_trades['pnl'].sum()):.2f}" if losing_trades['pnl'].sum() != 0 else "Profit Factor: ∞")
+        print(f"Overall Win Rate: {(len(winning_pnl) / len(self.trades) * 100):.2f}%")
+        print(f"Average Win: {mean(winning_pnl):.2f}")
+        print(f"Average Loss: {mean(losing_pnl):.2f}")
+        print(f"Profit Factor: {abs(winning_pnl.sum() / losing_pnl.sum()):.2f}" if losing_pnl.sum() != 0 else "Profit Factor: ∞")
         print(f"Current Drawdown: {((self.max_balance - self.balance) / self.max_balance * 100):.2f}%")
         
         print("\n===== Hold Time Analysis =====")
@@ -589,11 +592,11 @@ class TradingEnv(gym.Env, EzPickle):
         print(f"Losers Hold Time: {avg_loss_hold:.1f} bars")
         
         print("\n===== Directional Performance =====")
-        total_trades = len(trades_df)
-        long_pct = (len(long_trades) / total_trades * 100) if total_trades > 0 else 0.0
-        short_pct = (len(short_trades) / total_trades * 100) if total_trades > 0 else 0.0
-        
-        print(f"Long Trades: {len(long_trades)} ({long_pct:.1f}%)")
-        print(f"Long Win Rate: {(len(long_wins) / len(long_trades) * 100):.1f}% (Avg PnL: {long_trades['pnl'].mean():.2f})" if len(long_trades) > 0 else "Long Win Rate: N/A")
-        print(f"Short Trades: {len(short_trades)} ({short_pct:.1f}%)")
-        print(f"Short Win Rate: {(len(short_wins) / len(short_trades) * 100):.1f}% (Avg PnL: {short_trades['pnl'].mean():.2f})" if len(short_trades) > 0 else "Short Win Rate: N/A")
+        total_trades = len(self.trades)
+        long_pct = (len(long_pnl) / total_trades * 100) if total_trades > 0 else 0.0
+        short_pct = (len(short_pnl) / total_trades * 100) if total_trades > 0 else 0.0
+        
+        print(f"Long Trades: {len(long_pnl)} ({long_pct:.1f}%)")
+        print(f"Long Win Rate: {(long_wins / len(long_pnl) * 100):.1f}% (Avg PnL: {mean(long_pnl):.2f})" if len(long_pnl) > 0 else "Long Win Rate: N/A")
+        print(f"Short Trades: {len(short_pnl)} ({short_pct:.1f}%)")
+        print(f"Short Win Rate: {(short_wins / len(short_pnl) * 100):.1f}% (Avg PnL: {mean(short_pnl):.2f})" if len(short_pnl) > 0 else "Short Win Rate: N/A")
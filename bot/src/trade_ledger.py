@@ -0,0 +1,175 @@
+"""
+Columnar trade ledger for the trading environment.
+
+Closed trades are appended into preallocated, growable NumPy columns
+(struct of arrays) instead of one dict per trade. Entry and exit
+timestamps are resolved from step indices only when a DataFrame or JSON
+export is requested.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class TradeLedger:
+    """Growable struct-of-arrays store of closed trades."""
+
+    COLUMNS = {
+        'entry_step': np.int64,
+        'exit_step': np.int64,
+        'entry_price': np.float64,
+        'exit_price': np.float64,
+        'entry_atr': np.float64,
+        'profit_pips': np.float64,
+        'pnl': np.float64,
+        'direction': np.int8,
+        'lot_size': np.float32,
+    }
+
+    # Column order of exported trades (matches the former trade dicts)
+    EXPORT_ORDER = ['direction', 'entry_price', 'lot_size', 'entry_time', 'entry_step',
+                    'entry_atr', 'exit_price', 'exit_step', 'exit_time', 'profit_pips',
+                    'pnl', 'hold_time']
+
+    def __init__(self, index: Optional[pd.Index] = None, capacity: int = 256):
+        """
+        Initialize an empty ledger.
+
+        Args:
+            index: Timestamps of the environment bars, used to resolve entry/exit times
+            capacity: Initial number of preallocated rows
+        """
+        self.index = index
+        self._size = 0
+        self._data = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over trades as record dicts."""
+        return iter(self.to_records())
+
+    def __getitem__(self, key: Union[str, int, slice]) -> Union[np.ndarray, Dict[str, Any], List[Dict[str, Any]]]:
+        """Return a column view by name, a single trade record by position, or records by slice."""
+        if isinstance(key, str):
+            if key == 'hold_time':
+                return self.hold_time
+            return self._data[key][:self._size]
+        if isinstance(key, slice):
+            return [self.record(i) for i in range(*key.indices(self._size))]
+        return self.record(key)
+
+    @property
+    def capacity(self) -> int:
+        """Number of preallocated rows."""
+        return len(self._data['pnl'])
+
+    @property
+    def hold_time(self) -> np.ndarray:
+        """Bars each trade was held."""
+        return self['exit_step'] - self['entry_step']
+
+    def append(self, entry_step: int, exit_step: int, entry_price: float, exit_price: float,
+               pnl: float, profit_pips: float, direction: int, lot_size: float,
+               entry_atr: float = np.nan) -> None:
+        """Record a closed trade, growing the columns geometrically when full.
+
+        Args:
+            entry_step: Bar index the position was opened at
+            exit_step: Bar index the position was closed at
+            entry_price: Entry price including spread
+            exit_price: Exit price
+            pnl: Realized P/L
+            profit_pips: Realized move in pips
+            direction: 1 for long, -1 for short
+            lot_size: Position size in lots
+            entry_atr: ATR at entry
+        """
+        if self._size == self.capacity:
+            self._grow()
+        i = self._size
+        data = self._data
+        data['entry_step'][i] = entry_step
+        data['exit_step'][i] = exit_step
+        data['entry_price'][i] = entry_price
+        data['exit_price'][i] = exit_price
+        data['entry_atr'][i] = entry_atr
+        data['profit_pips'][i] = profit_pips
+        data['pnl'][i] = pnl
+        data['direction'][i] = direction
+        data['lot_size'][i] = lot_size
+        self._size = i + 1
+
+    def _grow(self) -> None:
+        """Double the capacity of every column."""
+        new_capacity = max(1, self.capacity) * 2
+        for name, column in self._data.items():
+            grown = np.zeros(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def clear(self) -> None:
+        """Drop all trades, keeping the allocated capacity."""
+        self._size = 0
+
+    def copy(self) -> 'TradeLedger':
+        """Return an independent ledger holding the same trades."""
+        ledger = TradeLedger(index=self.index, capacity=max(1, self._size))
+        for name in self.COLUMNS:
+            ledger._data[name][:self._size] = self[name]
+        ledger._size = self._size
+        return ledger
+
+    def balance_curve(self, initial_balance: float) -> np.ndarray:
+        """Account balance after each trade."""
+        return initial_balance + np.cumsum(self['pnl'])
+
+    def max_drawdown(self, initial_balance: float) -> float:
+        """Maximum peak-to-trough drawdown (fraction) over the trade-by-trade balance."""
+        if not self._size:
+            return 0.0
+        balance = self.balance_curve(initial_balance)
+        peak = np.maximum.accumulate(np.maximum(balance, initial_balance))
+        drawdown = np.divide(peak - balance, peak, out=np.zeros_like(balance), where=peak > 0)
+        return float(max(0.0, drawdown.max()))
+
+    def _timestamps(self, steps: np.ndarray) -> np.ndarray:
+        """Resolve bar indices to timestamp strings."""
+        if self.index is None:
+            return steps.astype(str)
+        # Format each label like str(timestamp); Index.astype(str) drops the
+        # time of day when every selected timestamp falls on midnight
+        return np.array([str(label) for label in self.index[steps]], dtype=object)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Export trades as a DataFrame, resolving entry/exit timestamps."""
+        columns = {name: self[name] for name in self.COLUMNS}
+        # Lots are stored as float32; round back to the 0.01 lot grid
+        columns['lot_size'] = np.round(columns['lot_size'].astype(np.float64), 2)
+        columns['entry_time'] = self._timestamps(columns['entry_step'])
+        columns['exit_time'] = self._timestamps(columns['exit_step'])
+        columns['hold_time'] = self.hold_time
+        return pd.DataFrame(columns, columns=self.EXPORT_ORDER)
+
+    def record(self, position: int) -> Dict[str, Any]:
+        """Export one trade like to_records(), resolving only its own two timestamps."""
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError(f"Trade index out of range: {position}")
+        values = {name: self._data[name][position].item() for name in self.COLUMNS}
+        # Lots are stored as float32; round back to the 0.01 lot grid
+        values['lot_size'] = np.round(np.float64(self._data['lot_size'][position]), 2).item()
+        values['entry_time'], values['exit_time'] = self._timestamps(
+            np.array([values['entry_step'], values['exit_step']], dtype=np.int64))
+        values['hold_time'] = values['exit_step'] - values['entry_step']
+        return {name: values[name] for name in self.EXPORT_ORDER}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Export trades as JSON-serializable dicts."""
+        if not self._size:
+            return []
+        return self.to_frame().to_dict(orient='records')
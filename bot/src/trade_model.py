@@ -2,27 +2,35 @@
 
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any, Tuple
+from typing import Dict, List, Optional, Sequence, Union, Any, Tuple
 
 import numpy as np
 import pandas as pd
 from sb3_contrib.ppo_recurrent import RecurrentPPO
 
+from backtest_trace import BacktestTrace
+from cost_sweep import CostScenario, run_cost_sweep
+from feature_cache import FeatureCache
+from inference_session import InferenceSession
+from lockstep_backtest import LaneResult, run_lockstep
 from trade_environment import TradingEnv
 
 class TradeModel:
     """Class for loading and making predictions with a trained PPO-LSTM model."""
     
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, feature_cache_dir: Optional[str] = None):
         """
         Initialize the trade model.
         
         Args:
             model_path: Path to the saved model file
+            feature_cache_dir: Optional directory for cached features, reused
+                across backtests over the same data
         """
         self.logger = logging.getLogger(__name__)
         self.model_path = Path(model_path)
         self.model = None
+        self.feature_cache = FeatureCache(feature_cache_dir) if feature_cache_dir else None
         self.required_columns = [
             'open',   # Required for price action features
             'close',  # Price data
@@ -32,6 +40,8 @@ class TradeModel:
         ]
         
         self.lstm_states = None  # Store LSTM states for continuous prediction
+        self._session = None  # Persistent session behind predict_single
+        self._last_prediction = None
         
         # Load the model
         self.load_model()
@@ -43,28 +53,10 @@ class TradeModel:
             bool: True if model loaded successfully, False otherwise
         """
         try:
-            # Create minimal dummy data for model loading
-            dummy_data = pd.DataFrame({
-                'time': pd.date_range(start='2024-01-01', periods=10, freq='15min'),
-                'open': [1.0] * 10,
-                'close': [1.0] * 10,
-                'high': [1.0] * 10,
-                'low': [1.0] * 10,
-                'spread': [0.0001] * 10,
-                'volume': [1000] * 10  # Optional but included for completeness
-            })
-            dummy_data.set_index('time', inplace=True)
-            
-            env = TradingEnv(
-                data=dummy_data,
-                random_start=False,
-                balance_per_lot=1000.0  # Match training environment
-            )
-            
-            # Load the PPO model with saved hyperparameters
+            # Load the PPO model with saved hyperparameters; the observation and
+            # action spaces are stored with the model, so no environment is needed
             self.model = RecurrentPPO.load(
                 self.model_path,
-                env=env,
                 print_system_info=False
             )
             self.logger.info(f"Model successfully loaded from {self.model_path}")
@@ -97,10 +89,33 @@ class TradeModel:
             
         return data
         
+    def session(self, initial_balance: float = 10000.0, balance_per_lot: float = 1000.0,
+                deterministic: bool = True) -> InferenceSession:
+        """
+        Create a persistent inference session for bar-by-bar prediction.
+        
+        Args:
+            initial_balance: Starting balance of the simulated account
+            balance_per_lot: Account balance required per 0.01 lot
+            deterministic: Whether to use deterministic actions
+            
+        Returns:
+            InferenceSession whose on_bar() returns an action in constant time
+        
+        Raises:
+            ValueError: If model not loaded
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Call load_model() first.")
+        return InferenceSession(self.model, initial_balance, balance_per_lot, deterministic)
+        
     def predict_single(self, data_frame: pd.DataFrame) -> Dict[str, Any]:
         """
         Make a prediction for the latest data point.
         
+        Only bars newer than the last call are fed to the persistent session,
+        so repeated calls with a rolling window cost O(1) per new bar.
+        
         Args:
             data_frame: DataFrame with market data
             
@@ -108,51 +123,33 @@ class TradeModel:
             Dictionary with prediction details
         
         Raises:
-            ValueError: If model not loaded or data preparation fails
+            ValueError: If model not loaded, data preparation fails or there
+                are not enough bars to warm up the indicators
         """
         if self.model is None:
             raise ValueError("Model not loaded. Call load_model() first.")
         
-        # If no LSTM states exist, preload with historical data
-        if self.lstm_states is None and len(data_frame) > 1:
-            historical_data = data_frame.iloc[:-1]  # All but the last bar
-            self.preload_states(historical_data)
-            
         # Prepare data
         data = self.prepare_data(data_frame)
         
-        # Create a temporary environment with simplified features
-        env = TradingEnv(
-            data=data,
-            random_start=False,
-            balance_per_lot=1000.0  # Match training environment
-        )
-        
-        # Get normalized observation
-        observation = env.get_history()
+        if self._session is None:
+            self._session = self.session()
         
-        # Make prediction with LSTM state management and proper deterministic setting
-        action, self.lstm_states = self.model.predict(
-            observation, 
-            state=self.lstm_states,
-            deterministic=True     # Use deterministic for backtesting
-        )
+        result = self._session.on_bars(data)
+        if result is not None:
+            self._last_prediction = result
+        if self._last_prediction is None:
+            raise ValueError(f"Insufficient data: {self._session.bars_seen} bars seen, indicators still warming up")
+        self.lstm_states = self._session.lstm_states
         
-        # Process action (0=hold, 1=buy, 2=sell, 3=close)
-        discrete_action = int(action) % 4
-        
-        # Create prediction result
-        result = {
-            'action': discrete_action,
-            'description': ['hold', 'buy', 'sell', 'close'][discrete_action]
-        }
-
-        self.logger.debug(f"Prediction: {result}")
-        return result
+        self.logger.debug(f"Prediction: {self._last_prediction}")
+        return self._last_prediction
     
     def reset_states(self) -> None:
         """Reset the LSTM states. Call this when starting a new prediction sequence."""
         self.lstm_states = None
+        self._session = None
+        self._last_prediction = None
         
     def preload_states(self, historical_data: pd.DataFrame) -> None:
         """
@@ -173,29 +170,15 @@ class TradeModel:
         # Reset states before preloading
         self.reset_states()
         
-        # Create environment for preloading
-        env = TradingEnv(
-            data=data,
-            random_start=False,
-            balance_per_lot=1000.0  # Match training environment
-        )
-        
         # Step through historical data to build up LSTM state
-        obs, _ = env.reset()
-        for _ in range(len(data)):
-            # Action doesn't matter for preloading, we only care about state updates
-            _, self.lstm_states = self.model.predict(
-                obs,
-                state=self.lstm_states,
-                deterministic=True
-            )
-            obs, _, done, _, _ = env.step(1)
-            if done:
-                break
+        self._session = self.session()
+        self._last_prediction = self._session.on_bars(data)
+        self.lstm_states = self._session.lstm_states
                 
         self.logger.info(f"LSTM states preloaded with {len(data)} historical bars")
     
-    def backtest(self, data: pd.DataFrame, initial_balance: float = 10000.0, balance_per_lot: float = 1000.0) -> Dict[str, Any]:
+    def backtest(self, data: pd.DataFrame, initial_balance: float = 10000.0, balance_per_lot: float = 1000.0,
+                 trace: Optional[BacktestTrace] = None) -> Dict[str, Any]:
         """
         Run a backtest with the model.
         
@@ -203,6 +186,8 @@ class TradeModel:
             data: DataFrame with market data
             initial_balance: Starting account balance
             balance_per_lot: Account balance required per 0.01 lot
+            trace: Optional trace recording the sampled or full per-step
+                observations, actions, prices, balances and positions
             
         Returns:
             Dictionary with backtest results and trade history
@@ -213,31 +198,18 @@ class TradeModel:
         if self.model is None:
             raise ValueError("Model not loaded. Call load_model() first.")
         
-        # Prepare data
         data = self.prepare_data(data)
-        
-        # Create environment for backtesting
-        env = TradingEnv(
-            data=data,
-            initial_balance=initial_balance,
-            balance_per_lot=balance_per_lot,
-            random_start=False
-        )
-        
-        # Preload LSTM states with initial data
-        preload_bars = min(50, len(data) // 4)  # Use 25% of data or 50 bars, whichever is smaller
-        if preload_bars > 0:
-            preload_data = data.iloc[:preload_bars]
-            self.preload_states(preload_data)
-            lstm_states = self.lstm_states
-        else:
-            lstm_states = None
+        env, lstm_states = self._backtest_env(data, initial_balance, balance_per_lot)
         
         # Reset states and run backtest
         obs, _ = env.reset()
         done = False
         step = 0
         total_reward = 0.0
+        equity = np.zeros(env.data_length, dtype=np.float64)  # Balance plus unrealized P/L after each step
+        tracing = trace is not None and trace.enabled
+        if tracing:
+            trace.allocate(env.data_length, env.observation_space.shape[0])
         
         while not done:
             action, lstm_states = self.model.predict(
@@ -247,86 +219,174 @@ class TradeModel:
             )
             # Process action (0=hold, 1=buy, 2=sell, 3=close)
             discrete_action = int(action) % 4
-            self.logger.info(f"Step {step}:")
-            self.logger.info(f"  Observation: {obs}")
-            self.logger.info(f"  Action: {discrete_action} (0=hold,1=buy,2=sell,3=close)")
-            self.logger.info(f"  Price: {data.iloc[env.current_step]['close']:.2f}")
-            obs, reward, done, _, _ = env.step(discrete_action)
+            if tracing and trace.wants(step):
+                position = env.current_position
+                trace.record(env.current_step, discrete_action, obs, env.prices['close'][env.current_step],
+                             env.balance, position['direction'] if position else 0)
+            obs, reward, done, _, info = env.step(discrete_action)
+            equity[step] = info['balance'] + info['position'].get('unrealized_pnl', 0.0)
             total_reward += reward
             step += 1
             
-        return self._calculate_backtest_metrics(env, step, total_reward)
+        if tracing:
+            self.logger.info(f"Backtest trace: {len(trace)} of {step} steps recorded")
+        return self._calculate_backtest_metrics(env, step, total_reward, equity[:step])
 
-    def _calculate_backtest_metrics(self, env: TradingEnv, total_steps: int, total_reward: float) -> Dict[str, Any]:
-        """Calculate metrics from backtest results."""
+    def cost_sweep(self, data: pd.DataFrame, scenarios: Sequence[CostScenario],
+                   initial_balance: float = 10000.0) -> pd.DataFrame:
+        """
+        Backtest the model against many cost scenarios in one batched rollout.
+        
+        Args:
+            data: DataFrame with market data
+            scenarios: Cost scenarios (spread multiplier, commission, slippage,
+                balance per lot), one lane each
+            initial_balance: Starting account balance of every scenario
+            
+        Returns:
+            DataFrame with return, drawdown and trade count per scenario
+        
+        Raises:
+            ValueError: If model not loaded
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Call load_model() first.")
+        
+        data = self.prepare_data(data)
+        env, lstm_states = self._backtest_env(data, initial_balance)
+        table = run_cost_sweep(self.model, env, scenarios, lstm_states)
+        self.logger.info(f"Cost sweep: {len(scenarios)} scenarios, {table.attrs['policy_forwards']:,d} policy "
+                         f"forwards for {table.attrs['lane_steps']:,d} lane steps")
+        return table
+    
+    @staticmethod
+    def backtest_lockstep(models: Sequence['TradeModel'], data: pd.DataFrame, initial_balance: float = 10000.0,
+                          balance_per_lot: float = 1000.0, fuse: bool = True) -> List[Dict[str, Any]]:
+        """
+        Backtest several models over the same data in a single pass.
+        
+        The features are computed once and every model trades its own lane;
+        models with the same architecture are evaluated in one batched
+        forward per bar.
+        
+        Args:
+            models: Loaded trade models
+            data: DataFrame with market data
+            initial_balance: Starting account balance
+            balance_per_lot: Account balance required per 0.01 lot
+            fuse: Batch the policies into one forward when their architectures match
+            
+        Returns:
+            Backtest results of each model, as returned by backtest()
+        
+        Raises:
+            ValueError: If a model is not loaded
+        """
+        if any(model.model is None for model in models):
+            raise ValueError("Model not loaded. Call load_model() first.")
+        
+        first = models[0]
+        data = first.prepare_data(data)
+        env = TradingEnv(
+            data=data,
+            initial_balance=initial_balance,
+            balance_per_lot=balance_per_lot,
+            random_start=False,
+            feature_cache=first.feature_cache
+        )
+        lstm_states = [model._preload_backtest_states(data) for model in models]
+        
+        lanes = run_lockstep([model.model.policy for model in models], env, lstm_states, fuse=fuse)
+        return [model._calculate_backtest_metrics(lane, lane.total_steps, lane.total_reward, lane.equity)
+                for model, lane in zip(models, lanes)]
+    
+    def _backtest_env(self, data: pd.DataFrame, initial_balance: float,
+                      balance_per_lot: float = 1000.0) -> Tuple[TradingEnv, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """Create the backtest environment and the LSTM states preloaded on the first bars."""
+        env = TradingEnv(
+            data=data,
+            initial_balance=initial_balance,
+            balance_per_lot=balance_per_lot,
+            random_start=False,
+            feature_cache=self.feature_cache
+        )
+        return env, self._preload_backtest_states(data)
+    
+    def _preload_backtest_states(self, data: pd.DataFrame) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """LSTM states after preloading the first bars of the backtest data."""
+        preload_bars = min(50, len(data) // 4)  # Use 25% of data or 50 bars, whichever is smaller
+        if preload_bars > 0:
+            preload_data = data.iloc[:preload_bars]
+            self.preload_states(preload_data)
+            lstm_states = self.lstm_states
+        else:
+            lstm_states = None
+        
+        return lstm_states
+
+    def _calculate_backtest_metrics(self, env: Union[TradingEnv, LaneResult], total_steps: int,
+                                    total_reward: float, equity_curve: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Calculate metrics from backtest results in a single vectorized pass over the trade ledger.
+        
+        env is the finished TradingEnv, or a lockstep LaneResult carrying the same account fields.
+        equity_curve (balance plus unrealized P/L after each step) is passed through as
+        'equity_curve' for bar-level analysis such as the Monte Carlo bootstrap.
+        """
+        ledger = env.trades
+        total_trades = len(ledger)
+        
         metrics = {
             'final_balance': float(env.balance),
             'initial_balance': float(env.initial_balance),
             'return_pct': ((env.balance / env.initial_balance) - 1) * 100,
-            'total_trades': len(env.trades),
+            'total_trades': total_trades,
             'win_count': env.win_count,
             'loss_count': env.loss_count,
-            'win_rate': (env.win_count / len(env.trades) * 100) if env.trades else 0.0,
+            'win_rate': (env.win_count / total_trades * 100) if total_trades else 0.0,
             'total_steps': total_steps,
             'total_reward': total_reward,
-            'active_positions': len(env.positions),
-            'grid_metrics': env.grid_metrics,
-            'trades': env.trades
+            'active_position': int(env.current_position is not None),
+            'trades': ledger.to_records()
         }
+        if equity_curve is not None:
+            metrics['equity_curve'] = equity_curve
         
-        if env.trades:
-            trades_df = pd.DataFrame(env.trades)
+        if total_trades:
+            pnl = ledger['pnl']
+            direction = ledger['direction']
+            hold_time = ledger.hold_time
             
-            # Split trades by direction
-            long_trades = trades_df[trades_df['direction'] == 1]
-            short_trades = trades_df[trades_df['direction'] == -1]
-            long_wins = long_trades[long_trades['pnl'] > 0]
-            short_wins = short_trades[short_trades['pnl'] > 0]
+            is_win = pnl > 0
+            is_loss = pnl < 0
+            is_long = direction == 1
+            is_short = direction == -1
             
             # Calculate directional metrics
-            metrics['long_trades'] = len(long_trades)
-            metrics['short_trades'] = len(short_trades)
-            metrics['long_win_rate'] = (len(long_wins) / len(long_trades) * 100) if len(long_trades) > 0 else 0.0
-            metrics['short_win_rate'] = (len(short_wins) / len(short_trades) * 100) if len(short_trades) > 0 else 0.0
-            
-            # Overall win/loss metrics
-            winning_trades = trades_df[trades_df['pnl'] > 0]
-            losing_trades = trades_df[trades_df['pnl'] < 0]
+            long_trades = int(is_long.sum())
+            short_trades = int(is_short.sum())
+            metrics['long_trades'] = long_trades
+            metrics['short_trades'] = short_trades
+            metrics['long_win_rate'] = float((is_long & is_win).sum() / long_trades * 100) if long_trades > 0 else 0.0
+            metrics['short_win_rate'] = float((is_short & is_win).sum() / short_trades * 100) if short_trades > 0 else 0.0
             
             # Calculate PnL metrics
-            metrics['total_profit'] = float(winning_trades['pnl'].sum()) if not winning_trades.empty else 0.0
-            metrics['total_loss'] = float(abs(losing_trades['pnl'].sum())) if not losing_trades.empty else 0.0
+            metrics['total_profit'] = float(pnl[is_win].sum())
+            metrics['total_loss'] = float(abs(pnl[is_loss].sum()))
             metrics['profit_factor'] = metrics['total_profit'] / metrics['total_loss'] if metrics['total_loss'] > 0 else float('inf')
-            metrics['expected_value'] = float(trades_df['pnl'].mean()) if not trades_df.empty else 0.0
+            metrics['expected_value'] = float(pnl.mean())
             
-            # Initialize default metrics for zero-trade case
-            metrics['max_drawdown_pct'] = 0.0
+            # Drawdown over the trade-by-trade balance curve
+            metrics['max_drawdown_pct'] = ledger.max_drawdown(env.initial_balance) * 100
             metrics['current_drawdown_pct'] = 0.0
             metrics['historical_max_drawdown_pct'] = 0.0
-
-            # Calculate drawdown only if there are trades
-            if env.trades:
-                balance_history = []
-                current_balance = env.initial_balance
-                peak_balance = current_balance
-                max_drawdown = 0.0
-                
-                for trade in env.trades:
-                    current_balance += trade['pnl']
-                    balance_history.append(current_balance)
-                    peak_balance = max(peak_balance, current_balance)
-                    drawdown = (peak_balance - current_balance) / peak_balance if peak_balance > 0 else 0
-                    max_drawdown = max(max_drawdown, drawdown)
-                
-                metrics['max_drawdown_pct'] = float(max_drawdown * 100)
             
             # Calculate Sharpe ratio
-            returns = pd.Series(trades_df['pnl']) / env.initial_balance
-            metrics['sharpe_ratio'] = float((returns.mean() / returns.std()) * np.sqrt(252)) if len(returns) > 1 else 0.0
+            returns = pnl / env.initial_balance
+            metrics['sharpe_ratio'] = float((returns.mean() / returns.std(ddof=1)) * np.sqrt(252)) if total_trades > 1 else 0.0
             
             # Hold time analysis
-            metrics['avg_hold_time'] = float(trades_df['hold_time'].mean())
-            metrics['win_hold_time'] = float(winning_trades['hold_time'].mean()) if not winning_trades.empty else 0.0
-            metrics['loss_hold_time'] = float(losing_trades['hold_time'].mean()) if not losing_trades.empty else 0.0
+            metrics['avg_hold_time'] = float(hold_time.mean())
+            metrics['win_hold_time'] = float(hold_time[is_win].mean()) if is_win.any() else 0.0
+            metrics['loss_hold_time'] = float(hold_time[is_loss].mean()) if is_loss.any() else 0.0
         
         return metrics
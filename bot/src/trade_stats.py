@@ -0,0 +1,129 @@
+"""
+Running trade statistics for the trading environment.
+
+Closed trades are folded into O(1) accumulators (count, sum and
+Welford mean/variance) so trade metrics never require rescanning the
+trade history.
+"""
+
+import math
+from typing import Dict
+
+
+class RunningStats:
+    """Count, sum and Welford mean/variance of a stream of values."""
+
+    __slots__ = ('count', 'total', 'mean', 'm2')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all accumulated values."""
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value: float) -> None:
+        """Add a value in O(1).
+
+        Args:
+            value: New observation
+        """
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def average(self) -> float:
+        """Sum divided by count (0 when empty), matching sum(values) / len(values)."""
+        return self.total / self.count if self.count else 0.0
+
+    def variance(self, ddof: int = 1) -> float:
+        """Variance of the values (0 when fewer than ddof + 1 values).
+
+        Args:
+            ddof: Delta degrees of freedom (1 for sample variance)
+        """
+        if self.count <= ddof:
+            return 0.0
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof: int = 1) -> float:
+        """Standard deviation of the values."""
+        return math.sqrt(self.variance(ddof))
+
+
+class TradeStatistics:
+    """Incremental win/loss, hold-time and per-direction trade statistics."""
+
+    def __init__(self):
+        self.pnl = RunningStats()
+        self.wins = RunningStats()          # pnl > 0
+        self.losses = RunningStats()        # pnl <= 0
+        self.hold_time = RunningStats()
+        self.win_hold_time = RunningStats()
+        self.loss_hold_time = RunningStats()
+        self.long = RunningStats()
+        self.short = RunningStats()
+        self.long_wins = 0
+        self.short_wins = 0
+
+    def reset(self) -> None:
+        """Clear all statistics."""
+        for stats in (self.pnl, self.wins, self.losses, self.hold_time,
+                      self.win_hold_time, self.loss_hold_time, self.long, self.short):
+            stats.reset()
+        self.long_wins = 0
+        self.short_wins = 0
+
+    def update(self, pnl: float, hold_time: int, direction: int) -> None:
+        """Fold a closed trade into the statistics.
+
+        Args:
+            pnl: Realized P/L of the trade
+            hold_time: Bars the position was held
+            direction: 1 for long, -1 for short
+        """
+        self.pnl.update(pnl)
+        self.hold_time.update(hold_time)
+
+        if pnl > 0:
+            self.wins.update(pnl)
+            self.win_hold_time.update(hold_time)
+        else:
+            self.losses.update(pnl)
+            self.loss_hold_time.update(hold_time)
+
+        if direction == 1:
+            self.long.update(pnl)
+            self.long_wins += int(pnl > 0)
+        else:
+            self.short.update(pnl)
+            self.short_wins += int(pnl > 0)
+
+    def metrics(self) -> Dict[str, float]:
+        """Summary metrics for TradingEnv.trade_metrics."""
+        total = self.pnl.count
+        return {
+            'win_rate': self.wins.count / total if total else 0.0,
+            'avg_profit': self.wins.average,
+            'avg_loss': self.losses.average,
+            'total_trades': total,
+            'pnl_std': self.pnl.std(),
+            'profit_std': self.wins.std(),
+            'loss_std': self.losses.std(),
+            'avg_hold_time': self.hold_time.average,
+            'hold_time_std': self.hold_time.std(),
+            'avg_win_hold_time': self.win_hold_time.average,
+            'avg_loss_hold_time': self.loss_hold_time.average,
+            'long_trades': self.long.count,
+            'short_trades': self.short.count,
+            'long_win_rate': self.long_wins / self.long.count if self.long.count else 0.0,
+            'short_win_rate': self.short_wins / self.short.count if self.short.count else 0.0,
+            'long_avg_pnl': self.long.average,
+            'short_avg_pnl': self.short.average,
+        }
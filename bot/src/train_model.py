@@ -3,6 +3,8 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Disable oneDNN custom operations
 
 import re
 import json
+import functools
+import multiprocessing
 import numpy as np
 import pandas as pd
 import optuna
@@ -10,61 +12,208 @@ import joblib
 from datetime import datetime
 from stable_baselines3 import DQN, PPO
 from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.callbacks import EvalCallback, StopTrainingOnNoModelImprovement, BaseCallback, CheckpointCallback
+from stable_baselines3.common.callbacks import EvalCallback, StopTrainingOnNoModelImprovement, CheckpointCallback
 from stable_baselines3.common.evaluation import evaluate_policy
 from trade_environment import TradingEnv
+from feature_cache import FeatureCache
+from compact_replay_buffer import IndexReplayBuffer
+from replay_prefill import prefill_replay_buffer
+from evaluation_bus import EvaluationBus, EvaluationSubscriber, run_evaluation, unwrap_trading_env
 import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
-class CustomRenderCallback(BaseCallback):
-    """Custom callback for explicitly calling render on evaluation environment"""
-    def __init__(self, eval_env, eval_freq=10000, verbose=0):
-        super(CustomRenderCallback, self).__init__(verbose)
-        self.eval_env = eval_env
-        self.eval_freq = eval_freq
-        self.last_time_trigger = 0
-        
-    def _on_step(self) -> bool:
-        if self.n_calls >= self.last_time_trigger + self.eval_freq:
-            print("\n===== EVALUATION METRICS =====")
-            
-            # Run a quick evaluation episode
-            obs, _ = self.eval_env.reset()
-            done = False
-            total_reward = 0
-            
-            while not done:
-                action, _ = self.model.predict(obs, deterministic=True)
-                obs, reward, terminated, truncated, _ = self.eval_env.step(action)
-                done = terminated or truncated
-                total_reward += reward
-            
-            # Call render to display metrics
-            print(f"\nEvaluation episode complete. Total reward: {total_reward:.2f}")
-            if hasattr(self.eval_env, 'env'):
-                # For Monitor-wrapped environments
-                self.eval_env.env.render(mode="human")
-            else:
-                self.eval_env.render(mode="human")
-                
-            self.last_time_trigger = self.n_calls
+def create_study_storage(storage):
+    """Build an Optuna storage from a URL.
+    
+    'journal:<path>' or a path ending in '.log' selects a journal file, which
+    several processes can share without a database server; any other string
+    is passed to Optuna as an RDB URL (e.g. sqlite:///study.db).
+    """
+    if storage is None:
+        return None
+    if storage.startswith('journal:') or storage.endswith('.log'):
+        path = storage[len('journal:'):] if storage.startswith('journal:') else storage
+        try:
+            from optuna.storages.journal import JournalFileBackend
+        except ImportError:  # Optuna < 4.0
+            from optuna.storages import JournalFileStorage as JournalFileBackend
+        return optuna.storages.JournalStorage(JournalFileBackend(path))
+    return storage
+
+def create_pruner(pruner, eval_freq):
+    """Build an Optuna pruner by name.
+    
+    Args:
+        pruner: 'none', 'median', 'halving' (successive halving) or 'hyperband'
+        eval_freq: Timesteps between intermediate evaluations, the smallest
+            budget after which a trial can be pruned
+    """
+    if pruner == 'median':
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=eval_freq)
+    if pruner == 'halving':
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=eval_freq)
+    if pruner == 'hyperband':
+        return optuna.pruners.HyperbandPruner(min_resource=eval_freq)
+    if pruner == 'none':
+        return optuna.pruners.NopPruner()
+    raise ValueError(f"Unknown pruner: {pruner}")
+
+def requeue_interrupted_trials(study):
+    """Fail the trials a crashed run left running and queue their parameters again.
+    
+    Only call this while no worker is running trials of the study. The
+    failed trials get an 'interrupted' user attribute so they count
+    neither towards the finished trials nor towards the timestep budget.
+    
+    Returns:
+        Number of interrupted trials
+    """
+    interrupted = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,))
+    for trial in interrupted:
+        study._storage.set_trial_user_attr(trial._trial_id, 'interrupted', True)
+        study._storage.set_trial_state_values(trial._trial_id, state=optuna.trial.TrialState.FAIL)
+        if trial.params:
+            study.enqueue_trial(trial.params)
+    return len(interrupted)
+
+def suggest(trial, name, distribution):
+    """Suggest a parameter value from an Optuna distribution."""
+    if isinstance(distribution, optuna.distributions.CategoricalDistribution):
+        return trial.suggest_categorical(name, distribution.choices)
+    if isinstance(distribution, optuna.distributions.IntDistribution):
+        return trial.suggest_int(name, distribution.low, distribution.high, log=distribution.log)
+    return trial.suggest_float(name, distribution.low, distribution.high, log=distribution.log)
+
+def seed_trials_within(study, distributions):
+    """Copy the completed trials of a study whose parameters lie inside a search space.
+    
+    Args:
+        study: Study to copy trials from
+        distributions: Search space of the new study
+        
+    Returns:
+        Frozen trials for Study.add_trials, marked with a 'seeded_from' user attribute
+    """
+    seeds = []
+    for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)):
+        if trial.value is None or not np.isfinite(trial.value) or set(trial.params) != set(distributions):
+            continue
+        inside = all(
+            value in distribution.choices
+            if isinstance(distribution, optuna.distributions.CategoricalDistribution)
+            else distribution.low <= value <= distribution.high
+            for value, distribution in ((trial.params[name], distributions[name]) for name in distributions)
+        )
+        if inside:
+            seeds.append(optuna.trial.create_trial(
+                params=trial.params,
+                distributions=distributions,
+                value=trial.value,
+                user_attrs={'seeded_from': f"{study.study_name}/{trial.number}"}
+            ))
+    return seeds
+
+class TimestepBudget:
+    """Timestep budget shared by the trials of a search, spent on the most promising ones.
+    
+    Every trial first trains min_timesteps, and min_timesteps stays reserved
+    for every trial that has not started yet. Once at least min_peers other
+    trials have a first-rung balance, allocate() extends a trial to
+    max_timesteps if its balance is in the top_fraction of its rung, within
+    what the total leaves after those reservations. Each trial records its
+    committed timesteps in its user attributes as soon as they are granted,
+    so workers sharing a study share the budget.
+    """
+    
+    def __init__(self, total_timesteps, min_timesteps, max_timesteps, n_trials,
+                 top_fraction=1/3, min_peers=4):
+        self.total_timesteps = total_timesteps
+        self.min_timesteps = min_timesteps
+        self.max_timesteps = max_timesteps
+        self.n_trials = n_trials
+        self.top_fraction = top_fraction
+        self.min_peers = min_peers
+        
+    def _trials(self, trial):
+        """Trials of the search itself (seeded trials never trained under this budget)."""
+        return [t for t in trial.study.get_trials(deepcopy=False)
+                if 'seeded_from' not in t.user_attrs and 'interrupted' not in t.user_attrs]
+        
+    def available(self, trial):
+        """Timesteps left after what started trials committed and unstarted trials reserve."""
+        started = [t for t in self._trials(trial) if 'timesteps' in t.user_attrs]
+        # A pruned trial stopped training where it was pruned
+        committed = sum(t.user_attrs.get('pruned_at', t.user_attrs['timesteps']) for t in started)
+        reserved = max(0, self.n_trials - len(started)) * self.min_timesteps
+        return self.total_timesteps - committed - reserved
+        
+    def start(self, trial):
+        """Commit a trial's first rung before it trains."""
+        trial.set_user_attr('timesteps', self.min_timesteps)
+        
+    def allocate(self, trial, rung_balance):
+        """Record a trial's first-rung balance and return its extra timesteps."""
+        trial.set_user_attr('rung_balance', float(rung_balance))
+        peers = [t.user_attrs['rung_balance'] for t in self._trials(trial)
+                 if t.number != trial.number and 'rung_balance' in t.user_attrs]
+        if len(peers) < self.min_peers:
+            return 0
+        rank = sum(balance > rung_balance for balance in peers)
+        if rank >= max(1, int(self.top_fraction * (len(peers) + 1))):
+            return 0
+        
+        extra = max(0, min(self.max_timesteps - self.min_timesteps, self.available(trial)))
+        trial.set_user_attr('timesteps', self.min_timesteps + extra)
+        # Another worker may have committed in the meantime; give back any overdraft
+        overdraft = -self.available(trial)
+        if extra > 0 and overdraft > 0:
+            extra = max(0, extra - overdraft)
+            trial.set_user_attr('timesteps', self.min_timesteps + extra)
+        return extra
+
+def _search_worker(trainer, study_name, storage, objective, n_trials, torch_threads, worker_id):
+    """Pull trials from a shared study in a worker process."""
+    import torch
+    torch.set_num_threads(torch_threads)
+    
+    # Each worker logs its own trials so workers never overwrite each other's log
+    trainer.create_logger(suffix=f"_worker{worker_id}")
+    study = optuna.load_study(study_name=study_name, storage=create_study_storage(storage),
+                              pruner=trainer.create_pruner())
+    study.optimize(objective, n_trials=n_trials)
+
+
+class CustomRenderCallback(EvaluationSubscriber):
+    """Evaluation subscriber that renders the evaluation environment after an evaluation"""
+    def __init__(self, eval_freq=10000, verbose=0):
+        super(CustomRenderCallback, self).__init__(eval_freq=eval_freq, verbose=verbose)
+        
+    def on_evaluation(self, result, model, env) -> bool:
+        print("\n===== EVALUATION METRICS =====")
+        
+        # The environment is still at the end of the shared evaluation episode
+        print(f"\nEvaluation episode complete. Total reward: {result.rewards[-1]:.2f}")
+        unwrap_trading_env(env).render()
         
         return True
 
-class BalanceEvalCallback(BaseCallback):
+class BalanceEvalCallback(EvaluationSubscriber):
     """
-    Callback for evaluating and saving models based on final account balance.
+    Evaluation subscriber that saves models based on final account balance.
+    
+    With an Optuna trial, each mean balance is reported as an intermediate
+    value and training stops as soon as the trial's pruner says so; the
+    timestep and balance of the decision are stored in the trial's
+    'pruned_at' and 'pruned_balance' attributes. The evaluation at the end
+    of a learn() call is reported but never pruned, so a trial that has
+    finished its training is scored rather than discarded.
     """
-    def __init__(self, eval_env, eval_freq=10000, best_model_save_path=None, 
-                 log_path=None, n_eval_episodes=5, deterministic=True, verbose=1):
-        super(BalanceEvalCallback, self).__init__(verbose=verbose)
-        self.eval_env = eval_env
-        self.eval_freq = eval_freq
+    def __init__(self, eval_freq=10000, best_model_save_path=None, log_path=None, verbose=1, trial=None):
+        super(BalanceEvalCallback, self).__init__(eval_freq=eval_freq, verbose=verbose)
         self.best_model_save_path = best_model_save_path
         self.log_path = log_path
-        self.n_eval_episodes = n_eval_episodes
-        self.deterministic = deterministic
+        self.trial = trial
         self.best_mean_balance = -float("inf")
         self.eval_results = []
         
@@ -74,68 +223,46 @@ class BalanceEvalCallback(BaseCallback):
         if self.log_path is not None:
             os.makedirs(log_path, exist_ok=True)
         
-    def _on_step(self) -> bool:
-        """Run evaluation and save best model at regular intervals."""
-        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
-            mean_balance, std_balance, mean_reward = self.evaluate_policy()
+    def on_evaluation(self, result, model, env) -> bool:
+        """Log the evaluation and save the model if its mean balance is the best so far."""
+        mean_balance, std_balance, mean_reward = result.mean_balance, result.std_balance, result.mean_reward
+        
+        if self.verbose > 0:
+            print(f"Eval num_timesteps={result.timesteps}, "
+                  f"mean_balance={mean_balance:.2f} +/- {std_balance:.2f}, "
+                  f"mean_reward={mean_reward:.2f}")
+        
+        if self.log_path is not None:
+            self.eval_results.append({
+                'timesteps': result.timesteps,
+                'mean_balance': float(mean_balance),
+                'std_balance': float(std_balance),
+                'mean_reward': float(mean_reward)
+            })
             
+            with open(os.path.join(self.log_path, "balance_eval_results.json"), "w") as f:
+                json.dump(self.eval_results, f)
+        
+        if mean_balance > self.best_mean_balance:
             if self.verbose > 0:
-                print(f"Eval num_timesteps={self.num_timesteps}, "
-                      f"mean_balance={mean_balance:.2f} +/- {std_balance:.2f}, "
-                      f"mean_reward={mean_reward:.2f}")
+                print(f"New best mean balance: {mean_balance:.2f}")
             
-            if self.log_path is not None:
-                self.eval_results.append({
-                    'timesteps': self.num_timesteps,
-                    'mean_balance': float(mean_balance),
-                    'std_balance': float(std_balance),
-                    'mean_reward': float(mean_reward)
-                })
-                
-                with open(os.path.join(self.log_path, "balance_eval_results.json"), "w") as f:
-                    json.dump(self.eval_results, f)
+            self.best_mean_balance = mean_balance
             
-            if mean_balance > self.best_mean_balance:
+            if self.best_model_save_path is not None:
+                model.save(os.path.join(self.best_model_save_path, "best_balance_model"))
+        
+        if self.trial is not None:
+            self.trial.report(mean_balance, step=result.timesteps)
+            if result.timesteps < model._total_timesteps and self.trial.should_prune():
                 if self.verbose > 0:
-                    print(f"New best mean balance: {mean_balance:.2f}")
+                    print(f"Pruning trial {self.trial.number} at timesteps={result.timesteps}, "
+                          f"mean_balance={mean_balance:.2f}")
+                self.trial.set_user_attr('pruned_at', result.timesteps)
+                self.trial.set_user_attr('pruned_balance', float(mean_balance))
+                return False
                 
-                self.best_mean_balance = mean_balance
-                
-                if self.best_model_save_path is not None:
-                    self.model.save(os.path.join(self.best_model_save_path, "best_balance_model"))
-                    
         return True
-    
-    def evaluate_policy(self):
-        """Run multiple evaluation episodes and return mean balance, std balance and mean reward."""
-        balances = []
-        rewards = []
-        
-        for i in range(self.n_eval_episodes):
-            obs, _ = self.eval_env.reset()
-            done = False
-            episode_reward = 0
-            
-            while not done:
-                action, _ = self.model.predict(obs, deterministic=self.deterministic)
-                obs, reward, terminated, truncated, _ = self.eval_env.step(action)
-                done = terminated or truncated
-                episode_reward += reward
-            
-            if hasattr(self.eval_env, 'env') and hasattr(self.eval_env.env, 'balance'):
-                balances.append(self.eval_env.env.balance)
-            elif hasattr(self.eval_env, 'balance'):
-                balances.append(self.eval_env.balance)
-            else:
-                raise AttributeError("Cannot access 'balance' attribute in environment")
-            
-            rewards.append(episode_reward)
-        
-        mean_balance = np.mean(balances)
-        std_balance = np.std(balances)
-        mean_reward = np.mean(rewards)
-        
-        return mean_balance, std_balance, mean_reward
 
 class ModelTrainer:
     def __init__(self, model_type, train_data, full_data, config=None):
@@ -154,20 +281,27 @@ class ModelTrainer:
             'initial_balance': 10000.0,
             'device': 'cuda',
             'eval_freq': 50000,
-            'render_freq': 100000
+            'search_eval_freq': 10000,
+            'render_freq': 100000,
+            'feature_cache_dir': None
         }
         self.seed = self.config['seed']
         self.results_dir = f"{self.config['base_dir']}results/{self.seed}"
         self.models_dir = f"{self.config['base_dir']}models"
         
+        # Features are identical across trials, so every environment shares one cache;
+        # the on-disk cache is opt-in since its entries are never evicted
+        cache_dir = self.config.get('feature_cache_dir')
+        self.feature_cache = FeatureCache(cache_dir) if cache_dir else None
+        
         os.makedirs(self.results_dir, exist_ok=True)
         os.makedirs(self.models_dir, exist_ok=True)
         
         self.create_logger()
         
-    def create_logger(self):
+    def create_logger(self, suffix=''):
         """Set up logging to track training progress."""
-        self.log_file = f"{self.results_dir}/training_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        self.log_file = f"{self.results_dir}/training_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}.json"
         self.log_data = []
         
     def save_log(self):
@@ -180,12 +314,14 @@ class ModelTrainer:
         train_params = {
             'initial_balance': self.config['initial_balance'],
             'random_start': True,
+            'feature_cache': self.feature_cache,
             **env_params
         }
         
         full_params = {
             'initial_balance': self.config['initial_balance'],
             'random_start': False,
+            'feature_cache': self.feature_cache,
             **env_params
         }
         
@@ -199,7 +335,11 @@ class ModelTrainer:
         
     def create_model(self, train_env, params):
         """Create a model with given parameters."""
-        return self.model_class(
+        if self.model_type == 'DQN':
+            # Transitions are stored as bar indices into the env's feature matrix
+            params = {'replay_buffer_class': IndexReplayBuffer, **params}
+        
+        model = self.model_class(
             'MlpPolicy', 
             train_env, 
             verbose=0, 
@@ -207,249 +347,406 @@ class ModelTrainer:
             device=self.config['device'],
             **params
         )
+        self.attach_replay_buffer(model, train_env)
+        
+        prefill = self.config.get('prefill', 'random')
+        if self.model_type == 'DQN' and prefill != 'none':
+            # Warm-up experience from many lanes at once instead of one env.step at a time
+            written = prefill_replay_buffer(model, train_env, policy=prefill, seed=self.seed)
+            print(f"Prefilled replay buffer with {written} {prefill} transitions")
+        return model
+        
+    def attach_replay_buffer(self, model, train_env):
+        """Point an index-based replay buffer at the training env's feature matrix."""
+        # Attached after construction so the matrix never ends up in saved model parameters
+        replay_buffer = getattr(model, 'replay_buffer', None)
+        if isinstance(replay_buffer, IndexReplayBuffer):
+            replay_buffer.attach(unwrap_trading_env(train_env).obs_matrix)
+        
+    def create_callbacks(self, full_env, results_dir=None, trial=None):
+        """Create training callbacks using full environment for evaluation.
         
-    def create_callbacks(self, full_env):
-        """Create training callbacks using full environment for evaluation."""
-        balance_eval_callback = BalanceEvalCallback(
-            full_env,
-            best_model_save_path=self.results_dir,
-            log_path=self.results_dir,
-            eval_freq=self.config.get('eval_freq', 50000),
-            deterministic=True,
+        The balance saver and renderer subscribe to one EvaluationBus, so each
+        trigger plays the evaluation episodes once for both of them.
+        
+        Args:
+            full_env: Evaluation environment over the full dataset
+            results_dir: Directory for best models, logs and checkpoints
+                (defaults to the trainer's results directory)
+            trial: Optuna trial that receives intermediate balances and may be pruned;
+                search trials are evaluated every search_eval_freq timesteps
+        """
+        results_dir = results_dir or self.results_dir
+        eval_freq = self.config.get('eval_freq', 50000)
+        if trial is not None:
+            eval_freq = self.config.get('search_eval_freq', 10000)
+        eval_bus = EvaluationBus(full_env, n_eval_episodes=5, deterministic=True)
+        eval_bus.subscribe(BalanceEvalCallback(
+            best_model_save_path=results_dir,
+            log_path=results_dir,
+            eval_freq=eval_freq,
             verbose=1,
-            n_eval_episodes=5
-        )
+            trial=trial
+        ))
+        eval_bus.subscribe(CustomRenderCallback(
+            eval_freq=self.config.get('render_freq', 100000)
+        ))
         
         checkpoint_callback = CheckpointCallback(
             save_freq=max(100000, self.config.get('eval_freq', 50000)),
-            save_path=f"{self.results_dir}/checkpoints/",
+            save_path=f"{results_dir}/checkpoints/",
             name_prefix=f"{self.model_type.lower()}_model",
             save_replay_buffer=True,
             save_vecnormalize=True
         )
         
-        render_callback = CustomRenderCallback(
-            full_env,
-            eval_freq=self.config.get('render_freq', 100000)
-        )
-        
-        return [balance_eval_callback, checkpoint_callback, render_callback]
+        return [eval_bus, checkpoint_callback]
     
     def evaluate_model_balance(self, model, test_env, n_episodes=5):
         """Evaluate model based on final account balance rather than reward."""
-        final_balances = []
+        # Identical deterministic episodes on a fixed-start env are played once
+        result = run_evaluation(model, test_env, n_episodes=n_episodes, deterministic=True)
         
-        for i in range(n_episodes):
-            obs, _ = test_env.reset()
-            done = False
+        # Return the average final balance across episodes
+        return result.mean_balance
             
-            while not done:
-                action, _ = model.predict(obs, deterministic=True)
-                obs, _, terminated, truncated, _ = test_env.step(action)
-                done = terminated or truncated
+    def create_pruner(self):
+        """Pruner configured for this trainer ('pruner' config key, median by default)."""
+        return create_pruner(self.config.get('pruner', 'median'), self.config.get('search_eval_freq', 10000))
+        
+    def check_pruned(self, trial, log_trial, params):
+        """Log and raise optuna.TrialPruned if the trial's training was stopped by the pruner."""
+        pruned_at = trial.user_attrs.get('pruned_at')
+        if pruned_at is None:
+            return
+        
+        last_balance = trial.user_attrs.get('pruned_balance')
+        print(f"Trial {trial.number} pruned at timesteps={pruned_at}")
+        
+        self.log_data.append({
+            'trial': log_trial,
+            'params': params,
+            'pruned': True,
+            'pruned_at': pruned_at,
+            'last_balance': float(last_balance) if last_balance is not None else None
+        })
+        self.save_log()
+        
+        raise optuna.TrialPruned()
+        
+    def trial_dir(self, stage, trial):
+        """Results directory of one search trial, so concurrent trials never share files."""
+        return f"{self.results_dir}/trials/{stage}_{trial.number}"
+        
+    def study_name(self, stage):
+        """Name of the study of a search stage."""
+        return f"{self.model_type.lower()}_{stage}_{self.seed}"
+        
+    def run_study(self, stage, objective, n_trials, storage=None, n_workers=1, seed_trials=None):
+        """Create or resume a study and run its remaining trials.
+        
+        Args:
+            stage: Search stage name ('broad' or 'narrow'), part of the study name
+            objective: Picklable objective taking an Optuna trial
+            n_trials: Total number of trials of the study
+            storage: Optuna storage URL (see create_study_storage); None keeps the
+                study in memory and saves it with joblib at the end
+            n_workers: Number of processes pulling trials from the study
+            seed_trials: Finished trials added to a new study before any trial
+                runs (see seed_trials_within); they do not count towards n_trials
             
-            # Store final balance
-            if hasattr(test_env, 'env') and hasattr(test_env.env, 'balance'):
-                final_balances.append(test_env.env.balance)
-            elif hasattr(test_env, 'balance'):
-                final_balances.append(test_env.balance)
+        Returns:
+            The finished study
+        """
+        if n_workers > 1 and storage is None:
+            # Worker processes can only share a persistent study
+            storage = f"journal:{self.results_dir}/optuna_journal.log"
         
-        # Return the average final balance across episodes
-        if final_balances:
-            avg_balance = sum(final_balances) / len(final_balances)
-            return avg_balance
-        else:
-            print("Warning: Could not access balance attribute in environment")
-            return 0.0
+        study_name = self.study_name(stage)
+        study = optuna.create_study(study_name=study_name, storage=create_study_storage(storage),
+                                    direction='maximize', pruner=self.create_pruner(), load_if_exists=True)
+        if seed_trials and not study.trials:
+            study.add_trials(seed_trials)
+        
+        # Trials left running by a crashed worker would never finish; run them again
+        interrupted = requeue_interrupted_trials(study)
+        if interrupted:
+            print(f"Re-queued {interrupted} trials interrupted in a previous run")
+        
+        # Trials that finished before an interruption count towards n_trials
+        finished = len([t for t in study.trials if t.state.is_finished()
+                        and 'seeded_from' not in t.user_attrs and 'interrupted' not in t.user_attrs])
+        remaining = max(0, n_trials - finished)
+        if finished:
+            print(f"Resuming {stage} study with {finished} finished trials, {remaining} remaining")
+        
+        if remaining and n_workers > 1:
+            n_workers = min(n_workers, remaining)
+            torch_threads = max(1, (os.cpu_count() or 1) // n_workers)
+            print(f"Running {remaining} trials on {n_workers} workers ({torch_threads} torch threads each)")
             
-    def broad_hp_search(self, n_trials=50):
+            context = multiprocessing.get_context('spawn')
+            workers = []
+            for worker_id in range(n_workers):
+                worker_trials = remaining // n_workers + (1 if worker_id < remaining % n_workers else 0)
+                worker = context.Process(
+                    target=_search_worker,
+                    args=(self, study_name, storage, objective, worker_trials, torch_threads, worker_id)
+                )
+                worker.start()
+                workers.append(worker)
+            for worker in workers:
+                worker.join()
+            
+            study = optuna.load_study(study_name=study_name, storage=create_study_storage(storage),
+                                      pruner=self.create_pruner())
+        elif remaining:
+            study.optimize(objective, n_trials=remaining, show_progress_bar=True)
+        
+        if storage is None:
+            # Save study
+            joblib.dump(study, f"{self.results_dir}/{stage}_study.pkl")
+        
+        return study
+        
+    def broad_hp_search(self, n_trials=50, storage=None, n_workers=1):
         """Conduct broad hyperparameter search."""
         print("Starting broad hyperparameter search...")
         
-        def objective(trial):
-            # Environment parameters
-            env_params = {
-                'bar_count': 50,  # Fixed for broad search
-                'normalization_window': 100  # Fixed for broad search
-            }
-            
-            if self.model_type == 'DQN':
-                model_params = {
-                    'learning_rate': trial.suggest_float('learning_rate', 1e-5, 1e-3, log=True),
-                    'batch_size': trial.suggest_categorical('batch_size', [64, 128, 256]),
-                    'gamma': trial.suggest_float('gamma', 0.8, 0.99),
-                    'buffer_size': trial.suggest_categorical('buffer_size', [10000, 50000, 100000]),
-                    'target_update_interval': trial.suggest_categorical('target_update_interval', [1000, 2000, 5000]),
-                    'exploration_fraction': trial.suggest_float('exploration_fraction', 0.1, 0.5),
-                    'exploration_final_eps': trial.suggest_float('exploration_final_eps', 0.01, 0.1)
-                }
-            else:  # PPO parameters
-                model_params = {
-                    'learning_rate': trial.suggest_float('learning_rate', 1e-5, 1e-3, log=True),
-                    'n_steps': trial.suggest_categorical('n_steps', [1024, 2048, 4096]),
-                    'batch_size': trial.suggest_categorical('batch_size', [32, 64, 128]),
-                    'gamma': trial.suggest_float('gamma', 0.9, 0.999),
-                    'gae_lambda': trial.suggest_float('gae_lambda', 0.9, 0.999),
-                    'clip_range': trial.suggest_float('clip_range', 0.1, 0.4),
-                    'ent_coef': trial.suggest_float('ent_coef', 0.0, 0.01),
-                    'vf_coef': trial.suggest_float('vf_coef', 0.1, 0.9),
-                    'n_epochs': trial.suggest_int('n_epochs', 5, 20)
-                }
-            
-            # For hyperparameter optimization, use fixed start points
-            env_params['random_start'] = False
-            
-            # Create environments and model
-            train_env, full_env = self.create_environments(env_params)
-            model = self.create_model(train_env, model_params)
-            callbacks = self.create_callbacks(full_env)
-            
-            print(f"\nOptimization trial {trial.number} using fixed start points")
-            
-            # Train with limited timesteps for hyperparameter search
-            try:
-                model.learn(total_timesteps=100000, callback=callbacks)
-                final_balance = self.evaluate_model_balance(model, full_env, n_episodes=5)
-                print(f"Trial {trial.number} completed with full dataset balance: {final_balance:.2f}")
-                
-                self.log_data.append({
-                    'trial': trial.number,
-                    'params': {**env_params, **model_params},
-                    'final_balance': float(final_balance)
-                })
-                self.save_log()
-                
-                return final_balance
-                
-            except Exception as e:
-                print(f"Error in trial {trial.number}: {e}")
-                return float('-inf')
-                
-        # Create study and optimize
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=n_trials, show_progress_bar=True)
+        study = self.run_study('broad', self._broad_objective, n_trials, storage, n_workers)
+        # Kept for seeding the narrow search
+        self.broad_study = study
         
         print("Broad search best parameters:", study.best_params)
         print("Best mean balance:", study.best_value)
         
-        # Save study
-        joblib.dump(study, f"{self.results_dir}/broad_study.pkl")
-        
         return study.best_params, study.best_value
         
-    def narrow_hp_search(self, best_broad_params, n_trials=30):
-        """Conduct narrow hyperparameter search around best parameters."""
-        print("Starting narrow hyperparameter search...")
-        
-        def objective(trial):
-            # Environment parameters
-            env_params = {
-                'bar_count': 50,
-                'normalization_window': 100
+    def _broad_objective(self, trial):
+        """Train and score one broad-search trial."""
+        # Environment parameters
+        env_params = {
+            'bar_count': 50,  # Fixed for broad search
+            'normalization_window': 100  # Fixed for broad search
+        }
+
+        if self.model_type == 'DQN':
+            model_params = {
+                'learning_rate': trial.suggest_float('learning_rate', 1e-5, 1e-3, log=True),
+                'batch_size': trial.suggest_categorical('batch_size', [64, 128, 256]),
+                'gamma': trial.suggest_float('gamma', 0.8, 0.99),
+                'buffer_size': trial.suggest_categorical('buffer_size', [10000, 50000, 100000]),
+                'target_update_interval': trial.suggest_categorical('target_update_interval', [1000, 2000, 5000]),
+                'exploration_fraction': trial.suggest_float('exploration_fraction', 0.1, 0.5),
+                'exploration_final_eps': trial.suggest_float('exploration_final_eps', 0.01, 0.1)
             }
-            
-            # Model hyperparameters
-            if self.model_type == 'DQN':
-                model_params = {
-                    'learning_rate': trial.suggest_float('learning_rate', 
-                                                      best_broad_params['learning_rate'] * 0.5,
-                                                      best_broad_params['learning_rate'] * 2.0, log=True),
-                    'batch_size': trial.suggest_categorical('batch_size', 
-                                                         [int(best_broad_params['batch_size'] * 0.5),
-                                                          best_broad_params['batch_size'],
-                                                          int(best_broad_params['batch_size'] * 1.5)]),
-                    'gamma': trial.suggest_float('gamma', 
-                                               max(0.8, best_broad_params['gamma'] - 0.05),
-                                               min(0.995, best_broad_params['gamma'] + 0.05)),
-                    'buffer_size': trial.suggest_categorical('buffer_size', 
-                                                          [int(best_broad_params['buffer_size'] * 0.5),
-                                                           best_broad_params['buffer_size'],
-                                                           int(best_broad_params['buffer_size'] * 1.5)]),
-                    'target_update_interval': trial.suggest_categorical('target_update_interval',
-                                                                     [int(best_broad_params['target_update_interval'] * 0.5),
-                                                                      best_broad_params['target_update_interval'],
-                                                                      int(best_broad_params['target_update_interval'] * 1.5)]),
-                    'exploration_fraction': trial.suggest_float('exploration_fraction',
-                                                             max(0.05, best_broad_params['exploration_fraction'] - 0.1),
-                                                             min(0.7, best_broad_params['exploration_fraction'] + 0.1)),
-                    'exploration_final_eps': trial.suggest_float('exploration_final_eps',
-                                                              max(0.005, best_broad_params['exploration_final_eps'] * 0.5),
-                                                              min(0.2, best_broad_params['exploration_final_eps'] * 2.0))
-                }
-            else:  # PPO parameters
-                model_params = {
-                    'learning_rate': trial.suggest_float('learning_rate',
-                                                      best_broad_params['learning_rate'] * 0.5,
-                                                      best_broad_params['learning_rate'] * 2.0, log=True),
-                    'n_steps': trial.suggest_categorical('n_steps',
-                                                      [int(best_broad_params['n_steps'] * 0.5),
-                                                       best_broad_params['n_steps'],
-                                                       int(best_broad_params['n_steps'] * 1.5)]),
-                    'batch_size': trial.suggest_categorical('batch_size',
-                                                         [int(best_broad_params['batch_size'] * 0.5),
-                                                          best_broad_params['batch_size'],
-                                                          int(best_broad_params['batch_size'] * 1.5)]),
-                    'gamma': trial.suggest_float('gamma',
-                                               max(0.8, best_broad_params['gamma'] - 0.05),
-                                               min(0.999, best_broad_params['gamma'] + 0.05)),
-                    'gae_lambda': trial.suggest_float('gae_lambda',
-                                                    max(0.8, best_broad_params['gae_lambda'] - 0.05),
-                                                    min(0.999, best_broad_params['gae_lambda'] + 0.05)),
-                    'clip_range': trial.suggest_float('clip_range',
-                                                    max(0.05, best_broad_params['clip_range'] - 0.1),
-                                                    min(0.5, best_broad_params['clip_range'] + 0.1)),
-                    'ent_coef': trial.suggest_float('ent_coef',
-                                                  max(0.0, best_broad_params['ent_coef'] - 0.005),
-                                                  min(0.02, best_broad_params['ent_coef'] + 0.005)),
-                    'vf_coef': trial.suggest_float('vf_coef',
-                                                 max(0.05, best_broad_params['vf_coef'] - 0.2),
-                                                 min(0.95, best_broad_params['vf_coef'] + 0.2)),
-                    'n_epochs': trial.suggest_int('n_epochs',
-                                               max(3, best_broad_params['n_epochs'] - 5),
-                                               min(25, best_broad_params['n_epochs'] + 5))
-                }
-
-            # For hyperparameter optimization, use fixed start points
-            env_params['random_start'] = False
-            
-            # Create environments and model
-            train_env, full_env = self.create_environments(env_params)
-            model = self.create_model(train_env, model_params)
-            callbacks = self.create_callbacks(full_env)
+        else:  # PPO parameters
+            model_params = {
+                'learning_rate': trial.suggest_float('learning_rate', 1e-5, 1e-3, log=True),
+                'n_steps': trial.suggest_categorical('n_steps', [1024, 2048, 4096]),
+                'batch_size': trial.suggest_categorical('batch_size', [32, 64, 128]),
+                'gamma': trial.suggest_float('gamma', 0.9, 0.999),
+                'gae_lambda': trial.suggest_float('gae_lambda', 0.9, 0.999),
+                'clip_range': trial.suggest_float('clip_range', 0.1, 0.4),
+                'ent_coef': trial.suggest_float('ent_coef', 0.0, 0.01),
+                'vf_coef': trial.suggest_float('vf_coef', 0.1, 0.9),
+                'n_epochs': trial.suggest_int('n_epochs', 5, 20)
+            }
+
+        # For hyperparameter optimization, use fixed start points
+        env_params['random_start'] = False
+
+        # Create environments and model
+        train_env, full_env = self.create_environments(env_params)
+        model = self.create_model(train_env, model_params)
+        callbacks = self.create_callbacks(full_env, results_dir=self.trial_dir('broad', trial), trial=trial)
+
+        print(f"\nOptimization trial {trial.number} using fixed start points")
+
+        # Train with limited timesteps for hyperparameter search
+        try:
+            model.learn(total_timesteps=100000, callback=callbacks)
+            self.check_pruned(trial, trial.number, {**env_params, **model_params})
+            final_balance = self.evaluate_model_balance(model, full_env, n_episodes=5)
+            print(f"Trial {trial.number} completed with full dataset balance: {final_balance:.2f}")
+
+            self.log_data.append({
+                'trial': trial.number,
+                'params': {**env_params, **model_params},
+                'final_balance': float(final_balance)
+            })
+            self.save_log()
 
-            print(f"\nOptimization trial {trial.number} using fixed start points")
+            return final_balance
+
+        except optuna.TrialPruned:
+            raise
+        except Exception as e:
+            print(f"Error in trial {trial.number}: {e}")
+            return float('-inf')
+
+    def narrow_hp_search(self, best_broad_params, n_trials=30, storage=None, n_workers=1,
+                         broad_study=None, warm_start=True, budget=None):
+        """Conduct narrow hyperparameter search around best parameters.
+        
+        The sampler is seeded with the broad-stage trials that fall inside the
+        narrow ranges, and with warm_start each trial starts from the policy
+        weights of the best broad-stage model instead of from scratch. Trials
+        train in two rungs: every trial gets budget.min_timesteps, then the
+        budget extends the top of the first rung.
+        
+        Args:
+            best_broad_params: Best parameters of the broad search
+            n_trials: Number of new narrow trials
+            storage: Optuna storage URL (see create_study_storage)
+            n_workers: Number of processes pulling trials from the study
+            broad_study: Finished broad study (defaults to the one from broad_hp_search,
+                or the stored broad study)
+            warm_start: Whether to start trials from the best broad-stage model
+            budget: TimestepBudget for the narrow trials (defaults to half of the
+                200k timesteps per trial a full narrow search used to take)
+        """
+        print("Starting narrow hyperparameter search...")
+        
+        if broad_study is None:
+            broad_study = getattr(self, 'broad_study', None)
+        if broad_study is None and storage is not None:
+            broad_study = optuna.load_study(study_name=self.study_name('broad'),
+                                            storage=create_study_storage(storage))
+        
+        distributions = self.narrow_distributions(best_broad_params)
+        seed_trials = []
+        warm_start_path = None
+        if broad_study is not None:
+            seed_trials = seed_trials_within(broad_study, distributions)
+            print(f"Seeding narrow search with {len(seed_trials)} broad-stage trials")
             
-            try:
-                model.learn(total_timesteps=200000, callback=callbacks)
-                final_balance = self.evaluate_model_balance(model, full_env, n_episodes=5)
-                print(f"Trial {trial.number} completed with final balance: {final_balance:.2f}")
-                
-                self.log_data.append({
-                    'trial': trial.number + 1000,  # Offset to distinguish from broad search
-                    'params': {**env_params, **model_params},
-                    'final_balance': float(final_balance)
-                })
-                self.save_log()
-                
-                return final_balance
-                
-            except Exception as e:
-                print(f"Error in trial {trial.number}: {e}")
-                return float('-inf')
-                
-        # Create study and optimize
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=n_trials, show_progress_bar=True)
+            if warm_start:
+                best_broad_model = f"{self.trial_dir('broad', broad_study.best_trial)}/best_balance_model.zip"
+                if os.path.exists(best_broad_model):
+                    warm_start_path = best_broad_model
+                    print(f"Warm-starting narrow trials from {warm_start_path}")
+        
+        if budget is None:
+            budget = TimestepBudget(total_timesteps=n_trials * 200000 // 2,
+                                    min_timesteps=50000, max_timesteps=200000, n_trials=n_trials)
+        
+        objective = functools.partial(self._narrow_objective, distributions, warm_start_path, budget)
+        study = self.run_study('narrow', objective, n_trials, storage, n_workers, seed_trials=seed_trials)
         
         print("Narrow search best parameters:", study.best_params)
         print("Best mean balance:", study.best_value)
         
-        # Save study
-        joblib.dump(study, f"{self.results_dir}/narrow_study.pkl")
-        
         return study.best_params, study.best_value
         
-    def run_full_pipeline(self, broad_trials=30, narrow_trials=20, final_timesteps=5000000):
+    def narrow_distributions(self, best_broad_params):
+        """Search space of the narrow stage around the best broad parameters."""
+        FloatDistribution = optuna.distributions.FloatDistribution
+        IntDistribution = optuna.distributions.IntDistribution
+        CategoricalDistribution = optuna.distributions.CategoricalDistribution
+        
+        def around(name):
+            return CategoricalDistribution([int(best_broad_params[name] * 0.5),
+                                            best_broad_params[name],
+                                            int(best_broad_params[name] * 1.5)])
+        
+        learning_rate = FloatDistribution(best_broad_params['learning_rate'] * 0.5,
+                                          best_broad_params['learning_rate'] * 2.0, log=True)
+        
+        if self.model_type == 'DQN':
+            return {
+                'learning_rate': learning_rate,
+                'batch_size': around('batch_size'),
+                'gamma': FloatDistribution(max(0.8, best_broad_params['gamma'] - 0.05),
+                                           min(0.995, best_broad_params['gamma'] + 0.05)),
+                'buffer_size': around('buffer_size'),
+                'target_update_interval': around('target_update_interval'),
+                'exploration_fraction': FloatDistribution(max(0.05, best_broad_params['exploration_fraction'] - 0.1),
+                                                          min(0.7, best_broad_params['exploration_fraction'] + 0.1)),
+                'exploration_final_eps': FloatDistribution(max(0.005, best_broad_params['exploration_final_eps'] * 0.5),
+                                                           min(0.2, best_broad_params['exploration_final_eps'] * 2.0))
+            }
+        
+        # PPO parameters
+        return {
+            'learning_rate': learning_rate,
+            'n_steps': around('n_steps'),
+            'batch_size': around('batch_size'),
+            'gamma': FloatDistribution(max(0.8, best_broad_params['gamma'] - 0.05),
+                                       min(0.999, best_broad_params['gamma'] + 0.05)),
+            'gae_lambda': FloatDistribution(max(0.8, best_broad_params['gae_lambda'] - 0.05),
+                                            min(0.999, best_broad_params['gae_lambda'] + 0.05)),
+            'clip_range': FloatDistribution(max(0.05, best_broad_params['clip_range'] - 0.1),
+                                            min(0.5, best_broad_params['clip_range'] + 0.1)),
+            'ent_coef': FloatDistribution(max(0.0, best_broad_params['ent_coef'] - 0.005),
+                                          min(0.02, best_broad_params['ent_coef'] + 0.005)),
+            'vf_coef': FloatDistribution(max(0.05, best_broad_params['vf_coef'] - 0.2),
+                                         min(0.95, best_broad_params['vf_coef'] + 0.2)),
+            'n_epochs': IntDistribution(max(3, best_broad_params['n_epochs'] - 5),
+                                        min(25, best_broad_params['n_epochs'] + 5))
+        }
+        
+    def _narrow_objective(self, distributions, warm_start_path, budget, trial):
+        """Train and score one narrow-search trial around the best broad parameters."""
+        # Environment parameters
+        env_params = {
+            'bar_count': 50,
+            'normalization_window': 100
+        }
+
+        # Model hyperparameters
+        model_params = {name: suggest(trial, name, distribution) for name, distribution in distributions.items()}
+
+        # For hyperparameter optimization, use fixed start points
+        env_params['random_start'] = False
+
+        # Create environments and model
+        train_env, full_env = self.create_environments(env_params)
+        model = self.create_model(train_env, model_params)
+        if warm_start_path is not None:
+            # Only the weights carry over; the trial's own hyperparameters stay in effect
+            model.policy.load_state_dict(self.model_class.load(warm_start_path, device='cpu').policy.state_dict())
+        callbacks = self.create_callbacks(full_env, results_dir=self.trial_dir('narrow', trial), trial=trial)
+
+        print(f"\nOptimization trial {trial.number} using fixed start points")
+
+        try:
+            # First rung, then as many more timesteps as the budget gives this trial
+            budget.start(trial)
+            model.learn(total_timesteps=budget.min_timesteps, callback=callbacks)
+            self.check_pruned(trial, trial.number + 1000, {**env_params, **model_params})
+            rung_balance = self.evaluate_model_balance(model, full_env, n_episodes=5)
+            
+            extra_timesteps = budget.allocate(trial, rung_balance)
+            if extra_timesteps > 0:
+                print(f"Trial {trial.number}: rung balance {rung_balance:.2f}, "
+                      f"training {extra_timesteps} more timesteps")
+                model.learn(total_timesteps=extra_timesteps, callback=callbacks, reset_num_timesteps=False)
+                self.check_pruned(trial, trial.number + 1000, {**env_params, **model_params})
+                final_balance = self.evaluate_model_balance(model, full_env, n_episodes=5)
+            else:
+                final_balance = rung_balance
+            print(f"Trial {trial.number} completed with final balance: {final_balance:.2f}")
+
+            self.log_data.append({
+                'trial': trial.number + 1000,  # Offset to distinguish from broad search
+                'params': {**env_params, **model_params},
+                'timesteps': budget.min_timesteps + extra_timesteps,
+                'warm_start': warm_start_path,
+                'final_balance': float(final_balance)
+            })
+            self.save_log()
+
+            return final_balance
+
+        except optuna.TrialPruned:
+            raise
+        except Exception as e:
+            print(f"Error in trial {trial.number}: {e}")
+            return float('-inf')
+
+    def run_full_pipeline(self, broad_trials=30, narrow_trials=20, final_timesteps=5000000,
+                          storage=None, n_workers=1):
         """Run the full hyperparameter optimization and training pipeline."""
         # Check for existing hyperparameter optimization results
         best_params_path = f"{self.results_dir}/best_params.json"
@@ -460,10 +757,12 @@ class ModelTrainer:
                 best_params = json.load(f)
         else:
             # Step 1: Broad hyperparameter search
-            best_broad_params, _ = self.broad_hp_search(n_trials=broad_trials)
+            best_broad_params, _ = self.broad_hp_search(n_trials=broad_trials, storage=storage,
+                                                        n_workers=n_workers)
             
             # Step 2: Narrow hyperparameter search
-            best_params, _ = self.narrow_hp_search(best_broad_params, n_trials=narrow_trials)
+            best_params, _ = self.narrow_hp_search(best_broad_params, n_trials=narrow_trials,
+                                                   storage=storage, n_workers=n_workers)
             
             # Save best parameters
             with open(best_params_path, 'w') as f:
@@ -539,7 +838,7 @@ class ModelTrainer:
             print("No trades data available")
             return
             
-        trades_df = pd.DataFrame(test_env.env.trades)    
+        trades_df = test_env.env.trades.to_frame()
         current_balance = test_env.env.balance
         initial_balance = test_env.env.initial_balance
 
@@ -565,10 +864,10 @@ class ModelTrainer:
         expected_value = trades_df["pnl"].mean() if total_trades > 0 else 0.0
         avg_pnl_sl = abs(avg_pnl_sl) if num_sl > 0 else 0.0
         rrr = avg_pnl_tp / avg_pnl_sl if avg_pnl_sl > 0 else 0.0
-        num_buy = trades_df[trades_df["position"] == 1].shape[0]
-        num_sell = trades_df[trades_df["position"] == -1].shape[0]
-        buy_win_rate = (trades_df[(trades_df["position"] == 1) & (trades_df["pnl"] > 0.0)].shape[0] / num_buy * 100) if num_buy > 0 else 0.0
-        sell_win_rate = (trades_df[(trades_df["position"] == -1) & (trades_df["pnl"] > 0.0)].shape[0] / num_sell * 100) if num_sell > 0 else 0.0
+        num_buy = trades_df[trades_df["direction"] == 1].shape[0]
+        num_sell = trades_df[trades_df["direction"] == -1].shape[0]
+        buy_win_rate = (trades_df[(trades_df["direction"] == 1) & (trades_df["pnl"] > 0.0)].shape[0] / num_buy * 100) if num_buy > 0 else 0.0
+        sell_win_rate = (trades_df[(trades_df["direction"] == -1) & (trades_df["pnl"] > 0.0)].shape[0] / num_sell * 100) if num_sell > 0 else 0.0
         total_win_rate = (num_tp / total_trades * 100) if total_trades > 0 else 0.0
 
         def kelly_criterion(win_rate, win_loss_ratio):
@@ -647,6 +946,7 @@ class ModelTrainer:
             device=self.config['device'],
             custom_objects=custom_objects
         )
+        self.attach_replay_buffer(model, train_env)
         
         import re
         checkpoint_filename = os.path.basename(checkpoint_path)
@@ -736,6 +1036,21 @@ if __name__ == "__main__":
                       help='Number of trials for narrow hyperparameter search')
     parser.add_argument('--timesteps', type=int, default=30000000,
                       help='Total timesteps for training')
+    parser.add_argument('--study_storage', type=str, default=None,
+                      help='Optuna storage for resumable searches: an RDB URL (sqlite:///study.db) '
+                           'or a journal file (journal:path or *.log)')
+    parser.add_argument('--n_workers', type=int, default=1,
+                      help='Number of processes running search trials concurrently')
+    parser.add_argument('--prefill', type=str, choices=['none', 'random', 'heuristic'], default='random',
+                      help='Policy used to prefill the DQN replay buffer before learning starts')
+    parser.add_argument('--pruner', type=str, choices=['none', 'median', 'halving', 'hyperband'],
+                      default='median',
+                      help='Optuna pruner that stops unpromising search trials early')
+    parser.add_argument('--search_eval_freq', type=int, default=10000,
+                      help='Timesteps between evaluations of search trials, the earliest a trial can be pruned')
+    parser.add_argument('--feature_cache', type=str, default=None,
+                      help='Directory for an on-disk feature cache, e.g. ../cache/features (off by default; '
+                           'writes one entry per distinct OHLC dataset and never evicts)')
     args = parser.parse_args()
     
     print(f"Training {args.model_type} model with seed: {args.seed}")
@@ -748,7 +1063,11 @@ if __name__ == "__main__":
         'initial_balance': 10000.0,
         'device': args.device,
         'eval_freq': 50000,
-        'render_freq': 100000
+        'search_eval_freq': args.search_eval_freq,
+        'render_freq': 100000,
+        'feature_cache_dir': args.feature_cache,
+        'pruner': args.pruner,
+        'prefill': args.prefill
     })
 
     print(f"Using device: {args.device}")
@@ -758,7 +1077,9 @@ if __name__ == "__main__":
         model, model_path = trainer.run_full_pipeline(
             broad_trials=args.broad_trials,
             narrow_trials=args.narrow_trials,
-            final_timesteps=args.timesteps
+            final_timesteps=args.timesteps,
+            storage=args.study_storage,
+            n_workers=args.n_workers
         )
     else:
         # Check for checkpoints
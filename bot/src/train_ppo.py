@@ -3,16 +3,26 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
 import argparse
 import json
+import multiprocessing
 import re
+import shutil
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecEnv, VecMonitor
 from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback
 from stable_baselines3.common.utils import get_linear_fn
 from sb3_contrib.ppo_recurrent import RecurrentPPO
 from trade_environment import TradingEnv
+from evaluation import AsyncEvalCallback, AsyncEvaluator, UnifiedEvalCallback
+from eval_log import EVAL_LOG_NAME, EvalLog
+from feature_cache import FeatureCache
+from feature_store import FeatureStore
+from shared_features import SharedEnvFactory, SharedFeatureStore, attach
+from vec_trading_env import VecTradingEnv
 import torch as th
 from gymnasium import spaces
 
@@ -33,291 +43,89 @@ class CustomEpsilonCallback(BaseCallback):
             
         return True
 
-class UnifiedEvalCallback(BaseCallback):
-    """Optimized evaluation callback with enhanced progress tracking and comprehensive evaluation."""
-    def __init__(self, eval_env, train_data, val_data, eval_freq=100000, best_model_save_path=None, 
-                 log_path=None, deterministic=True, verbose=1, iteration=0):
-        super(UnifiedEvalCallback, self).__init__(verbose=verbose)
-        self.eval_env = eval_env
-        self.eval_freq = eval_freq
-        self.best_model_save_path = best_model_save_path
-        self.log_path = log_path
-        self.deterministic = deterministic
-        self.eval_results = []
-        self.last_time_trigger = 0
-        self.iteration = iteration
-        
-        # Store separate datasets
-        self.train_data = train_data
-        self.val_data = val_data
-        
-        # Create combined evaluation environment
-        self.combined_data = pd.concat([train_data, val_data])
+def callback_freq(total_steps: int, n_envs: int) -> int:
+    """Convert a frequency in total environment steps to vec env steps (callback calls)."""
+    return max(total_steps // n_envs, 1)
 
-        env_params = {
-            'initial_balance': eval_env.env.initial_balance,
-            'balance_per_lot': eval_env.env.BALANCE_PER_LOT,
-            'random_start': False
-        }
-        self.combined_env = Monitor(TradingEnv(self.combined_data, **env_params))
-        
-        # Initialize tracking metrics
-        self.best_score = -float("inf")
-        self.best_metrics = {}
-        self.max_drawdown = 0.0
-        
-        # Back up raw data for reference
-        if hasattr(self.eval_env, 'env'):
-            self.eval_env.env.raw_data_backup = self.eval_env.env.raw_data.copy()
-        else:
-            self.eval_env.raw_data_backup = self.eval_env.raw_data.copy()
-            
-    def _run_eval_episode(self, env) -> Dict[str, float]:
-        """Run a complete evaluation episode on given environment."""
-        obs, _ = env.reset()
-        done = False
-        lstm_states = None
-        running_balance = env.env.initial_balance
-        max_balance = running_balance
-        episode_reward = 0
-        
-        while not done:
-            action, lstm_states = self.model.predict(
-                obs, state=lstm_states, deterministic=self.deterministic
-            )
-            obs, reward, terminated, truncated, info = env.step(action)
-            done = terminated or truncated
-            episode_reward += reward
-            
-            # Track running metrics
-            running_balance = env.env.balance
-            max_balance = max(max_balance, running_balance)
-        
-        # Calculate metrics
-        total_return = (running_balance - env.env.initial_balance) / env.env.initial_balance
-        max_drawdown = 0.0
-        if max_balance > env.env.initial_balance:
-            max_drawdown = (max_balance - running_balance) / max_balance
-            
-        # Use environment's built-in trade metrics
-        trade_metrics = env.env.trade_metrics
-        
-        return {
-            'return': total_return,
-            'max_drawdown': max_drawdown,
-            'reward': episode_reward,
-            'win_rate': trade_metrics['win_rate'],
-            'avg_profit': trade_metrics['avg_profit'],
-            'avg_loss': trade_metrics['avg_loss'],
-            'balance': running_balance,
-            'trades': env.env.trades,
-            'current_direction': trade_metrics['current_direction']
-        }
-        
-    def _calculate_trade_quality(self, metrics: Dict[str, float]) -> float:
-        """Calculate overall trade quality score with enhanced metrics."""
-        win_rate_score = metrics['win_rate']
-        profit_factor = max(0, metrics['avg_profit']) / (abs(metrics['avg_loss']) + 1e-8)
-        drawdown_penalty = max(0, 1 - metrics['max_drawdown'] * 2)
-        
-        # Ensure directories exist
-        if self.best_model_save_path:
-            os.makedirs(self.best_model_save_path, exist_ok=True)
-        
-        if self.log_path:
-            os.makedirs(self.log_path, exist_ok=True)
-            
-        # Calculate quality score with adjusted weights
-        return (win_rate_score * 0.35 + 
-                min(profit_factor, 4) / 4 * 0.45 + 
-                drawdown_penalty * 0.2)
-                
-    def _evaluate_performance(self) -> Dict[str, Dict[str, float]]:
-        """Run comprehensive evaluation on all datasets."""
-        # Evaluate on validation set
-        val_metrics = self._run_eval_episode(self.eval_env)
-        
-        # Evaluate on combined dataset
-        combined_metrics = self._run_eval_episode(self.combined_env)
-        
-        # Calculate consistency score
-        consistency_score = val_metrics['return'] / (combined_metrics['return'] + 1e-8)
-        
-        # Calculate trade quality scores
-        val_quality = self._calculate_trade_quality(val_metrics)
-        combined_quality = self._calculate_trade_quality(combined_metrics)
-        
-        # Create comprehensive metrics
-        result = {
-            'validation': val_metrics,
-            'combined': combined_metrics,
-            'scores': {
-                'consistency': consistency_score,
-                'val_quality': val_quality,
-                'combined_quality': combined_quality,
-                'validation_quality': val_quality  # Add validation quality directly to scores
-            }
-        }
-        
-        return result
+def make_train_env(feature_store: FeatureStore, start: int, end: int, args) -> VecEnv:
+    """Create the vectorized training environment for a walk-forward window.
     
-    def _should_save_model(self, metrics: Dict[str, Dict[str, float]]) -> bool:
-        """Determine if current model should be saved as best."""
-        combined = metrics['combined']
-        scores = metrics['scores']
+    Args:
+        feature_store: Feature store over the full dataset (disk-backed for the subproc backend)
+        start: First bar of the window (inclusive)
+        end: Last bar of the window (exclusive)
+        args: Parsed command line arguments (n_envs, vec_backend, seed, balances)
         
-        # Calculate composite score
-        score = (
-            combined['return'] * 0.4 +                # Weight overall return
-            -combined['max_drawdown'] * 0.3 +        # Penalize drawdowns
-            scores['consistency'] * 0.2 +            # Reward consistency
-            scores['combined_quality'] * 0.1         # Consider trade quality
-        )
-        
-        if score > self.best_score:
-            self.best_score = score
-            self.best_metrics = metrics
-            return True
-        return False
+    Returns:
+        VecMonitor-wrapped vectorized environment with args.n_envs random-start episodes
     
-    def _on_step(self) -> bool:
-        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
-            # Run comprehensive evaluation
-            metrics = self._evaluate_performance()
-            combined = metrics['combined']
-            val = metrics['validation']
-            
-            if self.verbose > 0:
-                print(f"\n===== Evaluation at timesteps={self.num_timesteps} =====")
-                print(f"Combined Dataset Metrics:")
-                print(f"  Balance: {combined['balance']:.2f}")
-                print(f"  Return: {combined['return']*100:.2f}%")
-                print(f"  Max Drawdown: {combined['max_drawdown']*100:.2f}%")
-                print(f"  Win Rate: {combined['win_rate']*100:.2f}%")
-                print(f"  Total Reward: {combined['reward']:.2f}")  # Add this line
-                
-                print(f"\nValidation Set Metrics:")
-                print(f"  Balance: {val['balance']:.2f}")
-                print(f"  Return: {val['return']*100:.2f}%")
-                print(f"  Max Drawdown: {val['max_drawdown']*100:.2f}%")
-                print(f"  Win Rate: {val['win_rate']*100:.2f}%")
-                print(f"  Total Reward: {val['reward']:.2f}")  # Add this line
-            
-            if self.log_path is not None:
-                self.eval_results.append({
-                    'timesteps': self.num_timesteps,
-                    'combined': {
-                        'balance': float(combined['balance']),
-                        'return': float(combined['return']),
-                        'max_drawdown': float(combined['max_drawdown']),
-                        'win_rate': float(combined['win_rate'])
-                    },
-                    'validation': {
-                        'balance': float(val['balance']),
-                        'return': float(val['return']),
-                        'max_drawdown': float(val['max_drawdown']),
-                        'win_rate': float(val['win_rate'])
-                    }
-                })
-                
-                iteration_file = os.path.join(self.log_path, f"eval_results_iter_{self.iteration}.json")
-                with open(iteration_file, "w") as f:
-                    json.dump(self.eval_results, f, indent=2)
-                    
-                combined_file = os.path.join(self.log_path, "eval_results_all.json")
-                try:
-                    with open(combined_file, "r") as f:
-                        all_results = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError):
-                    all_results = {}
-                    
-                eval_env = self.eval_env
-                while hasattr(eval_env, 'env'):
-                    eval_env = eval_env.env
-                    if isinstance(eval_env, TradingEnv):
-                        break
-
-                # Calculate drawdown metrics
-                running_balance = eval_env.initial_balance
-                max_balance = eval_env.initial_balance
-                period_max_drawdown = 0.0
-                
-                # Calculate running drawdown using trade history
-                for trade in eval_env.trades:
-                    running_balance += trade['pnl']
-                    max_balance = max(max_balance, running_balance)
-                    if max_balance > 0:
-                        current_drawdown = (max_balance - running_balance) / max_balance
-                        period_max_drawdown = max(period_max_drawdown, current_drawdown)
-
-                # Update historical max drawdown
-                self.max_drawdown = max(self.max_drawdown, period_max_drawdown)
-
-                # Calculate basic metrics
-                active_position = 1 if eval_env.current_position else 0
-                num_winning_trades = eval_env.win_count
-                num_losing_trades = eval_env.loss_count
-                
-                try:
-                    period_start = str(eval_env.original_index[0])
-                    period_end = str(eval_env.original_index[-1])
-                except (AttributeError, IndexError) as e:
-                    period_start = period_end = "NA"
-                    print(f"Warning: Could not get period timestamps: {str(e)}")
-
-                # Print drawdown information
-                print("\n===== Drawdown Analysis =====")
-                print(f"Period Max Drawdown: {period_max_drawdown*100:.2f}%")
-                print(f"Historical Max Drawdown: {self.max_drawdown*100:.2f}%")
-
-                period_info = {
-                    'results': self.eval_results,
-                    'iteration': self.iteration,
-                    'balance': float(eval_env.balance),
-                    'total_trades': len(eval_env.trades),
-                    'active_position': active_position,
-                    'win_count': num_winning_trades,
-                    'loss_count': num_losing_trades,
-                    'win_rate': eval_env.trade_metrics['win_rate'] * 100,
-                    'period_start': period_start,
-                    'period_end': period_end,
-                    'trade_metrics': eval_env.trade_metrics,
-                    'max_drawdown': period_max_drawdown * 100,
-                    'historical_max_drawdown': self.max_drawdown * 100
-                }
+    Raises:
+        ValueError: If the subproc backend is used with an in-memory feature store
+    """
+    env_params = {
+        'initial_balance': args.initial_balance,
+        'balance_per_lot': args.balance_per_lot,
+        'random_start': True
+    }
+    
+    if args.vec_backend == 'native':
+        vec_env = VecTradingEnv.from_feature_store(feature_store, start, end, n_envs=args.n_envs,
+                                                   seed=args.seed, **env_params)
+    elif args.vec_backend == 'subproc':
+        if feature_store.directory is None:
+            raise ValueError("The subproc backend needs a shared (disk-backed) feature store")
+        vec_env = SubprocVecEnv([SharedEnvFactory(feature_store.directory, start, end, **env_params)
+                                 for _ in range(args.n_envs)])
+    else:
+        vec_env = DummyVecEnv([lambda: TradingEnv.from_feature_store(feature_store, start, end, **env_params)
+                               for _ in range(args.n_envs)])
+    return VecMonitor(vec_env)
 
-                all_results[f"iteration_{self.iteration}"] = period_info
-                
-                with open(combined_file, "w") as f:
-                    json.dump(all_results, f, indent=2)
-            
-            # Check if model should be saved as best
-            if self._should_save_model(metrics) and self.best_model_save_path is not None:
-                model_path = os.path.join(self.best_model_save_path, "best_model")
-                self.model.save(model_path)
-                
-                print(f"\n=== New Best Model Saved ===")
-                print(f"Combined Return: {metrics['combined']['return']*100:.2f}%")
-                print(f"Validation Return: {metrics['validation']['return']*100:.2f}%")
-                print(f"Consistency Score: {metrics['scores']['consistency']:.2f}")
-                print(f"Trade Quality: {metrics['scores']['combined_quality']:.2f}")
-            
-            # Print final scores summary
-            print("\n===== Final Performance Metrics =====")
-            print(f"Combined Dataset Score: {metrics['scores']['combined_quality']:.3f}")
-            print(f"Validation Score: {metrics['scores']['val_quality']:.3f}")
-            print(f"Overall Score: {metrics['combined']['return'] * 0.4 - metrics['combined']['max_drawdown'] * 0.3 + metrics['scores']['consistency'] * 0.2 + metrics['scores']['combined_quality'] * 0.1:.3f}")
-            
-            if hasattr(self.eval_env, 'env'):
-                self.eval_env.env.render()
-            else:
-                self.eval_env.render()
-                
-            self.last_time_trigger = self.n_calls
+def make_eval_callback(feature_store: FeatureStore, training_start: int, train_end: int, val_end: int,
+                       args, iteration: int) -> BaseCallback:
+    """Create the evaluation callback for a walk-forward window.
+    
+    Args:
+        feature_store: Feature store over the full dataset (disk-backed for async evaluation)
+        training_start: First bar of the training window (inclusive)
+        train_end: Last bar of the training window and first of validation
+        val_end: Last bar of the validation window (exclusive)
+        args: Parsed command line arguments (async_eval, eval_backlog, eval_freq, results_dir)
+        iteration: Walk-forward iteration number
         
-        return True
+    Returns:
+        UnifiedEvalCallback, or AsyncEvalCallback running the same evaluation in another process
+        
+    Raises:
+        ValueError: If async evaluation is used with an in-memory feature store
+    """
+    env_params = {
+        'initial_balance': args.initial_balance,
+        'balance_per_lot': args.balance_per_lot,
+        'random_start': False
+    }
+    callback_kwargs = {
+        'best_model_save_path': args.results_dir,
+        'log_path': args.results_dir,
+        'deterministic': True,
+        'verbose': 1,
+        'iteration': iteration
+    }
+    # Callbacks are called once per vec env step
+    eval_freq = callback_freq(args.eval_freq, args.n_envs)
+    
+    if args.async_eval:
+        if feature_store.directory is None:
+            raise ValueError("Async evaluation needs a shared (disk-backed) feature store")
+        evaluator = AsyncEvaluator(feature_store.directory, (train_end, val_end), (training_start, val_end),
+                                   env_params, max_pending=args.eval_backlog, **callback_kwargs)
+        return AsyncEvalCallback(evaluator, eval_freq=eval_freq)
+    
+    val_env = Monitor(TradingEnv.from_feature_store(feature_store, train_end, val_end, **env_params))
+    combined_env = Monitor(TradingEnv.from_feature_store(feature_store, training_start, val_end, **env_params))
+    return UnifiedEvalCallback(val_env, combined_env=combined_env, eval_freq=eval_freq, **callback_kwargs)
 
-def train_model(train_env, val_env, train_data, val_data, args, iteration=0):
+def train_model(train_env, eval_callback: BaseCallback, args, iteration=0):
     """Train the PPO model with optimized hyperparameters for BTC trading."""
     lr_schedule = get_linear_fn(
         start=args.learning_rate,
@@ -346,8 +154,10 @@ def train_model(train_env, val_env, train_data, val_data, args, iteration=0):
         "MlpLstmPolicy",
         train_env,
         learning_rate=1e-3,           # Higher learning rate for faster learning
-        n_steps=256,                  # Longer sequences for better context
-        batch_size=64,                # Larger batches for more stable updates
+        # Rollout of 256 steps split across the envs, so updates per timestep and
+        # minibatches per update match a single env (LSTM sequences shorten per env)
+        n_steps=max(1, 256 // args.n_envs),
+        batch_size=64,
         gamma=0.99,                   # Shorter-term rewards
         gae_lambda=0.95,              # Lower lambda for more immediate advantages
         clip_range=0.2,               # Wider clipping for more policy freedom
@@ -373,23 +183,12 @@ def train_model(train_env, val_env, train_data, val_data, args, iteration=0):
     callbacks.append(epsilon_callback)
     
     # Add evaluation callback
-    unified_callback = UnifiedEvalCallback(
-        val_env,
-        train_data=train_data,
-        val_data=val_data,
-        best_model_save_path=f"../results/{args.seed}",
-        log_path=f"../results/{args.seed}",
-        eval_freq=args.eval_freq,
-        deterministic=True,
-        verbose=1,
-        iteration=iteration
-    )
-    callbacks.append(unified_callback)
+    callbacks.append(eval_callback)
     
     # Add checkpoint callback
     checkpoint_callback = CheckpointCallback(
-        save_freq=args.eval_freq,
-        save_path=f"../results/{args.seed}/checkpoints/{args.model_name}",
+        save_freq=callback_freq(args.eval_freq, args.n_envs),
+        save_path=os.path.join(args.results_dir, "checkpoints", args.model_name),
         name_prefix="ppo_lstm"
     )
     callbacks.append(checkpoint_callback)
@@ -400,19 +199,19 @@ def train_model(train_env, val_env, train_data, val_data, args, iteration=0):
     model.learn(
         total_timesteps=args.total_timesteps,
         callback=callbacks,
-        progress_bar=True,
+        progress_bar=args.progress_bar,
         reset_num_timesteps=True  # Reset timesteps for each iteration
     )
     
     # Update timesteps in evaluation results to maintain sequence
-    for result in unified_callback.eval_results:
+    for result in eval_callback.eval_results:
         result['timesteps'] = (result['timesteps'] - args.total_timesteps) + start_timesteps
     
-    final_model_path = f"../results/{args.seed}/{args.model_name}"
+    final_model_path = os.path.join(args.results_dir, args.model_name)
     model.save(final_model_path)
     print(f"Model saved as {final_model_path}")
     
-    best_model_path = f"../results/{args.seed}/best_balance_model.zip"
+    best_model_path = os.path.join(args.results_dir, "best_balance_model.zip")
     if os.path.exists(best_model_path):
         print(f"Loading best model based on full dataset performance: {best_model_path}")
         model = RecurrentPPO.load(best_model_path)
@@ -437,12 +236,85 @@ def load_training_state(path: str) -> Tuple[int, str]:
         state = json.load(f)
     return state['training_start'], state['model_path']
 
+def walk_forward_windows(training_start: int, total_periods: int, initial_window: int,
+                         step_size: int) -> List[Tuple[int, int, int, int]]:
+    """List the remaining walk-forward windows from training_start.
+    
+    Returns:
+        List of (iteration, training_start, train_end, val_end) tuples in bar positions
+    """
+    windows = []
+    while training_start + initial_window + step_size <= total_periods:
+        train_end = training_start + initial_window
+        val_end = min(train_end + step_size, total_periods)
+        windows.append((training_start // step_size, training_start, train_end, val_end))
+        training_start += step_size
+    return windows
+
+def train_window(feature_store: FeatureStore, training_start: int, train_end: int, val_end: int,
+                 iteration: int, args, model: Optional[RecurrentPPO] = None) -> RecurrentPPO:
+    """Train a new model, or continue training an existing one, on a walk-forward window.
+    
+    Args:
+        feature_store: Feature store over the full dataset
+        training_start: First bar of the training window (inclusive)
+        train_end: Last bar of the training window and first of validation
+        val_end: Last bar of the validation window (exclusive)
+        iteration: Walk-forward iteration number
+        args: Parsed command line arguments (results go to args.results_dir)
+        model: Model to continue training, None to train a new one
+    
+    Returns:
+        Trained model
+    """
+    train_env = make_train_env(feature_store, training_start, train_end, args)
+    eval_callback = make_eval_callback(feature_store, training_start, train_end, val_end, args, iteration)
+    
+    period_timesteps = args.total_timesteps
+    
+    try:
+        if model is None:
+            return train_model(train_env, eval_callback, args, iteration=iteration)
+        
+        print(f"\nContinuing training with existing model...")
+        print(f"Training timesteps: {period_timesteps}")
+        args.learning_rate = args.learning_rate * 0.95
+        model.set_env(train_env)
+        
+        callbacks = []
+        
+        epsilon_callback = CustomEpsilonCallback(
+            start_eps=0.1,   # Lower starting exploration for continued training
+            end_eps=0.02,    # Match final exploration target
+            decay_timesteps=int(period_timesteps * 0.5)  # Faster decay since model is pre-trained
+        )
+        callbacks.append(epsilon_callback)
+        
+        # Evaluation callback for continued training
+        callbacks.append(eval_callback)
+        
+        # Calculate base timesteps for this iteration
+        start_timesteps = iteration * period_timesteps
+        
+        model.learn(
+            total_timesteps=period_timesteps,
+            callback=callbacks,
+            progress_bar=args.progress_bar,
+            reset_num_timesteps=True  # Reset timesteps for each iteration
+        )
+        
+        # Update timesteps in evaluation results to maintain sequence
+        for result in eval_callback.eval_results:
+            result['timesteps'] = (result['timesteps'] - period_timesteps) + start_timesteps
+        
+        return model
+    finally:
+        # Release this window's environments (stops subprocess workers)
+        train_env.close()
+
 def train_walk_forward(data: pd.DataFrame, initial_window: int, step_size: int, args) -> None:
     """Train with walk-forward optimization."""
-    total_periods = len(data)
-    base_timesteps = args.total_timesteps
-    
-    state_path = f"../results/{args.seed}/training_state.json"
+    state_path = os.path.join(args.results_dir, "training_state.json")
     training_start, model_path = load_training_state(state_path)
     
     if model_path and os.path.exists(model_path):
@@ -451,91 +323,159 @@ def train_walk_forward(data: pd.DataFrame, initial_window: int, step_size: int,
     else:
         print("Starting new training")
         training_start = 0
+        model_path = None
         model = None
     
-    while training_start + initial_window + step_size <= total_periods:
-        iteration = training_start // step_size
-        
-        train_end = training_start + initial_window
-        val_end = min(train_end + step_size, total_periods)
-        
-        train_data = data.iloc[training_start:train_end].copy()
-        val_data = data.iloc[train_end:val_end].copy()
-        
-        train_data.index = data.index[training_start:train_end]
-        val_data.index = data.index[train_end:val_end]
-        
-        print(f"\n=== Training Period: {train_data.index[0]} to {train_data.index[-1]} ===")
-        print(f"Validation Period: {val_data.index[0]} to {val_data.index[-1]} ===")
+    # Features are computed once over the full dataset; every window is a view into it
+    feature_cache = FeatureCache(args.feature_cache) if args.feature_cache else None
+    feature_store = FeatureStore(data, feature_cache)
+    
+    # Worker processes (subproc envs, parallel windows, async evaluation) map one shared copy of the store
+    shared_store = None
+    if args.vec_backend == 'subproc' or args.parallel_windows > 1 or args.async_eval:
+        shared_store = SharedFeatureStore(feature_store)
+        feature_store = shared_store.store
+    try:
+        if args.parallel_windows > 1:
+            return _train_windows_parallel(data, feature_store, initial_window, step_size, args,
+                                           state_path, training_start, model_path)
+        return _train_windows(data, feature_store, initial_window, step_size, args,
+                              state_path, training_start, model)
+    finally:
+        if shared_store is not None:
+            shared_store.close()
+        # Summary view for readers of the per-iteration results layout
+        EvalLog.in_directory(args.results_dir).write_summary(
+            os.path.join(args.results_dir, "eval_results_all.json"))
+
+def _train_windows(data: pd.DataFrame, feature_store: FeatureStore, initial_window: int, step_size: int,
+                   args, state_path: str, training_start: int, model: Optional[RecurrentPPO]):
+    """Run the walk-forward iterations from training_start one after another."""
+    for iteration, training_start, train_end, val_end in walk_forward_windows(
+            training_start, len(data), initial_window, step_size):
+        print(f"\n=== Training Period: {data.index[training_start]} to {data.index[train_end - 1]} ===")
+        print(f"Validation Period: {data.index[train_end]} to {data.index[val_end - 1]} ===")
         print(f"Walk-forward Iteration: {iteration}")
         
-        env_params = {
-            'initial_balance': args.initial_balance,
-            'balance_per_lot': args.balance_per_lot
-        }
-        
-        train_env = Monitor(TradingEnv(train_data, **{**env_params, 'random_start': True}))
-        val_env = Monitor(TradingEnv(val_data, **{**env_params, 'random_start': False}))
-        
-        period_timesteps = base_timesteps
-        
-        if model is None:
-            model = train_model(train_env, val_env, train_data, val_data, args, iteration=iteration)
-        else:
-            print(f"\nContinuing training with existing model...")
-            print(f"Training timesteps: {period_timesteps}")
-            args.learning_rate = args.learning_rate * 0.95
-            model.set_env(train_env)
-            
-            callbacks = []
-            
-            epsilon_callback = CustomEpsilonCallback(
-                start_eps=0.1,   # Lower starting exploration for continued training
-                end_eps=0.02,    # Match final exploration target
-                decay_timesteps=int(period_timesteps * 0.5)  # Faster decay since model is pre-trained
-            )
-            callbacks.append(epsilon_callback)            
-            
-            # Create evaluation callback for continued training
-            unified_callback = UnifiedEvalCallback(
-                val_env,
-                train_data=train_data,
-                val_data=val_data,
-                best_model_save_path=f"../results/{args.seed}",
-                log_path=f"../results/{args.seed}",
-                eval_freq=args.eval_freq,
-                deterministic=True,
-                verbose=1,
-                iteration=iteration
-            )
-            callbacks.append(unified_callback)
-            
-            # Calculate base timesteps for this iteration
-            start_timesteps = iteration * period_timesteps
-            
-            model.learn(
-                total_timesteps=period_timesteps,
-                callback=callbacks,
-                progress_bar=True,
-                reset_num_timesteps=True  # Reset timesteps for each iteration
-            )
-            
-            # Update timesteps in evaluation results to maintain sequence
-            for result in unified_callback.eval_results:
-                result['timesteps'] = (result['timesteps'] - period_timesteps) + start_timesteps
+        model = train_window(feature_store, training_start, train_end, val_end, iteration, args, model)
         
-        period_model_path = f"../results/{args.seed}/model_period_{training_start}_{train_end}.zip"
+        period_model_path = os.path.join(args.results_dir, f"model_period_{training_start}_{train_end}.zip")
         model.save(period_model_path)
         save_training_state(state_path, training_start + step_size, period_model_path)
         print(f"Saved model and state for period {training_start} to {train_end}")
+    
+    return model
+
+def window_results_dir(results_dir: str, iteration: int) -> str:
+    """Results directory of one window in parallel mode."""
+    return os.path.join(results_dir, "windows", f"iteration_{iteration}")
+
+def _init_window_worker(torch_threads: int) -> None:
+    """Pin the torch thread pool of a window worker so workers do not oversubscribe the CPUs."""
+    th.set_num_threads(torch_threads)
+
+def _train_window_worker(store_directory: str, window: Tuple[int, int, int, int], args,
+                         model_path: Optional[str]) -> str:
+    """Train one window in a worker process and return its results directory."""
+    iteration, training_start, train_end, val_end = window
+    
+    window_args = argparse.Namespace(**vars(args))
+    window_args.results_dir = window_results_dir(args.results_dir, iteration)
+    window_args.progress_bar = False
+    os.makedirs(os.path.join(window_args.results_dir, "checkpoints"), exist_ok=True)
+    
+    np.random.seed(args.seed)
+    th.manual_seed(args.seed)
+    if args.device == 'cuda':
+        th.cuda.manual_seed(args.seed)
+    
+    model = RecurrentPPO.load(model_path) if model_path else None
+    model = train_window(attach(store_directory), training_start, train_end, val_end, iteration,
+                         window_args, model)
+    model.save(os.path.join(window_args.results_dir, f"model_period_{training_start}_{train_end}.zip"))
+    return window_args.results_dir
+
+def merge_window_results(results_dir: str, windows: List[Tuple[int, int, int, int]],
+                         completed: Dict[int, str], state_path: str, step_size: int) -> Optional[str]:
+    """Merge per-window results into the layout of a sequential run.
+    
+    Window directories are copied in iteration order, so files written by every
+    window (best model, checkpoints) end up from the latest one, as they would
+    sequentially. Merging stops at the first window that did not complete so
+    the saved training state resumes from it.
+    
+    Args:
+        results_dir: Results directory of the run
+        windows: All windows of the run in iteration order
+        completed: Results directory of each completed window, keyed by iteration
+        state_path: Path of the training state file
+        step_size: Walk-forward step size in bars
+    
+    Returns:
+        Path of the last merged period model, or None if no window was merged
+    """
+    eval_log = EvalLog.in_directory(results_dir)
+    
+    last_model_path = None
+    for iteration, training_start, train_end, _ in windows:
+        window_dir = completed.get(iteration)
+        if window_dir is None:
+            break
         
-        try:
-            training_start += step_size
-        except KeyboardInterrupt:
-            print("\nTraining interrupted. Progress saved - use same command to resume.")
-            return model
+        eval_log.extend(EvalLog.in_directory(window_dir))
+        shutil.copytree(window_dir, results_dir, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(EVAL_LOG_NAME))
         
-    return model
+        last_model_path = os.path.join(results_dir, f"model_period_{training_start}_{train_end}.zip")
+        save_training_state(state_path, training_start + step_size, last_model_path)
+        shutil.rmtree(window_dir)
+    
+    try:
+        os.rmdir(os.path.join(results_dir, "windows"))
+    except OSError:
+        pass  # Missing, or holds windows that failed
+    return last_model_path
+
+def _train_windows_parallel(data: pd.DataFrame, feature_store: FeatureStore, initial_window: int,
+                            step_size: int, args, state_path: str, training_start: int,
+                            model_path: Optional[str]):
+    """Train the walk-forward windows from training_start in a pool of worker processes.
+    
+    Each window starts from the same model (the resumed one, or a new model)
+    instead of continuing the previous window's model, and writes to its own
+    results directory until the windows are merged.
+    """
+    windows = walk_forward_windows(training_start, len(data), initial_window, step_size)
+    if not windows:
+        return RecurrentPPO.load(model_path) if model_path else None
+    
+    torch_threads = max(1, (os.cpu_count() or 1) // args.parallel_windows)
+    print(f"Training {len(windows)} windows, {args.parallel_windows} at a time "
+          f"({torch_threads} torch threads each)")
+    
+    completed = {}
+    errors = []
+    with ProcessPoolExecutor(max_workers=args.parallel_windows,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_window_worker, initargs=(torch_threads,)) as pool:
+        futures = {
+            pool.submit(_train_window_worker, feature_store.directory, window, args, model_path): window
+            for window in windows
+        }
+        for future in as_completed(futures):
+            iteration, window_start, train_end, _ = futures[future]
+            try:
+                completed[iteration] = future.result()
+                print(f"Finished iteration {iteration}: {data.index[window_start]} to {data.index[train_end - 1]}")
+            except Exception as e:
+                print(f"Iteration {iteration} failed: {str(e)}")
+                errors.append(e)
+    
+    last_model_path = merge_window_results(args.results_dir, windows, completed, state_path, step_size)
+    if errors:
+        raise errors[0]
+    print(f"Merged {len(windows)} windows into {args.results_dir}")
+    return RecurrentPPO.load(last_model_path)
 
 def main():
     parser = argparse.ArgumentParser(description='Train a PPO-LSTM model for trading')
@@ -569,12 +509,27 @@ def main():
                       help='Final learning rate')
     parser.add_argument('--eval_freq', type=int, default=10000,
                       help='Evaluation frequency in timesteps')
+    parser.add_argument('--async_eval', action='store_true',
+                      help='Run evaluations in a separate process from policy snapshots')
+    parser.add_argument('--eval_backlog', type=int, default=1,
+                      help='Maximum queued async evaluations; evaluations are skipped while the queue is full')
+    parser.add_argument('--n_envs', type=int, default=1,
+                      help='Number of parallel training environments')
+    parser.add_argument('--vec_backend', type=str, choices=['dummy', 'subproc', 'native'], default='dummy',
+                      help='Vectorized env backend: in-process, one process per env, or batched VecTradingEnv')
+    parser.add_argument('--parallel_windows', type=int, default=1,
+                      help='Number of walk-forward windows trained at once, each from the starting model')
+    parser.add_argument('--feature_cache', type=str, default=None,
+                      help='Directory for an on-disk feature cache, e.g. ../cache/features (off by default; '
+                           'writes one entry per distinct OHLC dataset and never evicts)')
     
     args = parser.parse_args()
+    args.results_dir = f"../results/{args.seed}"
+    args.progress_bar = args.parallel_windows <= 1
     
-    os.makedirs(f"../results/{args.seed}", exist_ok=True)
-    os.makedirs(f"../results/{args.seed}/checkpoints", exist_ok=True)
-    
+    os.makedirs(args.results_dir, exist_ok=True)
+    os.makedirs(os.path.join(args.results_dir, "checkpoints"), exist_ok=True)
+
     np.random.seed(args.seed)
     th.manual_seed(args.seed)
     if args.device == 'cuda':
@@ -592,7 +547,7 @@ def main():
     step_size_bars = args.step_size * bars_per_day
     
     if args.resume:
-        state_path = f"../results/{args.seed}/training_state.json"
+        state_path = os.path.join(args.results_dir, "training_state.json")
         if os.path.exists(state_path):
             print("\nResuming walk-forward optimization...")
         else:
@@ -607,8 +562,9 @@ def main():
         return
     
     print("\nWalk-forward optimization completed.")
-    print(f"Final model saved at: ../results/{args.seed}/model_final.zip")
-    model.save(f"../results/{args.seed}/model_final.zip")
+    final_model_path = os.path.join(args.results_dir, "model_final.zip")
+    print(f"Final model saved at: {final_model_path}")
+    model.save(final_model_path)
 
 if __name__ == "__main__":
     main()
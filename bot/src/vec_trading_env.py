@@ -0,0 +1,347 @@
+"""
+Vectorized trading environment for single-position trading with PPO-LSTM.
+
+This module implements a batched sibling of TradingEnv that advances N
+independent episodes per call. Account and position state is kept as
+length-N NumPy arrays instead of per-episode Python dicts, so a single
+step_wait() replaces N TradingEnv.step() calls and no subprocess IPC is
+needed to run many environments.
+"""
+
+from typing import Any, Dict, List, Optional, Type
+
+import gymnasium as gym
+import numpy as np
+import pandas as pd
+from stable_baselines3.common.vec_env.base_vec_env import (
+    VecEnv, VecEnvIndices, VecEnvObs, VecEnvStepReturn
+)
+
+from feature_store import FeatureStore
+from position_sizing import lot_sizes
+from trade_environment import TradingEnv
+
+
+class TradingLanes:
+    """Struct-of-arrays account and position state for N trading lanes.
+
+    Mirrors the bookkeeping of TradingEnv (single position per lane, lot
+    sizing from balance, spread applied on entry) with every field held as
+    a length-N array so a whole batch of lanes is updated per call.
+    """
+
+    def __init__(self, n_lanes: int, initial_balance: float = 10000,
+                 balance_per_lot: float = 1000.0, min_lots: float = 0.01,
+                 max_lots: float = 100.0):
+        """
+        Initialize lane state.
+
+        Args:
+            n_lanes: Number of independent lanes
+            initial_balance: Starting balance of every lane
+            balance_per_lot: Account balance required per 0.01 lot
+            min_lots: Minimum lot size
+            max_lots: Maximum lot size
+        """
+        self.n_lanes = n_lanes
+        self.initial_balance = initial_balance
+        self.balance_per_lot = balance_per_lot
+        self.min_lots = min_lots
+        self.max_lots = max_lots
+
+        self.balance = np.full(n_lanes, initial_balance, dtype=np.float64)
+        self.max_balance = np.full(n_lanes, initial_balance, dtype=np.float64)
+        self.direction = np.zeros(n_lanes, dtype=np.int8)      # 1 long, -1 short, 0 flat
+        self.entry_price = np.zeros(n_lanes, dtype=np.float64)
+        self.lot_size = np.zeros(n_lanes, dtype=np.float64)
+        self.entry_step = np.zeros(n_lanes, dtype=np.int64)
+        self.trade_count = np.zeros(n_lanes, dtype=np.int64)
+        self.win_count = np.zeros(n_lanes, dtype=np.int64)
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> None:
+        """Reset account and position state for the selected lanes (all if None)."""
+        if mask is None:
+            mask = slice(None)
+        self.balance[mask] = self.initial_balance
+        self.max_balance[mask] = self.initial_balance
+        self.direction[mask] = 0
+        self.entry_price[mask] = 0.0
+        self.lot_size[mask] = 0.0
+        self.entry_step[mask] = 0
+        self.trade_count[mask] = 0
+        self.win_count[mask] = 0
+
+    def open(self, mask: np.ndarray, direction: np.ndarray, price: np.ndarray,
+             spread: np.ndarray, step: np.ndarray) -> None:
+        """Open positions on flat lanes selected by mask.
+
+        Args:
+            mask: Boolean lane selector; lanes already holding a position are ignored
+            direction: Requested direction per lane (1: buy, -1: sell)
+            price: Current close price per lane
+            spread: Spread in price units per lane
+            step: Current step index per lane
+        """
+        mask = mask & (self.direction == 0)
+        if not mask.any():
+            return
+        lots = lot_sizes(self.balance[mask], self.balance_per_lot, self.min_lots, self.max_lots)
+        self.direction[mask] = direction[mask]
+        self.entry_price[mask] = np.where(direction[mask] == 1,
+                                          price[mask] + spread[mask],
+                                          price[mask] - spread[mask])
+        self.lot_size[mask] = lots
+        self.entry_step[mask] = step[mask]
+
+    def profit_points(self, price: np.ndarray) -> np.ndarray:
+        """Signed price move of the open position per lane (0 for flat lanes)."""
+        return (price - self.entry_price) * self.direction
+
+    def unrealized_pnl(self, price: np.ndarray) -> np.ndarray:
+        """Unrealized P/L per lane (0 for flat lanes)."""
+        return self.profit_points(price) * self.lot_size
+
+    def close(self, mask: np.ndarray, price: np.ndarray) -> np.ndarray:
+        """Close open positions on lanes selected by mask and book the P/L.
+
+        Args:
+            mask: Boolean lane selector; flat lanes are ignored
+            price: Current close price per lane
+
+        Returns:
+            np.ndarray: Realized P/L per lane (0 where nothing was closed)
+        """
+        mask = mask & (self.direction != 0)
+        pnl = np.zeros(self.n_lanes, dtype=np.float64)
+        if not mask.any():
+            return pnl
+        pnl[mask] = self.profit_points(price)[mask] * self.lot_size[mask]
+        self.balance[mask] += pnl[mask]
+        self.trade_count[mask] += 1
+        self.win_count[mask & (pnl > 0)] += 1
+        self.direction[mask] = 0
+        self.entry_price[mask] = 0.0
+        self.lot_size[mask] = 0.0
+        return pnl
+
+
+class VecTradingEnv(VecEnv):
+    """Batched trading environment stepping N TradingEnv episodes at once.
+
+    Every lane follows TradingEnv.step semantics exactly; observations are
+    returned stacked as float32 and finished lanes are reset automatically
+    with an independent random start.
+    """
+
+    def __init__(self, data: pd.DataFrame, n_envs: int = 8, initial_balance: float = 10000,
+                 balance_per_lot: float = 1000.0, random_start: bool = True,
+                 seed: Optional[int] = None):
+        """
+        Initialize the vectorized environment.
+
+        Args:
+            data: DataFrame with OHLCV data
+            n_envs: Number of parallel episode lanes
+            initial_balance: Starting balance of every lane
+            balance_per_lot: Account balance required per 0.01 lot
+            random_start: Start every episode at a random bar
+            seed: Seed for the per-lane start generators
+        """
+        # Reuse TradingEnv preprocessing so features match exactly
+        template_env = TradingEnv(data, initial_balance=initial_balance,
+                                  balance_per_lot=balance_per_lot,
+                                  random_start=random_start)
+        self._setup(template_env, n_envs, seed)
+
+    @classmethod
+    def from_feature_store(cls, store: FeatureStore, start: int = 0, end: Optional[int] = None,
+                           n_envs: int = 8, initial_balance: float = 10000,
+                           balance_per_lot: float = 1000.0, random_start: bool = True,
+                           seed: Optional[int] = None) -> 'VecTradingEnv':
+        """Create lanes over a window of a precomputed feature store.
+
+        Args:
+            store: Feature store built over the full dataset
+            start: First bar position in the store's source data (inclusive)
+            end: Last bar position in the store's source data (exclusive)
+            n_envs: Number of parallel episode lanes
+            initial_balance: Starting balance of every lane
+            balance_per_lot: Account balance required per 0.01 lot
+            random_start: Start every episode at a random bar
+            seed: Seed for the per-lane start generators
+
+        Returns:
+            VecTradingEnv over the window
+        """
+        template_env = TradingEnv.from_feature_store(store, start, end, initial_balance=initial_balance,
+                                                     balance_per_lot=balance_per_lot,
+                                                     random_start=random_start)
+        vec_env = cls.__new__(cls)
+        vec_env._setup(template_env, n_envs, seed)
+        return vec_env
+
+    @classmethod
+    def from_env(cls, env: TradingEnv, n_envs: int = 8, seed: Optional[int] = None) -> 'VecTradingEnv':
+        """Create lanes sharing the features and settings of an existing environment.
+
+        Args:
+            env: Environment to copy (a TradingEnv, possibly wrapped)
+            n_envs: Number of parallel episode lanes
+            seed: Seed for the per-lane start generators
+
+        Returns:
+            VecTradingEnv over the same bars
+        """
+        env = env.unwrapped
+        vec_env = cls.__new__(cls)
+        vec_env._setup(env, n_envs, seed)
+        return vec_env
+
+    def _setup(self, env: TradingEnv, n_envs: int, seed: Optional[int]) -> None:
+        """Initialize lane state from a template environment."""
+        self.template_env = env
+        initial_balance = env.initial_balance
+        balance_per_lot = env.BALANCE_PER_LOT
+        random_start = env.random_start
+
+        self.POINT_VALUE = env.POINT_VALUE
+        self.MAX_DRAWDOWN = env.MAX_DRAWDOWN
+        self.initial_balance = initial_balance
+        self.random_start = random_start
+        self.data_length = env.data_length
+        self.original_index = env.original_index
+        self.render_mode = None
+
+        self.obs_matrix = env.obs_matrix
+        self.close_prices = np.asarray(env.prices['close'], dtype=np.float64)
+        self.spread_cost = np.asarray(env.prices['spread'], dtype=np.float64) * self.POINT_VALUE
+
+        self.lanes = TradingLanes(n_envs, initial_balance, balance_per_lot,
+                                  env.MIN_LOTS, env.MAX_LOTS)
+        self.current_step = np.zeros(n_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(n_envs, dtype=np.int64)
+        self.completed_episodes = 0
+
+        seed_seq = np.random.SeedSequence(seed)
+        self._rngs = [np.random.default_rng(s) for s in seed_seq.spawn(n_envs)]
+
+        self._obs = np.zeros((n_envs, self.obs_matrix.shape[1]), dtype=np.float32)
+        self._actions = np.zeros(n_envs, dtype=np.int64)
+
+        super().__init__(n_envs, env.observation_space, env.action_space)
+
+    def _start_steps(self, lanes: np.ndarray) -> np.ndarray:
+        """Draw starting bars for the given lanes."""
+        if not self.random_start:
+            return np.zeros(len(lanes), dtype=np.int64)
+        # Same window as TradingEnv: leave 100 steps minimum
+        max_start = max(1, self.data_length - 100)
+        return np.array([self._rngs[i].integers(0, max_start) for i in lanes], dtype=np.int64)
+
+    def _reset_lanes(self, lanes: np.ndarray) -> None:
+        """Reset the given lanes to a fresh episode."""
+        mask = np.zeros(self.num_envs, dtype=bool)
+        mask[lanes] = True
+        self.lanes.reset(mask)
+        self.current_step[lanes] = self._start_steps(lanes)
+        self.episode_steps[lanes] = 0
+        self.completed_episodes += len(lanes)
+
+    def _write_obs(self, lanes: np.ndarray) -> None:
+        """Fill observation rows for the given lanes from the feature matrix."""
+        steps = self.current_step[lanes]
+        price = self.close_prices[steps]
+        pnl = (price - self.lanes.entry_price[lanes]) * self.lanes.direction[lanes] * self.lanes.lot_size[lanes]
+        self._obs[lanes] = self.obs_matrix[steps]
+        self._obs[lanes, -1] = np.clip(pnl / self.initial_balance, -1, 1)
+
+    def reset(self) -> VecEnvObs:
+        """Reset all lanes and return the stacked initial observations."""
+        for i, seed in enumerate(self._seeds):
+            if seed is not None:
+                self._rngs[i] = np.random.default_rng(seed)
+        all_lanes = np.arange(self.num_envs)
+        self._reset_lanes(all_lanes)
+        self._write_obs(all_lanes)
+        self.reset_infos = [{"balance": self.initial_balance, "position": None}
+                            for _ in range(self.num_envs)]
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """Store the action vector for the next step_wait()."""
+        self._actions = np.asarray(actions).reshape(self.num_envs).astype(np.int64) % 4
+
+    def step_wait(self) -> VecEnvStepReturn:
+        """Advance every lane by one bar."""
+        actions = self._actions
+        lanes = self.lanes
+
+        spread = self.spread_cost[self.current_step]
+        previous_balance = lanes.balance.copy()
+        np.maximum(lanes.max_balance, lanes.balance, out=lanes.max_balance)
+
+        self.episode_steps += 1
+        self.current_step += 1
+        steps = self.current_step
+        price = self.close_prices[steps]
+
+        # Execute trade actions
+        buy_sell = (actions == 1) | (actions == 2)
+        lanes.open(buy_sell, np.where(actions == 1, 1, -1).astype(np.int8), price, spread, steps)
+        lanes.close(actions == 3, price)
+
+        # Terminal conditions
+        end_of_data = steps >= self.data_length - 1
+        drawdown = (lanes.max_balance - lanes.balance) / lanes.max_balance
+        dones = end_of_data | (lanes.balance <= 0) | (drawdown >= self.MAX_DRAWDOWN)
+
+        # Auto-close positions at end of episode
+        lanes.close(dones, price)
+
+        rewards = ((lanes.balance - previous_balance) / self.initial_balance).astype(np.float32)
+
+        all_lanes = np.arange(self.num_envs)
+        self._write_obs(all_lanes)
+
+        infos: List[Dict[str, Any]] = [
+            {"step": int(steps[i]), "balance": lanes.balance[i], "drawdown": drawdown[i] * 100,
+             "TimeLimit.truncated": False}
+            for i in range(self.num_envs)
+        ]
+
+        done_lanes = np.flatnonzero(dones)
+        if len(done_lanes):
+            for i in done_lanes:
+                infos[i]["terminal_observation"] = self._obs[i].copy()
+                infos[i]["total_trades"] = int(lanes.trade_count[i])
+                infos[i]["win_count"] = int(lanes.win_count[i])
+                infos[i]["total_pnl"] = lanes.balance[i] - self.initial_balance
+            self._reset_lanes(done_lanes)
+            self._write_obs(done_lanes)
+
+        return self._obs.copy(), rewards, dones, infos
+
+    def close(self) -> None:
+        """Nothing to release; lanes live in-process."""
+        pass
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        """Return an attribute of the shared environment once per selected lane."""
+        value = getattr(self, attr_name)
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        """Set an attribute on the shared environment."""
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None,
+                   **method_kwargs) -> List[Any]:
+        """Call a method of the shared environment once per selected lane."""
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None) -> List[bool]:
+        """Lanes are never wrapped by gymnasium wrappers."""
+        return [False for _ in self._get_indices(indices)]